@@ -0,0 +1,96 @@
+from app.models.schemas import CompileRequest, CompileResponse
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+
+# Tamaño aproximado (bytes) de cada artefacto serializado. No es exacto, pero
+# basta para acotar la memoria del caché sin serializar la respuesta.
+TOKEN_COST = 96
+AST_NODE_COST = 128
+SYMBOL_COST = 256
+QUADRUPLE_COST = 160
+MESSAGE_COST = 64
+
+DEFAULT_MAX_BYTES = int(os.environ.get("COMPILER_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_ENABLED = os.environ.get("COMPILER_CACHE_ENABLED", "1") != "0"
+
+def request_key(request: CompileRequest) -> str:
+    """Clave de contenido: hash del código más las opciones de compilación"""
+    options = request.model_dump(exclude={"code"})
+    digest = hashlib.sha256(request.code.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def estimate_size(request: CompileRequest, response: CompileResponse) -> int:
+    """Estima los bytes que ocupa una respuesta a partir de sus contadores"""
+    size = len(request.code) + len(response.object_code or "")
+    size += len(response.tokens or []) * TOKEN_COST
+    size += len(response.intermediate_code or []) * QUADRUPLE_COST
+    size += len(response.optimized_code or []) * QUADRUPLE_COST
+    size += (len(response.errors) + len(response.warnings) + len(response.optimization_log)) * MESSAGE_COST
+
+    metrics = response.metrics or {}
+    size += metrics.get("ast_nodes_count", 0) * AST_NODE_COST
+    size += metrics.get("symbols_count", 0) * SYMBOL_COST
+    if response.ast and not metrics.get("ast_nodes_count"):
+        # Sin contador de nodos: aproximamos con el número de tokens
+        size += len(response.tokens or []) * AST_NODE_COST
+    return size
+
+class CompilationCache:
+    """Caché LRU de respuestas de compilación acotado por memoria"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[CompileResponse, int]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CompileResponse]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, request: CompileRequest, response: CompileResponse):
+        size = estimate_size(request, response)
+        if size > self.max_bytes:
+            return  # Nunca cabría: no desalojamos todo por una sola respuesta
+
+        with self.lock:
+            if key in self.entries:
+                self.current_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (response, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and self.entries:
+                _, (_, old_size) = self.entries.popitem(last=False)
+                self.current_bytes -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_evictions": self.evictions,
+            "cache_entries": len(self.entries),
+            "cache_bytes": self.current_bytes,
+        }
+
+compilation_cache = CompilationCache()
@@ -1,134 +1,204 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import CompileRequest, CompileResponse
-from app.compiler.lexer import Lexer
-from app.compiler.parser import Parser
-from app.compiler.semantic import SemanticAnalyzer
-from app.compiler.intermediate import IntermediateCodeGenerator
-from app.compiler.generator import CodeGenerator
-from app.compiler.optimizer import CodeOptimizer
-from app.models.schemas import SymbolTable 
+from fastapi import APIRouter, HTTPException, Response, Header
+from fastapi.responses import StreamingResponse
+from app.models.schemas import (
+    CompileRequest, CompileResponse, BatchCompileRequest, PhaseChunk, SessionCompileRequest
+)
+from app.compiler.incremental import IncrementalRun, InvalidEdit
+from app.compiler.parallel import compile_request, compilation_run
+from app.api.cache import compilation_cache, request_key, CACHE_ENABLED
+from app.api.executor import compilation_executor, CompilationTimeout
+from app.api.metrics import record_compilation, server_timing_header
+from app.api.sessions import session_store
+from app.api import encoding
+from typing import Any, Dict, Iterator, Optional, Tuple
+import asyncio
+import json
 import time
-import re
 
 router = APIRouter()
 
-def format_errors(error_list, error_type):
-    structured_errors = []
-    line_pattern = re.compile(r'(?:l[íi]nea|line)\s*[:]?\s*(\d+)', re.IGNORECASE)
-    for msg in error_list:
-        line_num = 0
-        match = line_pattern.search(msg)
-        if match: line_num = int(match.group(1))
-        structured_errors.append({"type": error_type, "line": line_num, "message": msg})
-    return structured_errors
+def with_cache_metrics(response: CompileResponse, hit: bool) -> CompileResponse:
+    """Copia superficial de la respuesta con los contadores del caché en metrics"""
+    metrics = dict(response.metrics or {})
+    metrics["cache_hit"] = hit
+    metrics.update(compilation_cache.stats())
+    return response.copy(update={"metrics": metrics})
+
+def compile_packed(request: CompileRequest) -> encoding.PackedResponse:
+    """Compila en un worker y devuelve la respuesta sin árboles anidados"""
+    return encoding.pack_response(compile_request(request))
+
+async def run_compilation(request: CompileRequest) -> CompileResponse:
+    """Ejecuta el pipeline en el executor configurado (fuera del event loop)"""
+    return encoding.unpack_response(await compilation_executor.run(compile_packed, request))
+
+async def compile_with_cache(request: CompileRequest) -> CompileResponse:
+    """Compila un programa pasando primero por el caché de resultados"""
+    start_time = time.perf_counter()
+    if not CACHE_ENABLED:
+        response = await run_compilation(request)
+        record_compilation(response.metrics, False, time.perf_counter() - start_time)
+        return response
+
+    key = request_key(request)
+    cached = compilation_cache.get(key)
+    if cached is not None:
+        record_compilation(cached.metrics, True, time.perf_counter() - start_time)
+        return with_cache_metrics(cached, hit=True)
+
+    response = await run_compilation(request)
+    compilation_cache.put(key, request, response)
+    record_compilation(response.metrics, False, time.perf_counter() - start_time)
+    return with_cache_metrics(response, hit=False)
 
 @router.post("/compile", response_model=CompileResponse)
-async def compile_code(request: CompileRequest):
-    start_time = time.time()
-    print("=== COMPILACIÓN FORZADA (Optimiza incluso con errores) ===")
-    
-    metrics = {
-        "compilation_time": 0, "tokens_count": 0, "ast_nodes_count": 0,
-        "symbols_count": 0, "quadruples_count": 0, "temporals_count": 0,
-        "errors_count": 0, "warnings_count": 0, "optimization_reduction": 0
-    }
-    
-    # Acumuladores de errores
-    raw_lexer_err, raw_parser_err, raw_semantic_err, raw_gen_err = [], [], [], []
-    semantic_warn = []
-    
-    tokens, ast, symbol_table = [], None, None
-    intermediate_code, optimized_code, optimization_log = [], [], []
-    object_code = ""
-
-    # 1. LÉXICO
+async def compile_code(request: CompileRequest,
+                       accept: Optional[str] = Header(None)):
+    """Compila un programa. Con Accept: application/vnd.compiler.compact+json o
+    application/msgpack la respuesta usa el formato columnar de app.api.encoding."""
+    media_type = encoding.negotiate(accept)
+    if media_type in encoding.MSGPACK_MEDIA_TYPES and encoding.msgpack is None:
+        raise HTTPException(status_code=406, detail="MessagePack no disponible en el servidor")
+
     try:
-        tokens, raw_lexer_err = Lexer().tokenize(request.code)
-        metrics["tokens_count"] = len(tokens)
-    except Exception as e: raw_lexer_err.append(str(e))
+        response = await compile_with_cache(request)
+    except CompilationTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
 
-    # 2. SINTÁCTICO (Si hay tokens)
-    if tokens:
-        try:
-            ast, raw_parser_err = Parser().parse(tokens)
-            # Truco: Si hay AST parcial, úsalo. Si es None, no podemos seguir.
-        except Exception as e: raw_parser_err.append(str(e))
+    if response.metrics.get("cache_hit"):
+        server_timing = 'cache;desc="hit"'
+    else:
+        server_timing = server_timing_header(response.metrics)
 
-    # 3. SEMÁNTICO (Solo para tabla de símbolos y errores, no detiene flujo)
-    if ast:
-        try:
-            sem = SemanticAnalyzer()
-            res = sem.analyze(ast)
-            raw_semantic_err = res.errors
-            semantic_warn = res.warnings
-            symbol_table = res.symbol_table
-            metrics["symbols_count"] = len(symbol_table.symbols) if symbol_table else 0
-        except Exception as e:
-            raw_semantic_err.append(f"Fallo análisis semántico: {e}")
-            symbol_table = SymbolTable() # Tabla vacía para no romper el siguiente paso
+    if media_type == encoding.JSON_MEDIA_TYPE:
+        return Response(content=encoding.render_json(response), media_type=media_type,
+                        headers={"Server-Timing": server_timing, "Vary": "Accept"})
+    return Response(content=encoding.render(response, media_type), media_type=media_type,
+                    headers={"Server-Timing": server_timing, "Vary": "Accept"})
+
+@router.post("/compile/batch")
+async def compile_batch(batch: BatchCompileRequest):
+    """Compila varios programas en paralelo y devuelve NDJSON conforme terminan.
 
-    # 4. INTERMEDIO (CRÍTICO: Generar pase lo que pase)
-    if ast:
+    Cada línea es {"index": i, "response": CompileResponse} (o {"index": i, "error": ...})
+    y la última es {"summary": {...}} con las métricas agregadas del lote.
+    """
+    async def compile_item(index: int, request: CompileRequest):
         try:
-            # Usamos una tabla vacía si la semántica falló
-            st_to_use = symbol_table if symbol_table else SymbolTable()
-            gen = IntermediateCodeGenerator(st_to_use)
-            
-            # generate() ahora atrapa sus propios errores internos y devuelve lo que pudo
-            ic_result = gen.generate(ast)
-            intermediate_code = ic_result.quadruples
-            metrics["quadruples_count"] = len(intermediate_code)
-            
+            return index, await compile_with_cache(request), None
+        except CompilationTimeout as e:
+            return index, None, str(e)
         except Exception as e:
-            raw_gen_err.append(f"Fallo generación intermedia: {e}")
+            return index, None, f"Fallo compilando el programa: {e}"
 
-    # 5. OPTIMIZACIÓN (Si hay ALGO de código intermedio, optimizarlo)
-    if intermediate_code:
+    async def stream():
+        start_time = time.time()
+        summary = {
+            "programs_count": len(batch.programs), "succeeded_count": 0,
+            "failed_count": 0, "cache_hits": 0, "tokens_count": 0,
+            "quadruples_count": 0, "source_bytes": 0
+        }
+        tasks = [asyncio.ensure_future(compile_item(i, req)) for i, req in enumerate(batch.programs)]
         try:
-            opt = CodeOptimizer()
-            optimized_code, optimization_log = opt.optimize(intermediate_code)
-            
-            # Calcular métricas
-            orig = len(intermediate_code)
-            new_l = len(optimized_code)
-            if orig > 0:
-                metrics["optimization_reduction"] = ((orig - new_l) / orig) * 100
-        except Exception as e:
-            semantic_warn.append(f"Error optimizando: {e}")
-            optimized_code = intermediate_code # Fallback al original
+            for next_done in asyncio.as_completed(tasks):
+                index, response, error = await next_done
+                summary["source_bytes"] += len(batch.programs[index].code)
+
+                if error is not None:
+                    summary["failed_count"] += 1
+                    yield json.dumps({"index": index, "error": error}) + "\n"
+                    continue
+
+                metrics = response.metrics or {}
+                summary["succeeded_count" if response.success else "failed_count"] += 1
+                summary["cache_hits"] += 1 if metrics.get("cache_hit") else 0
+                summary["tokens_count"] += metrics.get("tokens_count", 0)
+                summary["quadruples_count"] += metrics.get("quadruples_count", 0)
+                yield f'{{"index": {index}, "response": {encoding.render_json(response)}}}\n'
+        finally:
+            for task in tasks:
+                task.cancel()
 
-    # 6. CÓDIGO OBJETO
-    quads_final = optimized_code if optimized_code else intermediate_code
-    if quads_final:
+        elapsed = time.time() - start_time
+        summary["total_time"] = elapsed * 1000
+        summary["programs_per_second"] = len(batch.programs) / elapsed if elapsed > 0 else 0
+        summary["tokens_per_second"] = summary["tokens_count"] / elapsed if elapsed > 0 else 0
+        summary["bytes_per_second"] = summary["source_bytes"] / elapsed if elapsed > 0 else 0
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def stream_lines(request: CompileRequest) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """Líneas NDJSON de /compile/stream, ya serializadas (corre en un worker); la
+    última va con las métricas de la compilación"""
+    run = compilation_run(request)
+    for chunk in run.phases():
+        yield encoding.render_json(chunk, exclude_none=True) + "\n", None
+
+    response = run.response()
+    done = PhaseChunk(phase="done", time=response.metrics["compilation_time"],
+                      success=response.success, metrics=response.metrics,
+                      trace=response.trace)
+    yield encoding.render_json(done, exclude_none=True) + "\n", response.metrics
+
+@router.post("/compile/stream")
+async def compile_stream(request: CompileRequest):
+    """Variante de /compile que emite NDJSON con el resultado de cada fase en cuanto termina.
+
+    Cada línea es un PhaseChunk (tokens, luego AST, tabla de símbolos, cuádruplos...)
+    con su tiempo y errores; la última tiene phase == "done", success y metrics.
+    Las fases corren en el executor como /compile, con el mismo tiempo límite: si
+    se supera, la última línea es un "done" con success false y el error.
+    """
+    async def stream():
         try:
-            st_to_use = symbol_table if symbol_table else SymbolTable()
-            object_code = CodeGenerator(st_to_use).generate(quads_final)
-        except Exception as e:
-            raw_gen_err.append(f"Error código objeto: {e}")
-
-    # Serializar errores
-    final_errors = []
-    final_errors.extend(format_errors(raw_lexer_err, "Léxico"))
-    final_errors.extend(format_errors(raw_parser_err, "Sintáctico"))
-    final_errors.extend(format_errors(raw_semantic_err, "Semántico"))
-    final_errors.extend(format_errors(raw_gen_err, "Generación"))
-    
-    serialized_errors = [f"{e['type']}|{e['line']}|{e['message']}" for e in final_errors]
-
-    metrics["errors_count"] = len(serialized_errors)
-    metrics["warnings_count"] = len(semantic_warn)
-    metrics["compilation_time"] = (time.time() - start_time) * 1000
-
-    return CompileResponse(
-        success=len(serialized_errors) == 0,
-        tokens=tokens,
-        ast=ast,
-        symbol_table=symbol_table,
-        intermediate_code=intermediate_code,
-        optimized_code=optimized_code,
-        optimization_log=optimization_log,
-        object_code=object_code,
-        errors=serialized_errors,
-        warnings=semantic_warn,
-        metrics=metrics
-    )
\ No newline at end of file
+            async for line, metrics in compilation_executor.stream(stream_lines, request):
+                if metrics is not None:
+                    record_compilation(metrics, False, metrics["compilation_time"] / 1000)
+                yield line
+        except CompilationTimeout as e:
+            timeout = PhaseChunk(phase="done", success=False, errors=[str(e)])
+            yield encoding.render_json(timeout, exclude_none=True) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/compile/session", response_model=CompileResponse)
+async def compile_session(request: SessionCompileRequest):
+    """Compilación incremental para el editor.
+
+    La primera petición manda el código completo y recibe un session_id; las
+    siguientes mandan solo las ediciones (start, end, text) y se re-tokenizan y
+    re-analizan únicamente las funciones afectadas. Mandar code reinicia la sesión.
+    Un lote con alguna edición fuera de rango responde 422 y deja la sesión intacta.
+    """
+    if request.code is not None:
+        session_id, session, lock = session_store.create(request.code, request.session_id)
+    else:
+        entry = session_store.get(request.session_id) if request.session_id else None
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Sesión desconocida o expirada: reenvía el código completo")
+        session_id, (session, lock) = request.session_id, entry
+
+    compile_request = CompileRequest(code="", artifacts=request.artifacts,
+                                     stop_after=request.stop_after, debug=request.debug)
+    edits = [(e.start, e.end, e.text) for e in request.edits]
+
+    def run_session() -> CompileResponse:
+        # El estado de la sesión vive en este proceso: se compila en un hilo, no en el pool
+        with lock:
+            # Se valida el lote completo antes de tocar la sesión: o se aplican todas o ninguna
+            session.check_edits(edits)
+            run = IncrementalRun(compile_request, session, edits)
+            for _ in run.phases():
+                pass
+            return run.response()
+
+    start_time = time.perf_counter()
+    try:
+        response = await asyncio.get_running_loop().run_in_executor(None, run_session)
+    except InvalidEdit as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    record_compilation(response.metrics, False, time.perf_counter() - start_time)
+    return Response(content=encoding.render_json(response.copy(update={"session_id": session_id})),
+                    media_type=encoding.JSON_MEDIA_TYPE,
+                    headers={"Server-Timing": server_timing_header(response.metrics)})
@@ -0,0 +1,289 @@
+from app.models.schemas import CompileResponse, ASTNode, SymbolTable, Symbol, DataType
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+import json
+
+try:
+    import msgpack
+except ImportError:  # Dependencia opcional: solo hace falta para application/msgpack
+    msgpack = None
+
+# Tipos de contenido negociables con la cabecera Accept
+JSON_MEDIA_TYPE = "application/json"
+COMPACT_MEDIA_TYPE = "application/vnd.compiler.compact+json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# v2: la tabla de símbolos también va en columnas (preorden), no anidada
+COMPACT_VERSION = "compact-v2"
+
+class StringTable:
+    """Tabla de cadenas internadas; -1 representa None"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        idx = self.index.get(value)
+        if idx is None:
+            idx = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return idx
+
+def encode_tokens(tokens, table: StringTable) -> Dict[str, List[int]]:
+    intern = table.intern
+    return {
+        "type": [intern(t.type) for t in tokens],
+        "value": [intern(t.value) for t in tokens],
+        "line": [t.line for t in tokens],
+        "column": [t.column for t in tokens],
+    }
+
+def encode_quadruples(quads, table: StringTable) -> Dict[str, List[int]]:
+    intern = table.intern
+    return {
+        "index": [q.index for q in quads],
+        "operator": [intern(q.operator) for q in quads],
+        "arg1": [intern(q.arg1) for q in quads],
+        "arg2": [intern(q.arg2) for q in quads],
+        "result": [intern(q.result) for q in quads],
+        "quadruple_type": [intern(q.quadruple_type.value) for q in quads],
+        "line": [-1 if q.line is None else q.line for q in quads],
+        "data_type": [intern(q.data_type.value if q.data_type else None) for q in quads],
+    }
+
+def encode_ast(root: ASTNode, table: StringTable) -> Dict[str, List[int]]:
+    """AST en preorden: cada nodo guarda cuántos hijos tiene (-1 si children es None)"""
+    intern = table.intern
+    columns = {"type": [], "value": [], "children": [], "line": [], "data_type": []}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        columns["type"].append(intern(node.type))
+        columns["value"].append(intern(node.value))
+        columns["children"].append(-1 if node.children is None else len(node.children))
+        columns["line"].append(-1 if node.line is None else node.line)
+        columns["data_type"].append(intern(node.data_type.value if node.data_type else None))
+        if node.children:
+            stack.extend(reversed(node.children))
+    return columns
+
+def build_preorder(counts: List[int], make: Callable[[int, Optional[list]], Any]) -> Any:
+    """Arma un árbol guardado en preorden con la cantidad de hijos de cada nodo (-1 si
+    children es None), sin recursión: make(i, children) crea el nodo i"""
+    # Preorden al revés: los hijos de cada nodo ya están armados, en la pila, al revés
+    built: list = []
+    for i in range(len(counts) - 1, -1, -1):
+        count = counts[i]
+        if count < 0:
+            children = None
+        else:
+            children = built[len(built) - count:][::-1]
+            del built[len(built) - count:]
+        built.append(make(i, children))
+    return built[0]
+
+def decode_ast(columns: Dict[str, List[int]], strings: List[str]) -> ASTNode:
+    """Inverso de encode_ast: arma el árbol de ASTNode sin recursión"""
+    types, values, lines, data_types = columns["type"], columns["value"], columns["line"], columns["data_type"]
+    return build_preorder(columns["children"], lambda i, children: ASTNode.model_construct(
+        type=strings[types[i]], value=strings[values[i]] if values[i] >= 0 else None,
+        children=children, line=lines[i] if lines[i] >= 0 else None,
+        data_type=DataType(strings[data_types[i]]) if data_types[i] >= 0 else None, start=None, end=None))
+
+def encode_symbol_table(root: SymbolTable, table: StringTable) -> Dict[str, list]:
+    """Scopes en preorden, como encode_ast: cada uno guarda cuántos hijos tiene y
+    sus símbolos (planos) como dicts"""
+    intern = table.intern
+    columns = {"scope_name": [], "level": [], "children": [], "symbols": []}
+    stack = [root]
+    while stack:
+        scope = stack.pop()
+        columns["scope_name"].append(intern(scope.scope_name))
+        columns["level"].append(scope.level)
+        columns["children"].append(len(scope.children))
+        columns["symbols"].append([symbol.model_dump() for symbol in scope.symbols.values()])
+        stack.extend(reversed(scope.children))
+    return columns
+
+def decode_symbol_table(columns: Dict[str, list], strings: List[str]) -> SymbolTable:
+    """Inverso de encode_symbol_table: arma el árbol de SymbolTable sin recursión"""
+    names, levels, symbols = columns["scope_name"], columns["level"], columns["symbols"]
+    return build_preorder(columns["children"], lambda i, children: SymbolTable.model_construct(
+        symbols={symbol["name"]: Symbol.model_construct(**symbol) for symbol in symbols[i]},
+        scope_name=strings[names[i]], level=levels[i], children=children))
+
+def tree_json(root: Any, head: Callable[[Any], str], tail: Callable[[Any], str]) -> str:
+    """JSON de un árbol de modelos con children, sin recursión: head(nodo) es el
+    texto hasta '"children":' y tail(nodo) lo que sigue a la lista de hijos"""
+    out: List[str] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if type(node) is str:
+            out.append(node)
+            continue
+        out.append(head(node))
+        children = node.children
+        if children is None:
+            out.append("null")
+            out.append(tail(node))
+            continue
+        out.append("[")
+        stack.append("]" + tail(node))
+        for n in range(len(children) - 1, -1, -1):
+            stack.append(children[n])
+            if n:
+                stack.append(",")
+    return "".join(out)
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def ast_json(root: ASTNode) -> str:
+    """Igual que root.model_dump_json(), pero sin el límite de profundidad del serializador"""
+    return tree_json(
+        root,
+        lambda node: f'{{"type":{dumps(node.type)},"value":{dumps(node.value)},"children":',
+        lambda node: f',"line":{dumps(node.line)},"data_type":{dumps(node.data_type.value if node.data_type else None)}}}')
+
+def symbol_table_json(root: SymbolTable) -> str:
+    """Igual que root.model_dump_json(), pero sin el límite de profundidad del serializador"""
+    return tree_json(
+        root,
+        lambda scope: ('{"symbols":{' + ",".join(f"{dumps(name)}:{symbol.model_dump_json()}" for name, symbol in scope.symbols.items())
+                       + f'}},"scope_name":{dumps(scope.scope_name)},"level":{dumps(scope.level)},"children":'),
+        lambda scope: "}")
+
+# Campos con árboles anidados de CompileResponse y PhaseChunk, y cómo escribirlos
+TREE_FIELDS = {"ast": ast_json, "symbol_table": symbol_table_json}
+
+def render_json(model: Any, exclude_none: bool = False) -> str:
+    """JSON de una CompileResponse o un PhaseChunk. La serialización de pydantic es
+    recursiva y falla con un AST o una tabla de símbolos hondos (cientos de bloques
+    anidados), así que esos dos campos se escriben aparte (quedan al final)."""
+    flat = model.model_dump_json(exclude=set(TREE_FIELDS), exclude_none=exclude_none)
+    trees = []
+    for name, write in TREE_FIELDS.items():
+        value = getattr(model, name)
+        if value is not None:
+            trees.append(f'"{name}":{write(value)}')
+        elif not exclude_none:
+            trees.append(f'"{name}":null')
+    if not trees:
+        return flat
+    return flat[:-1] + ("," if flat != "{}" else "") + ",".join(trees) + "}"
+
+class PackedResponse(NamedTuple):
+    """CompileResponse sin árboles anidados, para mandarla entre procesos: pickle
+    (igual que la serialización de pydantic) es recursivo y un AST o una tabla de
+    símbolos hondos lo desbordan. Los árboles van como columnas en preorden."""
+    response: CompileResponse
+    ast: Optional[Dict[str, List[int]]]
+    symbol_table: Optional[Dict[str, list]]
+    strings: List[str]
+
+def pack_response(response: CompileResponse) -> PackedResponse:
+    table = StringTable()
+    return PackedResponse(
+        response.model_copy(update={"ast": None, "symbol_table": None}),
+        encode_ast(response.ast, table) if response.ast is not None else None,
+        encode_symbol_table(response.symbol_table, table) if response.symbol_table is not None else None,
+        table.strings,
+    )
+
+def unpack_response(packed: PackedResponse) -> CompileResponse:
+    """Inverso de pack_response (los árboles se arman en este proceso, sin recursión)"""
+    update = {}
+    if packed.ast is not None:
+        update["ast"] = decode_ast(packed.ast, packed.strings)
+    if packed.symbol_table is not None:
+        update["symbol_table"] = decode_symbol_table(packed.symbol_table, packed.strings)
+    return packed.response.model_copy(update=update) if update else packed.response
+
+def encode_compact(response: CompileResponse) -> Dict[str, Any]:
+    """Convierte la respuesta a columnas paralelas con una tabla de cadenas compartida"""
+    table = StringTable()
+    payload = response.model_dump(exclude={"tokens", "ast", "symbol_table", "intermediate_code", "optimized_code"})
+    payload["encoding"] = COMPACT_VERSION
+    payload["tokens"] = encode_tokens(response.tokens, table) if response.tokens is not None else None
+    payload["ast"] = encode_ast(response.ast, table) if response.ast is not None else None
+    payload["symbol_table"] = (encode_symbol_table(response.symbol_table, table)
+                               if response.symbol_table is not None else None)
+    payload["intermediate_code"] = (encode_quadruples(response.intermediate_code, table)
+                                    if response.intermediate_code is not None else None)
+    payload["optimized_code"] = (encode_quadruples(response.optimized_code, table)
+                                 if response.optimized_code is not None else None)
+    payload["strings"] = table.strings
+    return payload
+
+def decode_compact(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverso de encode_compact: devuelve el mismo dict que CompileResponse.model_dump()"""
+    strings = payload["strings"]
+
+    def s(idx: int) -> Optional[str]:
+        return None if idx < 0 else strings[idx]
+
+    def quads(cols):
+        if cols is None:
+            return None
+        return [
+            {"index": cols["index"][i], "operator": s(cols["operator"][i]), "arg1": s(cols["arg1"][i]),
+             "arg2": s(cols["arg2"][i]), "result": s(cols["result"][i]),
+             "quadruple_type": s(cols["quadruple_type"][i]),
+             "line": None if cols["line"][i] < 0 else cols["line"][i],
+             "data_type": s(cols["data_type"][i])}
+            for i in range(len(cols["index"]))
+        ]
+
+    def ast(cols):
+        if cols is None:
+            return None
+        return build_preorder(cols["children"], lambda i, children: {
+            "type": s(cols["type"][i]), "value": s(cols["value"][i]), "children": children,
+            "line": None if cols["line"][i] < 0 else cols["line"][i],
+            "data_type": s(cols["data_type"][i]),
+        })
+
+    def symbol_table(cols):
+        if cols is None:
+            return None
+        return build_preorder(cols["children"], lambda i, children: {
+            "symbols": {symbol["name"]: symbol for symbol in cols["symbols"][i]},
+            "scope_name": s(cols["scope_name"][i]), "level": cols["level"][i], "children": children,
+        })
+
+    result = {k: v for k, v in payload.items() if k not in ("encoding", "strings")}
+    tokens = payload["tokens"]
+    result["tokens"] = None if tokens is None else [
+        {"type": s(tokens["type"][i]), "value": s(tokens["value"][i]),
+         "line": tokens["line"][i], "column": tokens["column"][i]}
+        for i in range(len(tokens["type"]))
+    ]
+    result["ast"] = ast(payload["ast"])
+    result["symbol_table"] = symbol_table(payload["symbol_table"])
+    result["intermediate_code"] = quads(payload["intermediate_code"])
+    result["optimized_code"] = quads(payload["optimized_code"])
+    return result
+
+def negotiate(accept: Optional[str]) -> str:
+    """Elige el tipo de contenido según Accept; JSON normal si no se pide otro"""
+    if not accept:
+        return JSON_MEDIA_TYPE
+    for part in accept.split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in MSGPACK_MEDIA_TYPES:
+            return MSGPACK_MEDIA_TYPES[0]
+        if media_type == COMPACT_MEDIA_TYPE:
+            return COMPACT_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+def render(response: CompileResponse, media_type: str) -> bytes:
+    """Serializa la respuesta en formato compacto (JSON o MessagePack)"""
+    payload = encode_compact(response)
+    if media_type == COMPACT_MEDIA_TYPE:
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    if msgpack is None:
+        raise RuntimeError("El formato MessagePack requiere el paquete 'msgpack'")
+    return msgpack.packb(payload, use_bin_type=True, default=str)
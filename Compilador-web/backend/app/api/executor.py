@@ -0,0 +1,295 @@
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import AsyncIterator, Callable, List, Optional, Set
+import asyncio
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger(__name__)
+
+# Modo de ejecución del pipeline:
+#   "process" -> procesos worker precalentados (usa todos los núcleos)
+#   "thread"  -> pool de hilos (no bloquea el event loop, pero comparte el GIL)
+#   "inline"  -> se ejecuta directamente en el event loop (comportamiento original)
+EXECUTOR_MODE = os.environ.get("COMPILER_EXECUTOR", "process").lower()
+EXECUTOR_WORKERS = int(os.environ.get("COMPILER_WORKERS", os.cpu_count() or 1))
+COMPILE_TIMEOUT = float(os.environ.get("COMPILER_TIMEOUT", 30))
+# Espera antes de reintentar el reemplazo de un worker que no pudo arrancar
+RESPAWN_DELAY = float(os.environ.get("COMPILER_RESPAWN_DELAY", 1))
+
+# Los workers se arrancan con spawn: un fork copiaría el estado del proceso
+# principal (hilos de espera, locks tomados, el event loop) en el hijo
+mp_context = multiprocessing.get_context("spawn")
+
+class CompilationTimeout(Exception):
+    """La compilación superó el tiempo límite de pared"""
+    pass
+
+class WorkerCrashed(Exception):
+    """El proceso worker terminó en medio de un trabajo"""
+    pass
+
+def warm_worker():
+    """Inicializador de cada worker: importa los módulos del compilador una sola vez"""
+    import app.compiler.pipeline  # noqa: F401
+
+def ping() -> int:
+    return os.getpid()
+
+def worker_main(conn: Connection):
+    """Bucle de un proceso worker: recibe (fn, args, streaming) y responde por conn.
+
+    Un trabajo normal responde ("ok", resultado); uno streaming (fn devuelve un
+    iterador) manda ("item", x) por cada elemento y al final ("end", None). Un
+    error responde ("error", excepción). Si el proceso principal cierra su extremo
+    del pipe, recv lanza EOFError y el worker termina.
+    """
+    warm_worker()
+    conn.send(("ok", os.getpid()))  # Listo
+    while True:
+        try:
+            fn, args, streaming = conn.recv()
+        except EOFError:
+            return
+        try:
+            if streaming:
+                for item in fn(*args):
+                    conn.send(("item", item))
+                conn.send(("end", None))
+            else:
+                conn.send(("ok", fn(*args)))
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:  # La excepción no se puede serializar
+                conn.send(("error", RuntimeError(str(e))))
+
+class Worker:
+    """Proceso worker con su propio pipe: se puede matar sin tocar a los demás"""
+
+    def __init__(self):
+        self.conn, child_conn = mp_context.Pipe()
+        self.process = mp_context.Process(target=worker_main, args=(child_conn,), name="compiler-worker")
+        self.process.start()
+        child_conn.close()
+
+    def receive(self):
+        """Siguiente mensaje del worker (bloquea; se llama desde un hilo de espera)"""
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            raise WorkerCrashed("El worker de compilación terminó inesperadamente")
+
+    def request(self, fn: Callable, args: tuple, streaming: bool):
+        """Manda un trabajo y espera el primer mensaje de respuesta"""
+        self.conn.send((fn, args, streaming))
+        return self.receive()
+
+    def kill(self):
+        self.process.terminate()
+        self.conn.close()
+
+def wait_ready(worker: Worker) -> Worker:
+    """Espera a que el worker termine de importar el compilador"""
+    try:
+        worker.receive()
+    except WorkerCrashed:
+        worker.kill()
+        raise
+    return worker
+
+class CompilationExecutor:
+    """Envía cada compilación fuera del event loop.
+
+    En modo process cada worker es un proceso propio y atiende un trabajo a la
+    vez: los libres esperan en una cola. Si un trabajo supera el tiempo límite (o
+    se cancela a medias) solo se mata su proceso y se reemplaza en segundo plano;
+    los demás trabajos en curso no se enteran. Si el reemplazo falla se registra y
+    se reintenta, para que el pool no se achique. Las esperas bloqueantes (arranque
+    de workers y lectura de los pipes) corren en hilos, nunca en el event loop.
+    """
+
+    def __init__(self, mode: str = EXECUTOR_MODE, workers: int = EXECUTOR_WORKERS,
+                 timeout: float = COMPILE_TIMEOUT):
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        # Modo thread: el pool que compila; modo process: los hilos que leen los pipes
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self.idle: Optional[asyncio.Queue] = None
+        self.processes: List[Worker] = []
+        # Los procesos se crean de a uno; la importación del compilador sí se solapa
+        self.spawning = asyncio.Lock()
+        # Reemplazos en curso (referencias fuertes para que no los recolecte el GC)
+        self.respawns: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Arranca todos los workers para que lleguen calientes"""
+        if self.mode == "inline" or self.pool is not None:
+            return
+        loop = asyncio.get_running_loop()
+
+        if self.mode == "thread":
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+            # Un ping por worker fuerza la creación de todos los hilos
+            await asyncio.gather(*[loop.run_in_executor(self.pool, ping) for _ in range(self.workers)])
+        else:
+            # Un hilo de espera por worker: cada trabajo en curso ocupa uno
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="compiler-wait")
+            self.idle = asyncio.Queue()
+            await asyncio.gather(*[self.add_worker() for _ in range(self.workers)])
+        logger.info("Executor '%s' listo con %d workers", self.mode, self.workers)
+
+    async def add_worker(self):
+        loop = asyncio.get_running_loop()
+        async with self.spawning:
+            if self.idle is None:  # Se apagó antes de arrancar
+                return
+            worker = await loop.run_in_executor(None, Worker)
+        await loop.run_in_executor(None, wait_ready, worker)
+        if self.idle is None:  # Se apagó mientras arrancaba
+            worker.kill()
+            return
+        self.processes.append(worker)
+        self.idle.put_nowait(worker)
+
+    def replace(self, worker: Worker):
+        """Mata al worker y arranca otro en segundo plano"""
+        worker.kill()
+        if worker in self.processes:
+            self.processes.remove(worker)
+        if self.idle is not None:
+            self.respawn()
+
+    def respawn(self, delay: float = 0.0):
+        """Arranca un worker nuevo en segundo plano; respawned atiende el resultado"""
+        async def task():
+            if delay:
+                await asyncio.sleep(delay)
+            await self.add_worker()
+
+        pending = asyncio.ensure_future(task())
+        self.respawns.add(pending)
+        pending.add_done_callback(self.respawned)
+
+    def respawned(self, task: asyncio.Task):
+        """Si el reemplazo falló lo registra y lo reintenta"""
+        self.respawns.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        logger.error("No se pudo reemplazar un worker de compilación; se reintenta en %s s",
+                     RESPAWN_DELAY, exc_info=task.exception())
+        if self.idle is not None:
+            self.respawn(RESPAWN_DELAY)
+
+    def shutdown(self):
+        for worker in self.processes:
+            worker.kill()
+        self.processes = []
+        self.idle = None
+        for pending in list(self.respawns):
+            pending.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def limit(self, timeout: Optional[float]) -> Optional[float]:
+        timeout = self.timeout if timeout is None else timeout
+        return timeout or None
+
+    async def acquire(self) -> Worker:
+        if self.idle is None:
+            await self.start()
+        return await self.idle.get()
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None):
+        """Ejecuta fn(*args) fuera del event loop respetando el tiempo límite"""
+        timeout = self.limit(timeout)
+
+        if self.mode == "inline":
+            return fn(*args)
+
+        loop = asyncio.get_running_loop()
+        if self.mode == "thread":
+            if self.pool is None:
+                await self.start()
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(self.pool, fn, *args), timeout=timeout)
+            except asyncio.TimeoutError:
+                # Los hilos no se pueden matar: el trabajo sigue hasta terminar
+                raise CompilationTimeout(f"La compilación superó el límite de {timeout} s")
+
+        worker = await self.acquire()
+        clean = False
+        try:
+            status, value = await asyncio.wait_for(
+                loop.run_in_executor(self.pool, worker.request, fn, args, False), timeout=timeout)
+            clean = True
+        except asyncio.TimeoutError:
+            raise CompilationTimeout(f"La compilación superó el límite de {timeout} s")
+        finally:
+            if clean:
+                self.idle.put_nowait(worker)
+            else:
+                self.replace(worker)
+        if status == "error":
+            raise value
+        return value
+
+    async def stream(self, fn: Callable, *args, timeout: Optional[float] = None) -> AsyncIterator:
+        """Como run, pero fn devuelve un iterador y sus elementos se entregan a medida
+        que el worker los produce. El tiempo límite cuenta para el trabajo completo."""
+        timeout = self.limit(timeout)
+
+        if self.mode == "inline":
+            for item in fn(*args):
+                yield item
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
+
+        def remaining() -> Optional[float]:
+            return max(0.0, deadline - loop.time()) if deadline is not None else None
+
+        if self.mode == "thread":
+            if self.pool is None:
+                await self.start()
+            items = iter(fn(*args))
+            while True:
+                try:
+                    item = await asyncio.wait_for(loop.run_in_executor(self.pool, next, items, StopIteration),
+                                                  timeout=remaining())
+                except asyncio.TimeoutError:
+                    raise CompilationTimeout(f"La compilación superó el límite de {timeout} s")
+                if item is StopIteration:
+                    return
+                yield item
+
+        worker = await self.acquire()
+        clean = False
+        try:
+            receive = (worker.request, fn, args, True)
+            while True:
+                try:
+                    status, value = await asyncio.wait_for(loop.run_in_executor(self.pool, *receive),
+                                                           timeout=remaining())
+                except asyncio.TimeoutError:
+                    raise CompilationTimeout(f"La compilación superó el límite de {timeout} s")
+                receive = (worker.receive,)
+                if status == "error":
+                    clean = True
+                    raise value
+                if status == "end":
+                    clean = True
+                    return
+                yield value
+        finally:
+            # Si el consumidor abandonó el stream el worker sigue mandando: se reemplaza
+            if clean:
+                self.idle.put_nowait(worker)
+            else:
+                self.replace(worker)
+
+compilation_executor = CompilationExecutor()
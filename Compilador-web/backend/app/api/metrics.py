@@ -0,0 +1,84 @@
+from typing import Dict, List, Optional, Tuple
+import bisect
+import threading
+
+# Límites (segundos) de los buckets de los histogramas
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Histogram:
+    """Histograma acumulativo con etiquetas, al estilo de Prometheus"""
+
+    def __init__(self, name: str, help_text: str, label_name: str,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self.buckets = buckets
+        # etiqueta -> (conteos por bucket, suma, total)
+        self.series: Dict[str, List] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label: str, value: float):
+        with self.lock:
+            series = self.series.get(label)
+            if series is None:
+                series = self.series[label] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label, (counts, total_sum, total_count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{self.label_name}="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{self.label_name}="{label}",le="+Inf"}} {total_count}')
+                lines.append(f'{self.name}_sum{{{self.label_name}="{label}"}} {total_sum}')
+                lines.append(f'{self.name}_count{{{self.label_name}="{label}"}} {total_count}')
+        return lines
+
+phase_duration = Histogram(
+    "compiler_phase_duration_seconds",
+    "Duración de cada fase del compilador (los pases del optimizador como optimizer.<pase>)",
+    "phase"
+)
+request_duration = Histogram(
+    "compiler_request_duration_seconds",
+    "Duración total de cada compilación servida, separada por acierto/fallo del caché",
+    "cache"
+)
+
+def record_compilation(metrics: Optional[Dict], cached: bool, elapsed: float):
+    """Agrega los tiempos de una compilación servida (elapsed en segundos) a los histogramas"""
+    request_duration.observe("hit" if cached else "miss", elapsed)
+    if cached or not metrics:
+        return  # Un acierto no ejecutó ninguna fase
+    for phase, phase_ms in (metrics.get("phase_timings") or {}).items():
+        phase_duration.observe(phase, phase_ms / 1000)
+
+def server_timing_header(metrics: Optional[Dict]) -> str:
+    """Formatea los tiempos por fase como cabecera Server-Timing"""
+    timings = (metrics or {}).get("phase_timings") or {}
+    entries = [f"{phase};dur={elapsed:.3f}" for phase, elapsed in timings.items()]
+    if metrics and "compilation_time" in metrics:
+        entries.append(f"total;dur={metrics['compilation_time']:.3f}")
+    return ", ".join(entries)
+
+def render_prometheus(cache_stats: Dict[str, int]) -> str:
+    """Exposición en formato texto de Prometheus"""
+    lines = []
+    for name, value in cache_stats.items():
+        if name in ("cache_entries", "cache_bytes"):
+            metric, kind = f"compiler_{name}", "gauge"
+        else:
+            metric, kind = f"compiler_{name}_total", "counter"
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.append(f"{metric} {value}")
+    lines.extend(phase_duration.render())
+    lines.extend(request_duration.render())
+    return "\n".join(lines) + "\n"
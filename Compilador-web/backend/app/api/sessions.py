@@ -0,0 +1,48 @@
+from app.compiler.incremental import CompileSession
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import os
+import threading
+import uuid
+
+DEFAULT_MAX_SESSIONS = int(os.environ.get("COMPILER_MAX_SESSIONS", 256))
+
+class SessionStore:
+    """Sesiones de compilación incremental por editor, con desalojo LRU.
+
+    Cada sesión lleva su propio lock: las ediciones de una misma sesión se aplican
+    en orden, pero sesiones distintas pueden compilarse a la vez.
+    """
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, Tuple[CompileSession, threading.Lock]]" = OrderedDict()
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def create(self, code: str, session_id: Optional[str] = None) -> Tuple[str, CompileSession, threading.Lock]:
+        session_id = session_id or uuid.uuid4().hex
+        entry = (CompileSession(code), threading.Lock())
+        with self.lock:
+            self.sessions.pop(session_id, None)
+            self.sessions[session_id] = entry
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evictions += 1
+        return (session_id,) + entry
+
+    def get(self, session_id: str) -> Optional[Tuple[CompileSession, threading.Lock]]:
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is not None:
+                self.sessions.move_to_end(session_id)
+            return entry
+
+    def close(self, session_id: str) -> bool:
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions_open": len(self.sessions), "sessions_evicted": self.evictions}
+
+session_store = SessionStore()
@@ -0,0 +1,220 @@
+from app.models.schemas import ASTNode, DataType
+from typing import Dict, List, Optional, Tuple
+
+# Tipos de nodo: el índice en KIND_NAMES es el valor que guarda el arena
+KIND_NAMES = (
+    "Program", "FunctionDeclaration", "Block", "VariableDeclaration", "Assignment",
+    "ExpressionStatement", "IfStatement", "WhileStatement", "ReturnStatement",
+    "PrintStatement", "BinaryExpression", "UnaryExpression", "Identifier", "Literal",
+    "StringLiteral", "BooleanLiteral",
+)
+(PROGRAM, FUNCTION_DECLARATION, BLOCK, VARIABLE_DECLARATION, ASSIGNMENT,
+ EXPRESSION_STATEMENT, IF_STATEMENT, WHILE_STATEMENT, RETURN_STATEMENT,
+ PRINT_STATEMENT, BINARY_EXPRESSION, UNARY_EXPRESSION, IDENTIFIER, LITERAL,
+ STRING_LITERAL, BOOLEAN_LITERAL) = range(len(KIND_NAMES))
+
+# Hojas: en ASTNode tienen children None (los demás tienen lista, aunque vacía)
+LEAF_KINDS = frozenset({IDENTIFIER, LITERAL, STRING_LITERAL, BOOLEAN_LITERAL})
+
+# Ausencia de nodo, de valor o de posición en los arreglos
+NONE = -1
+# El parser crea primero el Program: es siempre el nodo 0
+ROOT = 0
+
+class AstArena:
+    """AST plano para las fases internas: cada nodo es un índice en arreglos
+    paralelos (tipo, valor, primer hijo, siguiente hermano, línea, offsets y tipo de
+    dato) y los valores son índices en un pool de strings internados. No hay un objeto por
+    nodo; el árbol de ASTNode se arma solo si se pide el artefacto ast (to_ast).
+    """
+
+    def __init__(self):
+        self.kind: List[int] = []
+        self.value: List[int] = []
+        self.first_child: List[int] = []
+        self.next_sibling: List[int] = []
+        # Último hijo de cada nodo, para agregar hijos sin recorrer la lista
+        self.last_child: List[int] = []
+        self.line: List[int] = []
+        self.start: List[int] = []
+        self.end: List[int] = []
+        # DataType de cada expresión (lo llena el Parser; None si no se sabe)
+        self.data_type: List[Optional[DataType]] = []
+        self.strings: List[str] = []
+        self.string_ids: Dict[str, int] = {}
+        # Arenas armados por piezas que se mueven (ver add_piece): pieza de cada nodo y
+        # desplazamiento de offsets y líneas de cada pieza. None: posiciones tal cual
+        self.piece: Optional[List[int]] = None
+        self.piece_delta: List[int] = []
+        self.piece_line_delta: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def intern(self, text: Optional[str]) -> int:
+        if text is None:
+            return NONE
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            string_id = self.string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def add(self, kind: int, value: Optional[str] = None, line: int = NONE,
+            start: int = NONE, end: int = NONE) -> int:
+        node = len(self.kind)
+        self.kind.append(kind)
+        self.value.append(self.intern(value))
+        self.first_child.append(NONE)
+        self.next_sibling.append(NONE)
+        self.last_child.append(NONE)
+        self.line.append(line)
+        self.start.append(start)
+        self.end.append(end)
+        self.data_type.append(None)
+        return node
+
+    def append_child(self, parent: int, child: int):
+        last = self.last_child[parent]
+        if last == NONE:
+            self.first_child[parent] = child
+        else:
+            self.next_sibling[last] = child
+        self.last_child[parent] = child
+
+    def truncate(self, size: int):
+        """Descarta los nodos desde size (los de una construcción que el parser abandonó;
+        ningún nodo anterior los enlaza)"""
+        for column in (self.kind, self.value, self.first_child, self.next_sibling, self.last_child,
+                       self.line, self.start, self.end, self.data_type):
+            del column[size:]
+
+    # --- LECTURA ---
+
+    def text(self, node: int) -> Optional[str]:
+        """Valor del nodo (nombre, literal, operador o tipo)"""
+        value = self.value[node]
+        return self.strings[value] if value != NONE else None
+
+    def children(self, node: int) -> List[int]:
+        result = []
+        child = self.first_child[node]
+        while child != NONE:
+            result.append(child)
+            child = self.next_sibling[child]
+        return result
+
+    def line_of(self, node: int) -> int:
+        """Línea del nodo (NONE si no tiene), con el desplazamiento de su pieza"""
+        line = self.line[node]
+        if line != NONE and self.piece is not None:
+            line += self.piece_line_delta[self.piece[node]]
+        return line
+
+    def span(self, node: int) -> Tuple[int, int]:
+        """Offsets [start, end) del nodo (NONE si no tiene), con el desplazamiento de su pieza"""
+        start, end = self.start[node], self.end[node]
+        if start != NONE and self.piece is not None:
+            delta = self.piece_delta[self.piece[node]]
+            start, end = start + delta, end + delta
+        return start, end
+
+    def child(self, node: int, index: int) -> int:
+        """Hijo número index (NONE si no tiene tantos)"""
+        child = self.first_child[node]
+        while index and child != NONE:
+            child = self.next_sibling[child]
+            index -= 1
+        return child
+
+    # --- CONVERSIONES ---
+
+    def shift(self, delta: int, line_delta: int):
+        """Desplaza offsets y líneas de todos los nodos"""
+        if delta:
+            self.start = [s + delta if s != NONE else s for s in self.start]
+            self.end = [e + delta if e != NONE else e for e in self.end]
+        if line_delta:
+            self.line = [l + line_delta if l != NONE else l for l in self.line]
+
+    def add_piece(self, other: "AstArena", first: int) -> Tuple[int, int]:
+        """Copia los nodos de other desde first como una pieza nueva, que después se
+        mueve entera con move_piece sin tocar sus nodos. Devuelve el desplazamiento
+        de los índices copiados y el número de pieza."""
+        if self.piece is None:
+            # Pieza 0: los nodos que ya estaban, fijos
+            self.piece = [0] * len(self.kind)
+            self.piece_delta, self.piece_line_delta = [0], [0]
+        piece = len(self.piece_delta)
+        self.piece_delta.append(0)
+        self.piece_line_delta.append(0)
+        self.piece.extend([piece] * (len(other.kind) - first))
+        return self.extend(other, first), piece
+
+    def move_piece(self, piece: int, delta: int, line_delta: int):
+        """Desplaza offsets y líneas de todos los nodos de la pieza (en O(1))"""
+        self.piece_delta[piece] = delta
+        self.piece_line_delta[piece] = line_delta
+
+    def extend(self, other: "AstArena", first: int = 0) -> int:
+        """Copia los nodos de other desde first al final; devuelve cuánto se desplazaron
+        sus índices (los enlaces a nodos anteriores a first no se copian bien: first
+        debe empezar un subárbol que no los use)"""
+        offset = len(self.kind) - first
+        strings = [self.intern(s) for s in other.strings]
+
+        def moved(links: List[int]) -> List[int]:
+            return [link + offset if link != NONE else NONE for link in links[first:]]
+
+        self.kind.extend(other.kind[first:])
+        self.value.extend(strings[value] if value != NONE else NONE for value in other.value[first:])
+        self.first_child.extend(moved(other.first_child))
+        self.next_sibling.extend(moved(other.next_sibling))
+        self.last_child.extend(moved(other.last_child))
+        self.line.extend(other.line[first:])
+        self.start.extend(other.start[first:])
+        self.end.extend(other.end[first:])
+        self.data_type.extend(other.data_type[first:])
+        return offset
+
+    def to_ast(self, root: int = ROOT) -> ASTNode:
+        """Árbol de ASTNode para la respuesta de la API (sin recursión)"""
+        strings, values, kinds = self.strings, self.value, self.kind
+        lines, starts, ends, data_types = self.line, self.start, self.end, self.data_type
+        first_child, next_sibling = self.first_child, self.next_sibling
+        pieced = self.piece is not None
+
+        # Preorden; al recorrerlo al revés cada hijo está armado antes que su padre
+        order = [root]
+        for node in order:
+            child = first_child[node]
+            while child != NONE:
+                order.append(child)
+                child = next_sibling[child]
+
+        models: Dict[int, ASTNode] = {}
+        for node in reversed(order):
+            kind = kinds[node]
+            if kind in LEAF_KINDS:
+                children = None
+            else:
+                children = []
+                child = first_child[node]
+                while child != NONE:
+                    children.append(models.pop(child))
+                    child = next_sibling[child]
+            value = values[node]
+            if pieced:
+                line, (start, end) = self.line_of(node), self.span(node)
+            else:
+                line, start, end = lines[node], starts[node], ends[node]
+            models[node] = ASTNode.construct(
+                type=KIND_NAMES[kind],
+                value=strings[value] if value != NONE else None,
+                children=children,
+                line=line if line != NONE else None,
+                data_type=data_types[node],
+                start=start if start != NONE else None,
+                end=end if start != NONE else None,
+            )
+        return models[root]
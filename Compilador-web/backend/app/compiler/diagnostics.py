@@ -0,0 +1,100 @@
+from app.models.schemas import CompilerPhase, Severity, DiagnosticInfo
+from typing import List, NamedTuple, Optional, Tuple
+import bisect
+
+class Diagnostic(NamedTuple):
+    """Error o advertencia emitido por una fase, con su posición en el código.
+
+    code identifica el tipo de diagnóstico (L = léxico, P = sintáctico,
+    S = semántico, G = generación) y no depende del texto del mensaje.
+    """
+    phase: CompilerPhase
+    severity: Severity
+    code: str
+    message: str
+    start: Optional[int] = None
+    end: Optional[int] = None
+
+    def __str__(self):
+        return self.message
+
+    def shifted(self, delta: int) -> "Diagnostic":
+        """El mismo diagnóstico desplazado delta caracteres"""
+        if self.start is None or not delta:
+            return self
+        return self._replace(start=self.start + delta, end=self.end + delta)
+
+def error(phase: CompilerPhase, code: str, message: str,
+          start: Optional[int] = None, end: Optional[int] = None) -> Diagnostic:
+    return Diagnostic(phase, Severity.ERROR, code, message, start, end)
+
+def warning(phase: CompilerPhase, code: str, message: str,
+            start: Optional[int] = None, end: Optional[int] = None) -> Diagnostic:
+    return Diagnostic(phase, Severity.WARNING, code, message, start, end)
+
+class SourceIndex:
+    """Convierte offsets en (línea, columna) con una tabla de inicios de línea.
+
+    La tabla se arma una vez en O(n); cada consulta es una búsqueda binaria.
+    """
+
+    def __init__(self, code: str):
+        line_starts = [0]
+        find = code.find
+        pos = find("\n")
+        while pos >= 0:
+            line_starts.append(pos + 1)
+            pos = find("\n", pos + 1)
+        self.line_starts = line_starts
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """Línea y columna (ambas desde 1) del offset"""
+        line = bisect.bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def line(self, offset: Optional[int]) -> int:
+        """Línea del offset, o 0 si el diagnóstico no tiene posición"""
+        if offset is None:
+            return 0
+        return self.position(offset)[0]
+
+    def info(self, diagnostic: Diagnostic) -> DiagnosticInfo:
+        line = column = 0
+        if diagnostic.start is not None:
+            line, column = self.position(diagnostic.start)
+        return DiagnosticInfo(
+            phase=diagnostic.phase, severity=diagnostic.severity, code=diagnostic.code,
+            message=diagnostic.message, start=diagnostic.start, end=diagnostic.end,
+            line=line, column=column
+        )
+
+class LineCursor(SourceIndex):
+    """SourceIndex sin tabla, para archivos enormes: cuenta saltos de línea desde la
+    última consulta, por bloques y sin copiar el código entero. Es O(n) en total si
+    las consultas llegan en orden creciente (si no, vuelve a contar desde el inicio).
+
+    code puede ser un str o un buffer de bytes (bytes, mmap).
+    """
+
+    CHUNK = 1 << 20
+
+    def __init__(self, code):
+        self.code = code
+        self.newline = "\n" if isinstance(code, str) else b"\n"
+        self.offset, self.line_num, self.line_start = 0, 1, 0
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        if offset < self.offset:
+            self.offset, self.line_num, self.line_start = 0, 1, 0
+        while self.offset < offset:
+            end = min(offset, self.offset + self.CHUNK)
+            piece = self.code[self.offset:end]
+            line_breaks = piece.count(self.newline)
+            if line_breaks:
+                self.line_num += line_breaks
+                self.line_start = self.offset + piece.rfind(self.newline) + 1
+            self.offset = end
+        return self.line_num, offset - self.line_start + 1
+
+def messages(diagnostics: List[Diagnostic]) -> List[str]:
+    return [d.message for d in diagnostics]
@@ -1,23 +1,51 @@
-from app.models.schemas import Quadruple, QuadrupleType, SymbolTable
-from typing import List, Dict, Tuple
+from app.models.schemas import QuadrupleType, SymbolTable, DataType
+from app.compiler.symbols import Scope, variables_by_scope
+from app.compiler.quadruples import QuadrupleStore, NONE, TEMPORARY, VARIABLE
+from app.compiler.trace import Tracer, default_tracer
+from typing import List, Dict, Tuple, Optional, Union
 
 class CodeGenerator:
-    def __init__(self, symbol_table: SymbolTable):
-        self.symbol_table = symbol_table
+    def __init__(self, symbol_table: Union[Scope, SymbolTable], tracer: Optional[Tracer] = None):
+        self.tracer = tracer or default_tracer
+        self.set_symbol_table(symbol_table)
         self.generated_code = []
         self.indent_level = 0
         self.temp_vars = set()
+        # Código que se está generando y cada string de su tabla ya formateado
+        self.code: Optional[QuadrupleStore] = None
+        self.operands: List[str] = []
         
-    def generate(self, quadruples: List[Quadruple]) -> str:
+    def set_symbol_table(self, symbol_table: Union[Scope, SymbolTable]):
+        """Tabla de la que salen las variables a declarar; se indexa una sola vez por
+        scope en vez de recorrerla entera por cada función"""
+        self.symbol_table = symbol_table
+        self.scope_variables = variables_by_scope(symbol_table)
+    
+    def generate(self, code: QuadrupleStore) -> str:
         """Genera código Python a partir de los cuádruplos"""
-        print("=== GENERANDO CÓDIGO OBJETO (Python) ===")
+        if self.tracer.info: self.tracer.emit("=== GENERANDO CÓDIGO OBJETO (Python) ===")
         
-        if not quadruples:
+        if not code:
             return "# No se pudo generar código\n"
         
         self.generated_code = []
+        self.generate_header()
+        
+        # Generar las funciones
+        self.generate_functions(code)
+        
+        self.generate_footer()
+        
+        code_str = "\n".join(self.generated_code)
         
-        # Generar encabezado del programa
+        if self.tracer.info:
+            self.tracer.emit("=== GENERACIÓN DE CÓDIGO COMPLETADA ===")
+            self.tracer.emit(f"Líneas de código generadas: {len(self.generated_code)}")
+        
+        return code_str
+    
+    def generate_header(self):
+        """Encabezado del programa y variables globales"""
         self.add_line("#!/usr/bin/env python3")
         self.add_line("# Código generado automáticamente por el compilador")
         self.add_line("")
@@ -25,51 +53,45 @@ class CodeGenerator:
         # Generar declaraciones de variables globales
         self.generate_variable_declarations()
         self.add_line("")
-        
-        # Generar las funciones
-        self.generate_functions(quadruples)
-        
-        # Generar llamada principal si existe main
+    
+    def generate_footer(self):
+        """Llamada principal si existe main"""
         self.add_line("if __name__ == \"__main__\":")
         self.indent_level += 1
         self.add_line("main()")
         self.indent_level -= 1
-        
-        code_str = "\n".join(self.generated_code)
-        
-        print("=== GENERACIÓN DE CÓDIGO COMPLETADA ===")
-        print(f"Líneas de código generadas: {len(self.generated_code)}")
-        
-        return code_str
     
     def generate_variable_declarations(self):
         """Genera declaraciones de variables globales"""
-        global_vars = []
-        
-        def collect_vars(table):
-            for symbol in table.symbols.values():
-                if symbol.symbol_type == "variable" and symbol.scope == "global":
-                    global_vars.append(symbol.name)
-            for child in table.children:
-                collect_vars(child)
-        
-        collect_vars(self.symbol_table)
+        global_vars = self.scope_variables.get("global", [])
         
         if global_vars:
             self.add_line("# Variables globales")
             for var in global_vars:
                 self.add_line(f"{var} = None")
     
-    def generate_functions(self, quadruples: List[Quadruple]):
+    def use_code(self, code: QuadrupleStore):
+        """Prepara code para generar: cada string de su tabla se formatea una sola vez"""
+        if code is not self.code or len(self.operands) != len(code.strings):
+            self.code = code
+            self.operands = [self.format_operand(text, kind) for text, kind in zip(code.strings, code.kind)]
+    
+    def operand(self, string_id: int) -> str:
+        """Operando ya formateado para Python"""
+        return self.operands[string_id] if string_id != NONE else "None"
+    
+    def generate_functions(self, code: QuadrupleStore):
         """Genera las funciones a partir de los cuádruplos"""
+        self.use_code(code)
+        types, results, text = code.quadruple_type, code.result, code.text
         current_function = None
         function_quads = []
         
-        for quad in quadruples:
+        for i in range(len(code)):
             
             # --- INICIO DE LA CORRECCIÓN ---
-            if (quad.quadruple_type == QuadrupleType.LABEL and 
-                quad.result.startswith("func_")): # <-- CORREGIDO (usa result)
+            if (types[i] is QuadrupleType.LABEL and 
+                text(results[i]).startswith("func_")): # <-- CORREGIDO (usa result)
                 
                 # Procesar función anterior si existe
                 if current_function:
@@ -78,7 +100,7 @@ class CodeGenerator:
                     self.add_line("")
                     function_quads = []
                 
-                current_function = quad.result.replace("func_", "") # <-- CORREGIDO (usa result)
+                current_function = text(results[i]).replace("func_", "") # <-- CORREGIDO (usa result)
                 self.add_line(f"def {current_function}():")
                 self.indent_level += 1
                 
@@ -88,7 +110,7 @@ class CodeGenerator:
             # --- FIN DE LA CORRECCIÓN ---
             
             elif current_function:
-                function_quads.append(quad)
+                function_quads.append(i)
         
         # Procesar la última función
         if current_function:
@@ -98,98 +120,98 @@ class CodeGenerator:
     
     def generate_local_variables(self, function_name: str):
         """Genera inicialización de variables locales"""
-        local_vars = []
-        
-        def find_local_vars(table):
-            for symbol in table.symbols.values():
-                if (symbol.symbol_type == "variable" and 
-                    symbol.scope == function_name):
-                    local_vars.append(symbol.name)
-            for child in table.children:
-                find_local_vars(child)
-        
-        find_local_vars(self.symbol_table)
-        
-        for var in local_vars:
+        for var in self.scope_variables.get(function_name, []):
             self.add_line(f"{var} = None")
     
-    def generate_function_code(self, function_name: str, quads: List[Quadruple]):
-        """Genera el código de una función específica"""
+    def generate_function_code(self, function_name: str, quads: List[int]):
+        """Genera el código de una función específica (quads son posiciones en self.code)"""
+        types, results = self.code.quadruple_type, self.code.result
         label_map = self.build_label_map(quads)
         i = 0
         
         while i < len(quads):
             quad = quads[i]
+            quad_type = types[quad]
             
             # Mapear etiquetas
-            if quad.result in label_map:
-                self.add_line(f"# {quad.result}")
+            if results[quad] in label_map:
+                self.add_line(f"# {self.code.text(results[quad])}")
             
             # Generar código según el tipo de cuádruplo
-            if quad.quadruple_type == QuadrupleType.ASSIGNMENT:
+            if quad_type is QuadrupleType.ASSIGNMENT:
                 self.generate_assignment(quad)
             
-            elif quad.quadruple_type == QuadrupleType.ARITHMETIC:
+            elif quad_type is QuadrupleType.ARITHMETIC:
                 self.generate_arithmetic(quad)
             
-            elif quad.quadruple_type == QuadrupleType.COMPARISON:
+            elif quad_type is QuadrupleType.COMPARISON:
                 self.generate_comparison(quad)
             
-            elif quad.quadruple_type == QuadrupleType.JUMP:
+            elif quad_type is QuadrupleType.JUMP:
                 i = self.generate_jump(quad, quads, i, label_map)
                 continue  # Saltar incremento normal
             
-            elif quad.quadruple_type == QuadrupleType.WRITE:
+            elif quad_type is QuadrupleType.WRITE:
                 self.generate_write(quad)
             
-            elif quad.quadruple_type == QuadrupleType.RETURN:
+            elif quad_type is QuadrupleType.RETURN:
                 self.generate_return(quad)
                 break  # Return termina la función
             
             i += 1
         
         # Si no hay return explícito, agregar uno implícito
-        if not any(q.quadruple_type == QuadrupleType.RETURN for q in quads):
+        if not any(types[q] is QuadrupleType.RETURN for q in quads):
             self.add_line("return None")
     
-    def generate_assignment(self, quad: Quadruple):
+    def generate_assignment(self, quad: int):
         """Genera código para asignación"""
-        rhs = self.format_operand(quad.arg1)
-        self.add_line(f"{quad.result} = {rhs}")
+        code = self.code
+        rhs = self.operand(code.arg1[quad])
+        self.add_line(f"{self.operand(code.result[quad])} = {rhs}")
     
-    def generate_arithmetic(self, quad: Quadruple):
+    def generate_arithmetic(self, quad: int):
         """Genera código para operaciones aritméticas"""
-        op1 = self.format_operand(quad.arg1)
-        op2 = self.format_operand(quad.arg2)
+        code = self.code
+        op1 = self.operand(code.arg1[quad])
+        op2 = self.operand(code.arg2[quad])
+        operator = code.strings[code.operator[quad]]
         
-        # Mapear operadores a Python
+        # Mapear operadores a Python (la división es entera salvo entre floats)
         op_map = {
             '+': '+', '-': '-', '*': '*', '/': '//'
         }
         
-        python_op = op_map.get(quad.operator, quad.operator)
-        self.add_line(f"{quad.result} = {op1} {python_op} {op2}")
+        if code.data_type[quad] is DataType.FLOAT:
+            python_op = operator
+        else:
+            python_op = op_map.get(operator, operator)
+        self.add_line(f"{self.operand(code.result[quad])} = {op1} {python_op} {op2}")
     
-    def generate_comparison(self, quad: Quadruple):
+    def generate_comparison(self, quad: int):
         """Genera código para comparaciones"""
-        op1 = self.format_operand(quad.arg1)
-        op2 = self.format_operand(quad.arg2)
+        code = self.code
+        op1 = self.operand(code.arg1[quad])
+        op2 = self.operand(code.arg2[quad])
+        operator = code.strings[code.operator[quad]]
         
         # Mapear operadores de comparación
         comp_map = {
             '>': '>', '<': '<', '>=': '>=', '<=': '<=', 
-            '==': '==', '!=': '!='
+            '==': '==', '!=': '!=',
+            '&&': 'and', '||': 'or'
         }
         
-        python_op = comp_map.get(quad.operator, quad.operator)
-        self.add_line(f"{quad.result} = {op1} {python_op} {op2}")
+        python_op = comp_map.get(operator, operator)
+        self.add_line(f"{self.operand(code.result[quad])} = {op1} {python_op} {op2}")
     
-    def generate_jump(self, quad: Quadruple, quads: List[Quadruple], current_index: int, label_map: Dict) -> int:
+    def generate_jump(self, quad: int, quads: List[int], current_index: int, label_map: Dict) -> int:
         """Genera código para saltos"""
+        code = self.code
         
-        if quad.operator == "if_false":
-            condition = self.format_operand(quad.arg1)
-            target_label = quad.result
+        if code.strings[code.operator[quad]] == "if_false":
+            condition = self.operand(code.arg1[quad])
+            target_label = code.text(code.result[quad])
             
             # (Nota: La lógica para reconstruir if/else es compleja.
             # Por ahora, solo traducimos la línea y evitamos el cuelgue)
@@ -204,42 +226,43 @@ class CodeGenerator:
             return current_index + 1
         
         else:  # Salto incondicional
-            self.add_line(f"pass  # Saltar a {quad.result}")
+            self.add_line(f"pass  # Saltar a {code.text(code.result[quad])}")
             
             # --- CORRECCIÓN 2 (LA CAUSA DEL BUCLE INFINITO) ---
             # Debe retornar el *siguiente* índice para avanzar el bucle
             return current_index + 1
     
-    def generate_write(self, quad: Quadruple):
+    def generate_write(self, quad: int):
         """Genera código para print"""
-        value = self.format_operand(quad.arg1)
+        value = self.operand(self.code.arg1[quad])
         self.add_line(f"print({value})")
     
-    def generate_return(self, quad: Quadruple):
+    def generate_return(self, quad: int):
         """Genera código para return"""
-        value = self.format_operand(quad.arg1) if quad.arg1 else "None"
+        arg1 = self.code.arg1[quad]
+        value = self.operand(arg1) if arg1 != NONE and self.code.strings[arg1] else "None"
         self.add_line(f"return {value}")
     
-    def format_operand(self, operand: str) -> str:
-        """Formatea un operando para Python"""
+    def format_operand(self, operand: str, kind: int) -> str:
+        """Formatea un operando para Python (constantes, temporales y variables se
+        escriben tal cual; los temporales se anotan en temp_vars). Un temporal con
+        el nombre de una variable del usuario (t1) se escribe como _t1 para no pisarla."""
         if operand is None:
             return "None"
-        elif operand.isdigit():
-            return operand
-        elif operand.startswith('"') and operand.endswith('"'):
-            return operand
-        elif operand.startswith('t'):
+        if kind == TEMPORARY:
+            variables = self.code.string_ids[VARIABLE] if self.code is not None else {}
+            while operand in variables:
+                operand = f"_{operand}"
             self.temp_vars.add(operand)
-            return operand
-        else:
-            return operand
+        return operand
     
-    def build_label_map(self, quads: List[Quadruple]) -> Dict[str, int]:
-        """Construye un mapa de etiquetas a índices"""
+    def build_label_map(self, quads: List[int]) -> Dict[int, int]:
+        """Construye un mapa de etiquetas (índice en la tabla de strings) a índices"""
+        types, results = self.code.quadruple_type, self.code.result
         label_map = {}
         for i, quad in enumerate(quads):
-            if quad.quadruple_type == QuadrupleType.LABEL:
-                label_map[quad.result] = i
+            if types[quad] is QuadrupleType.LABEL:
+                label_map[results[quad]] = i
         return label_map
     
     def add_line(self, line: str):
@@ -0,0 +1,473 @@
+from app.models.schemas import CompileRequest, SymbolTable, CompilerPhase, Artifact
+from app.compiler.lexer import Lexer, LexToken
+from app.compiler.parser import Parser
+from app.compiler.arena import AstArena, NONE, PROGRAM, ROOT
+from app.compiler.intermediate import IntermediateCodeGenerator
+from app.compiler.quadruples import QuadrupleStore
+from app.compiler.pipeline import CompilationRun
+from app.compiler.trace import Tracer
+from app.compiler.diagnostics import Diagnostic, error
+from typing import Dict, List, Optional, Tuple
+import bisect
+
+class InvalidEdit(ValueError):
+    """Una edición de la sesión cae fuera del texto"""
+    pass
+
+class RecordingGenerator(IntermediateCodeGenerator):
+    """Generador intermedio que anota las etiquetas que crea para poder renumerarlas"""
+
+    def __init__(self, symbol_table: SymbolTable, tracer: Optional[Tracer] = None):
+        super().__init__(symbol_table, tracer)
+        self.created_labels: List[Tuple[str, int]] = []
+
+    def new_label(self, prefix) -> int:
+        self.created_labels.append((prefix, self.label_counter))
+        return super().new_label(prefix)
+
+def offset_renames(temp_count: int, labels: List[Tuple[str, int]],
+                   temp_base: int, label_base: int) -> Dict[str, str]:
+    """Nombres nuevos de temporales (tN) y etiquetas (prefijo_N) generados con
+    contadores locales, para numerarlos a partir de temp_base y label_base (solo
+    se aplican a operandos de esas clases, no a variables con el mismo nombre)"""
+    renames: Dict[str, str] = {}
+    if temp_base:
+        for n in range(temp_count):
+            renames[f"t{n}"] = f"t{n + temp_base}"
+    if label_base:
+        for prefix, n in labels:
+            renames[f"{prefix}_{n}"] = f"{prefix}_{n + label_base}"
+    return renames
+
+def renumber_quadruples(code: QuadrupleStore, temp_count: int, labels: List[Tuple[str, int]],
+                        temp_base: int, label_base: int) -> QuadrupleStore:
+    """Desplaza temporales (tN) y etiquetas (prefijo_N) de un trozo de código
+    intermedio generado con contadores locales, para colocarlo tras los anteriores
+    (los índices de los cuádruplos son su posición y se desplazan solos)"""
+    if temp_base == 0 and label_base == 0:
+        return code
+    placed = QuadrupleStore()
+    placed.extend(code, offset_renames(temp_count, labels, temp_base, label_base))
+    return placed
+
+# Código intermedio de una función: (cuádruplos, temporales usados, etiquetas creadas)
+FunctionIR = Tuple[QuadrupleStore, int, List[Tuple[str, int]]]
+
+def merge_function_ir(pieces: List[FunctionIR]) -> Tuple[QuadrupleStore, int, int]:
+    """Une el código intermedio de varias funciones generadas por separado.
+
+    Cada pieza tiene contadores empezando en 0. El resultado numera cuádruplos,
+    temporales y etiquetas igual que si todo el programa se hubiera generado de
+    una sola vez.
+    """
+    merged = QuadrupleStore()
+    temp_base = label_base = 0
+    for code, temp_count, labels in pieces:
+        merged.extend(code, offset_renames(temp_count, labels, temp_base, label_base))
+        temp_base += temp_count
+        label_base += len(labels)
+    return merged, temp_base, label_base
+
+def generate_function_ir(arena: AstArena, function: int, tracer: Optional[Tracer] = None) -> FunctionIR:
+    """Código intermedio de una sola función (nodo function del arena), con contadores locales"""
+    gen = RecordingGenerator(SymbolTable(), tracer)
+    code = gen.generate(arena, function)
+    return code, gen.temporal_counter, gen.created_labels
+
+def moved(token: LexToken, delta: int, line_delta: int) -> LexToken:
+    if not delta and not line_delta:
+        return token
+    return token._replace(line=token.line + line_delta, start=token.start + delta, end=token.end + delta)
+
+class Segment:
+    """Trozo del documento: el preámbulo (antes del primer 'function') o una función
+    desde su 'function' hasta el siguiente. Guarda sus tokens, AST y código intermedio.
+
+    Tokens, AST y diagnósticos quedan con las posiciones que tenían al crearse
+    (base_start, base_line): mover el segmento no los toca, y el desplazamiento se
+    suma solo al armar la respuesta. Así una edición cuesta según lo que cambió y
+    no según lo que viene después.
+    """
+
+    def __init__(self, start: int, end: int, line: int, line_start: int,
+                 tokens: List[LexToken], lexer_errors: List[Diagnostic], unstable: bool):
+        self.start = start
+        self.end = end
+        # Línea actual del inicio del segmento y offset donde empieza esa línea
+        self.line = line
+        self.line_start = line_start
+        # Posición con la que se crearon tokens, AST y diagnósticos
+        self.base_start = start
+        self.base_line = line
+        self.tokens = tokens
+        self.lexer_errors = lexer_errors
+        # Línea con la que se formatearon los errores léxicos
+        self.errors_line = line
+        self.parsed = False
+        # AST del segmento y nodo de su función dentro de él
+        self.arena: Optional[AstArena] = None
+        self.function: Optional[int] = None
+        self.parse_errors: List[Diagnostic] = []
+        self.ir: Optional[FunctionIR] = None
+        # Nodo de la función y pieza en el arena del programa (ver CompileSession.program)
+        self.program_node: Optional[int] = None
+        self.piece = 0
+        # Un '"', "'" o '/*' sin cerrar puede pasar a abarcar texto posterior si éste cambia
+        self.unstable = unstable
+
+    def shift(self, delta: int, line_delta: int):
+        self.start += delta
+        self.end += delta
+        self.line_start += delta
+        if line_delta:
+            self.line += line_delta
+            # Los mensajes de error llevan la línea: hay que regenerarlos
+            self.parsed = self.parsed and not self.parse_errors
+
+    @property
+    def delta(self) -> int:
+        return self.start - self.base_start
+
+    @property
+    def line_delta(self) -> int:
+        return self.line - self.base_line
+
+    def rebase(self):
+        """Lleva tokens y errores léxicos a la posición actual (cuesta lo que el
+        segmento: solo se hace antes de volver a analizarlo)"""
+        delta, line_delta = self.delta, self.line_delta
+        if not delta and not line_delta:
+            return
+        self.tokens = [moved(t, delta, line_delta) for t in self.tokens]
+        self.lexer_errors = [e.shifted(delta) for e in self.lexer_errors]
+        self.base_start, self.base_line = self.start, self.line
+
+    def current_tokens(self) -> List[LexToken]:
+        """Tokens en su posición actual (copia: solo para el artefacto tokens)"""
+        delta, line_delta = self.delta, self.line_delta
+        if not delta and not line_delta:
+            return self.tokens
+        return [moved(t, delta, line_delta) for t in self.tokens]
+
+    def first_token(self) -> Optional[LexToken]:
+        """Primer token en su posición actual"""
+        return moved(self.tokens[0], self.delta, self.line_delta) if self.tokens else None
+
+    def current_lexer_errors(self) -> List[Diagnostic]:
+        return [e.shifted(self.delta) for e in self.lexer_errors]
+
+    def current_parse_errors(self) -> List[Diagnostic]:
+        return [e.shifted(self.delta) for e in self.parse_errors]
+
+    def parse(self, following: Optional[LexToken]):
+        """Analiza sintácticamente la función del segmento (solo si cambió). following
+        es el 'function' del segmento siguiente (en su posición actual): el parser lo
+        ve solo como anticipación, igual que dentro del programa completo."""
+        if self.parsed:
+            return
+        self.parsed = True
+        self.arena, self.function, self.parse_errors, self.ir = None, None, [], None
+        self.program_node = None
+        # Los mensajes del parser llevan la línea: se analiza en la posición actual
+        self.rebase()
+        tokens = self.tokens
+        if not tokens or tokens[0].value != "function":
+            return  # El preámbulo se trata a nivel de programa
+        stop = None
+        if following is not None:
+            # Ya en la posición actual, igual que following
+            tokens = tokens + [following]
+            stop = len(tokens) - 1
+        self.arena, self.parse_errors = Parser().parse(tokens, stop=stop)
+        function = self.arena.first_child[ROOT]
+        if function != NONE:
+            self.function = function
+
+class CompileSession:
+    """Estado de compilación incremental de un documento del editor.
+
+    Al aplicar una edición solo se re-tokeniza el rango de segmentos dañados (hasta
+    que el lexer se resincroniza con los tokens anteriores) y solo se vuelven a
+    analizar y a generar las funciones de esos segmentos; el resto se reutiliza.
+    Cada función se analiza por separado, así que un error sintáctico en una no
+    oculta las siguientes.
+    """
+
+    def __init__(self, code: str):
+        self.lexer = Lexer()
+        self.text = ""
+        self.segments: List[Segment] = []
+        # Arena del programa que se reutiliza entre ediciones: cada función es una pieza
+        # que se copia una vez y se mueve sin tocar sus nodos (ver program)
+        self.program_arena: Optional[AstArena] = None
+        # Nodos del programa alcanzables desde el Program (el arena guarda además los
+        # de funciones viejas hasta que se compacta)
+        self.program_nodes = 0
+        self.reset(code)
+
+    # --- LÉXICO ---
+
+    def reset(self, code: str):
+        self.text = code
+        self.segments = self.lex_region(0, len(code), 1, 0, preamble=True)
+
+    def lex_region(self, pos: int, endpos: int, line: int, line_start: int,
+                   preamble: bool) -> List[Segment]:
+        """Tokeniza [pos, endpos) (texto sin cambios) y lo parte en segmentos"""
+        tokens, errors, _ = self.lexer.tokenize_range(self.text, pos, endpos, line, line_start)
+        return self.split_segments(pos, endpos, tokens, errors, preamble)
+
+    def split_segments(self, pos: int, endpos: int, tokens: List[LexToken],
+                       errors: List[Diagnostic], preamble: bool) -> List[Segment]:
+        """Parte los tokens de [pos, endpos) en un segmento por cada 'function'"""
+        error_starts = [e.start for e in errors]
+        cuts = [i for i, t in enumerate(tokens) if t.type == "KEYWORD" and t.value == "function"]
+        if preamble and (not cuts or cuts[0] != 0):
+            cuts.insert(0, 0)
+        segments = []
+        for n, first in enumerate(cuts):
+            last = cuts[n + 1] if n + 1 < len(cuts) else len(tokens)
+            if n == 0 and preamble:
+                start, line, line_start = pos, 1, 0
+            else:
+                start = tokens[first].start
+                line = tokens[first].line
+                line_start = start - (tokens[first].column - 1)
+            end = tokens[last].start if last < len(tokens) else endpos
+            e_lo = bisect.bisect_left(error_starts, start)
+            e_hi = bisect.bisect_left(error_starts, end)
+            # Errores en un '"', "'" o un '/*' sin cerrar
+            unstable = any(self.text[p] in "\"'/" for p in error_starts[e_lo:e_hi])
+            segments.append(Segment(start, end, line, line_start, tokens[first:last],
+                                    errors[e_lo:e_hi], unstable))
+        return segments
+
+    def check_edits(self, edits: List[Tuple[int, int, str]]):
+        """Valida un lote de ediciones sin aplicar ninguna: cada una se compara con la
+        longitud que tendrá el texto después de las anteriores"""
+        length = len(self.text)
+        for i, (start, end, text) in enumerate(edits):
+            if not (0 <= start <= end <= length):
+                raise InvalidEdit(f"Edición {i} fuera de rango: [{start}, {end}) "
+                                  f"en un texto de {length} caracteres")
+            length += len(text) - (end - start)
+
+    def apply_edits(self, edits: List[Tuple[int, int, str]]):
+        """Aplica un lote de ediciones en orden; si alguna es inválida no aplica ninguna"""
+        self.check_edits(edits)
+        for start, end, text in edits:
+            self.apply_edit(start, end, text)
+
+    def apply_edit(self, start: int, end: int, text: str):
+        """Aplica una edición (offsets de caracteres sobre el texto actual)"""
+        self.check_edits([(start, end, text)])
+
+        old_text = self.text
+        delta = len(text) - (end - start)
+        line_delta = text.count("\n") - old_text.count("\n", start, end)
+        self.text = old_text[:start] + text + old_text[end:]
+
+        segs = self.segments
+        seg_starts = [s.start for s in segs]
+        # Segmentos que tocan la edición (incluidos los que empiezan o acaban justo en ella)
+        first = max(0, bisect.bisect_right(seg_starts, start) - 1)
+        if first > 0 and segs[first].start == start:
+            first -= 1
+        last = max(first, bisect.bisect_right(seg_starts, end) - 1)
+
+        if any(s.unstable for s in segs[:first]):
+            self.reset(self.text)
+            return
+
+        while True:
+            new_segments, last = self.relex(first, last, delta, line_delta)
+            # Si la región ya no empieza con 'function' pertenece al segmento anterior
+            if first > 0 and (not new_segments or not new_segments[0].tokens
+                              or new_segments[0].tokens[0].value != "function"
+                              or new_segments[0].start != segs[first].start):
+                first -= 1
+                if segs[first].unstable:
+                    self.reset(self.text)
+                    return
+                continue
+            break
+
+        for seg in segs[last + 1:]:
+            seg.shift(delta, line_delta)
+        self.segments = segs[:first] + new_segments + segs[last + 1:]
+        self.refresh_shifted_errors(first + len(new_segments))
+
+    def relex(self, first: int, last: int, delta: int, line_delta: int):
+        """Re-tokeniza los segmentos first..last (ya con la edición aplicada), ampliando
+        el rango hasta que el lexer vuelva a coincidir con los segmentos siguientes."""
+        segs = self.segments
+        pos = segs[first].start
+        line, line_start = segs[first].line, segs[first].line_start
+        tokens, errors = [], []
+
+        while True:
+            at_end = last + 1 >= len(segs)
+            endpos = len(self.text) if at_end else segs[last + 1].start + delta
+            t, e, (stop, line, line_start) = self.lexer.tokenize_range(
+                self.text, pos, endpos, line, line_start)
+            tokens += t; errors += e
+            pos = stop
+            if at_end:
+                break
+
+            # Resincronizado: el siguiente segmento empieza en un límite y en la misma columna
+            nxt = segs[last + 1]
+            if (stop == endpos and line == nxt.line + line_delta
+                    and stop - line_start == nxt.start - nxt.line_start):
+                break
+
+            # Un lexema cruzó el límite o el siguiente cambió de columna: ampliamos
+            last += 1
+            while last + 1 < len(segs) and segs[last + 1].start + delta < stop:
+                last += 1
+
+        return self.split_segments(segs[first].start, pos, tokens, errors,
+                                   preamble=(first == 0)), last
+
+    def refresh_shifted_errors(self, from_index: int):
+        """Los segmentos desplazados con errores léxicos llevan líneas viejas: se re-tokenizan"""
+        for i in range(from_index, len(self.segments)):
+            seg = self.segments[i]
+            if seg.lexer_errors and seg.line != seg.errors_line:
+                fresh = self.lex_region(seg.start, seg.end, seg.line, seg.line_start, preamble=(i == 0))
+                self.segments[i:i + 1] = fresh
+
+    # --- RESULTADOS ---
+
+    def tokens(self) -> List[LexToken]:
+        result = []
+        for seg in self.segments:
+            result.extend(seg.current_tokens())
+        return result
+
+    def tokens_count(self) -> int:
+        return sum(len(seg.tokens) for seg in self.segments)
+
+    def lexer_errors(self) -> List[Diagnostic]:
+        errors = []
+        for seg in self.segments:
+            if seg.lexer_errors:
+                errors.extend(seg.current_lexer_errors())
+        return errors
+
+    def preamble(self) -> Optional[LexToken]:
+        """Primer token antes de la primera función, si lo hay. Igual que en
+        Parser.parse_program, en ese caso el programa queda vacío."""
+        preamble = self.segments[0] if self.segments else None
+        if preamble and preamble.tokens and preamble.tokens[0].value != "function":
+            return preamble.first_token()
+        return None
+
+    def parsed_segments(self) -> List[Segment]:
+        """Analiza los segmentos que cambiaron y devuelve los que forman el programa:
+        como en Parser.parse_program, tokens sueltos después de una función (P001)
+        terminan el programa ahí"""
+        segs = self.segments
+        for i, seg in enumerate(segs):
+            if not seg.parsed:
+                seg.parse(segs[i + 1].first_token() if i + 1 < len(segs) else None)
+            if any(e.code == "P001" for e in seg.parse_errors):
+                return segs[:i + 1]
+        return segs
+
+    def program(self) -> Tuple[AstArena, List[Diagnostic]]:
+        """AST del programa completo y errores sintácticos, reutilizando funciones sin cambios.
+
+        El arena del programa vive entre ediciones: la función de un segmento que se
+        volvió a analizar se copia al final como pieza nueva (sin el Program de su
+        arena) y las demás solo se mueven a la posición actual de su segmento. Cuando
+        las copias viejas superan a los nodos vivos el arena se arma de nuevo.
+        """
+        first = self.preamble()
+        if first is not None:
+            program = AstArena()
+            program.add(PROGRAM)
+            self.program_nodes = 1
+            return program, [error(
+                CompilerPhase.PARSER, "P001", f"Tokens inesperados después del programa: {first}",
+                first.start, first.end)]
+
+        segments = self.parsed_segments()
+        live = 1 + sum(len(seg.arena) - 1 for seg in segments if seg.function is not None)
+        program = self.program_arena
+        if program is None or len(program) > 2 * live:
+            program = self.program_arena = AstArena()
+            program.add(PROGRAM)
+            for seg in self.segments:
+                seg.program_node = None
+
+        errors = []
+        functions = []
+        for seg in segments:
+            if seg.parse_errors:
+                errors.extend(seg.current_parse_errors())
+            if seg.function is None:
+                continue
+            if seg.program_node is None:
+                offset, seg.piece = program.add_piece(seg.arena, ROOT + 1)
+                seg.program_node = seg.function + offset
+            program.move_piece(seg.piece, seg.delta, seg.line_delta)
+            functions.append(seg.program_node)
+
+        # Hijos del Program en el orden actual de los segmentos
+        program.first_child[ROOT] = program.last_child[ROOT] = NONE
+        for function in functions:
+            program.next_sibling[function] = NONE
+            program.append_child(ROOT, function)
+        self.program_nodes = live
+        return program, errors
+
+    def intermediate_code(self, tracer: Optional[Tracer] = None) -> Tuple[QuadrupleStore, int, int]:
+        """Igual que merge_function_ir, pero solo genera las funciones que cambiaron"""
+        pieces = []
+        segments = self.parsed_segments() if self.preamble() is None else []
+        for seg in segments:
+            if seg.function is None:
+                continue
+            if seg.ir is None:
+                seg.ir = generate_function_ir(seg.arena, seg.function, tracer)
+            pieces.append(seg.ir)
+        return merge_function_ir(pieces)
+
+class IncrementalRun(CompilationRun):
+    """CompilationRun que toma tokens, AST y código intermedio de una CompileSession"""
+
+    def __init__(self, request: CompileRequest, session: CompileSession,
+                 edits: List[Tuple[int, int, str]]):
+        super().__init__(request)
+        self.session = session
+        self.edits = edits
+        self.has_tokens = False
+
+    def source_code(self) -> str:
+        return self.session.text
+
+    def run_lexer(self) -> bool:
+        self.session.apply_edits(self.edits)
+        self.metrics["tokens_count"] = self.session.tokens_count()
+        self.has_tokens = self.metrics["tokens_count"] > 0
+        if Artifact.TOKENS in self.artifacts:
+            self.tokens = self.session.tokens()
+        self.errors[CompilerPhase.LEXER].extend(self.session.lexer_errors())
+        return True
+
+    def run_parser(self) -> bool:
+        if not self.has_tokens:
+            return False
+        self.ast, errors = self.session.program()
+        self.metrics["ast_nodes_count"] = self.session.program_nodes
+        self.errors[CompilerPhase.PARSER].extend(errors)
+        return True
+
+    def run_intermediate(self) -> bool:
+        if self.ast is None:
+            return False
+        self.intermediate_code, temporals, _ = self.session.intermediate_code(self.tracer)
+        self.metrics["quadruples_count"] = len(self.intermediate_code)
+        self.metrics["temporals_count"] = temporals
+        return True
@@ -1,97 +1,98 @@
-from app.models.schemas import (
-    ASTNode, Quadruple, IntermediateCode, QuadrupleType, 
-    SymbolTable
-)
+from app.models.schemas import QuadrupleType, SymbolTable, DataType
+from app.compiler.trace import Tracer, default_tracer
+from app.compiler.walker import AstVisitor
+from app.compiler.arena import AstArena, KIND_NAMES, LITERAL, NONE, ROOT
+from app.compiler.parser import ARITHMETIC_OPERATORS, RELATIONAL_OPERATORS, LOGICAL_OPERATORS, operand_type
+from app.compiler.quadruples import QuadrupleStore, OPERATOR, CONSTANT, TEMPORARY, VARIABLE, LABEL
 from typing import List, Optional, Dict, Tuple
 
-class IntermediateCodeGenerator:
-    def __init__(self, symbol_table: SymbolTable):
+class IntermediateCodeGenerator(AstVisitor):
+    """Cada visit_* devuelve su resultado como operando ya internado en self.code,
+    con la clase que le corresponde (constante, temporal, variable o etiqueta)."""
+
+    def __init__(self, symbol_table: SymbolTable, tracer: Optional[Tracer] = None):
         self.symbol_table = symbol_table
-        self.quadruples: List[Quadruple] = []
+        self.tracer = tracer or default_tracer
+        self.code = QuadrupleStore()
         self.temporal_counter = 0
         self.label_counter = 0
+        self.arena: Optional[AstArena] = None
+        # Un hijo ausente se usa como operando "null"
+        self.missing = self.placeholder("null")
     
-    def generate(self, ast: ASTNode) -> IntermediateCode:
-        """Genera código intermedio a partir del AST, ignorando errores semánticos"""
-        print("=== GENERANDO CÓDIGO INTERMEDIO (MODO ROBUSTO) ===")
-        
-        # Reiniciar contadores y lista
-        self.quadruples = []
-        self.temporal_counter = 0
-        self.label_counter = 0
-        
-        if not ast:
-            return IntermediateCode()
+    def generate(self, ast: Optional[AstArena], root: int = ROOT) -> QuadrupleStore:
+        """Genera código intermedio a partir del AST, ignorando errores semánticos
+        (los temporales usados quedan en temporal_counter)"""
+        self.reset(ast)
+        if ast is None:
+            return self.code
         
         try:
-            self.visit_node(ast)
+            self.visit_node(root)
         except Exception as e:
-            print(f"⚠️ Error recuperable en generación: {e}")
+            if self.tracer.info: self.tracer.emit(f"⚠️ Error recuperable en generación: {e}")
             # No relanzamos el error, permitimos que devuelva lo que haya logrado generar
+        return self.result()
+    
+    def reset(self, ast: Optional[AstArena]):
+        """Prepara una generación nueva sobre ast"""
+        if self.tracer.info: self.tracer.emit("=== GENERANDO CÓDIGO INTERMEDIO (MODO ROBUSTO) ===")
         
-        print(f"=== GENERACIÓN COMPLETADA: {len(self.quadruples)} cuádruplos ===")
-        
-        return IntermediateCode(
-            quadruples=self.quadruples,
-            temporal_counter=self.temporal_counter,
-            label_counter=self.label_counter
-        )
+        # Reiniciar contadores y código
+        self.code = QuadrupleStore()
+        self.temporal_counter = 0
+        self.label_counter = 0
+        self.arena = ast
+        self.missing = self.placeholder("null")
     
-    def visit_node(self, node: ASTNode) -> str:
-        """Visita un nodo y devuelve el nombre de la variable/temporal donde quedó el resultado"""
-        if not node:
-            return "null"
-            
-        method_name = f'visit_{node.type.lower()}'
-        visitor = getattr(self, method_name, self.visit_default)
-        try:
-            result = visitor(node)
-            # Si un visitante devuelve None, devolvemos un placeholder para no romper la cadena
-            return str(result) if result is not None else "void"
-        except Exception as e:
-            print(f"Error visitando nodo {node.type}: {e}")
-            return "error_gen"
-    
-    def visit_default(self, node: ASTNode) -> str:
-        if node.children:
-            for child in node.children:
-                self.visit_node(child)
-        return "void"
-    
-    def visit_program(self, node: ASTNode) -> str:
-        if node.children:
-            for child in node.children:
-                self.visit_node(child)
-        return "void"
-    
-    def visit_functiondeclaration(self, node: ASTNode) -> str:
-        function_name = node.value or "anon"
-        func_label = f"func_{function_name}"
+    def result(self) -> QuadrupleStore:
+        if self.tracer.info: self.tracer.emit(f"=== GENERACIÓN COMPLETADA: {len(self.code)} cuádruplos ===")
+        return self.code
+    
+    def visit_error(self, node: int, e: Exception) -> int:
+        if self.tracer.info: self.tracer.emit(f"Error visitando nodo {KIND_NAMES[self.arena.kind[node]]}: {e}")
+        return self.placeholder("error_gen")
+    
+    def visit_default(self, node: int) -> int:
+        for child in self.arena.children(node):
+            yield child
+        return self.placeholder("void")
+    
+    def visit_program(self, node: int) -> int:
+        for child in self.arena.children(node):
+            yield child
+        return self.placeholder("void")
+    
+    def visit_functiondeclaration(self, node: int) -> int:
+        function_name = self.arena.text(node) or "anon"
+        func_label = self.code.intern(f"func_{function_name}", LABEL)
         self.add_quadruple(QuadrupleType.LABEL, result=func_label)
         
-        if node.children:
-            self.visit_node(node.children[0]) # Block
+        block = self.arena.first_child[node]
+        if block != NONE:
+            yield block
         
         # Return implícito por seguridad
-        if function_name == "main" or (node.data_type and node.data_type == "void"):
-            self.add_quadruple(QuadrupleType.RETURN, result="0")
+        if function_name == "main":
+            self.add_quadruple(QuadrupleType.RETURN, result=self.constant("0"))
             
-        return "void"
+        return self.placeholder("void")
     
-    def visit_block(self, node: ASTNode) -> str:
-        if node.children:
-            for child in node.children:
-                self.visit_node(child)
-        return "void"
+    def visit_block(self, node: int) -> int:
+        for child in self.arena.children(node):
+            yield child
+        return self.placeholder("void")
     
-    def visit_variabledeclaration(self, node: ASTNode) -> str:
-        if not node.children: return "void"
+    def visit_variabledeclaration(self, node: int) -> int:
+        identifier = self.arena.first_child[node]
+        if identifier == NONE: return self.placeholder("void")
         
-        variable_name = node.children[0].value
+        variable_name = self.code.intern(self.arena.text(identifier), VARIABLE)
         
         # Si tiene inicialización (int x = 10;)
-        if len(node.children) > 1 and node.children[1].type != "Empty":
-            expr_result = self.visit_node(node.children[1])
+        initializer = self.arena.next_sibling[identifier]
+        if initializer != NONE:
+            expr_result = yield initializer
             self.add_quadruple(
                 QuadrupleType.ASSIGNMENT,
                 arg1=expr_result,
@@ -99,64 +100,97 @@ class IntermediateCodeGenerator:
             )
         return variable_name
     
-    def visit_assignment(self, node: ASTNode) -> str:
-        if not node.children: return "void"
+    def visit_assignment(self, node: int) -> int:
+        identifier = self.arena.first_child[node]
+        if identifier == NONE: return self.placeholder("void")
         
-        variable_name = node.children[0].value
+        variable_name = self.code.intern(self.arena.text(identifier), VARIABLE)
         
-        if len(node.children) > 1:
-            expr_result = self.visit_node(node.children[1])
+        expression = self.arena.next_sibling[identifier]
+        if expression != NONE:
+            expr_result = yield expression
             self.add_quadruple(
                 QuadrupleType.ASSIGNMENT,
                 arg1=expr_result,
                 result=variable_name
             )
             return variable_name
-        return "void"
+        return self.placeholder("void")
     
-    def visit_binaryexpression(self, node: ASTNode) -> str:
-        if not node.children or len(node.children) < 2:
-            return "error_expr"
+    def visit_binaryexpression(self, node: int) -> int:
+        left = self.arena.first_child[node]
+        right = self.arena.next_sibling[left] if left != NONE else NONE
+        if right == NONE:
+            return self.placeholder("error_expr")
         
         # Aquí forzamos la generación aunque los hijos devuelvan cosas raras
-        left_operand = self.visit_node(node.children[0]) or "null"
-        right_operand = self.visit_node(node.children[1]) or "null"
-        operator = node.value
+        left_operand = self.or_missing((yield left))
+        right_operand = self.or_missing((yield right))
+        operator = self.arena.text(node)
         
         temp_var = self.new_temporal()
         
-        # Clasificar tipo de operación
-        if operator in ['+', '-', '*', '/']:
-            q_type = QuadrupleType.ARITHMETIC
-        elif operator in ['>', '<', '>=', '<=', '==', '!=']:
-            q_type = QuadrupleType.COMPARISON
+        # Clasificar tipo de operación (los lógicos dan 0/1 como las comparaciones)
+        # y el tipo con que opera, según lo que dedujo el Parser
+        types = self.arena.data_type
+        if operator in ARITHMETIC_OPERATORS:
+            q_type, data_type = QuadrupleType.ARITHMETIC, types[node]
+        elif operator in RELATIONAL_OPERATORS:
+            q_type, data_type = QuadrupleType.COMPARISON, operand_type(types[left], types[right])
+        elif operator in LOGICAL_OPERATORS:
+            q_type, data_type = QuadrupleType.COMPARISON, DataType.BOOL
         else:
-            q_type = QuadrupleType.ARITHMETIC
+            q_type, data_type = QuadrupleType.ARITHMETIC, None
             
         self.add_quadruple(
             q_type,
             operator=operator,
             arg1=left_operand,
             arg2=right_operand,
-            result=temp_var
+            result=temp_var,
+            data_type=data_type
         )
         return temp_var
     
-    def visit_identifier(self, node: ASTNode) -> str:
+    def visit_unaryexpression(self, node: int) -> int:
+        arena = self.arena
+        operand_node = arena.first_child[node]
+        if operand_node == NONE:
+            return self.placeholder("error_expr")
+        
+        operator = arena.text(node)
+        # -5 es una constante: no hace falta un temporal
+        if operator == "-" and arena.kind[operand_node] == LITERAL and arena.text(operand_node):
+            return self.constant(f"-{arena.text(operand_node)}")
+        
+        operand = self.or_missing((yield operand_node))
+        temp_var = self.new_temporal()
+        # Se baja a operaciones binarias que el optimizador ya sabe plegar:
+        # -x → 0 - x, !x → x == 0
+        if operator == "-":
+            self.add_quadruple(QuadrupleType.ARITHMETIC, operator="-", arg1=self.constant("0"), arg2=operand,
+                               result=temp_var, data_type=arena.data_type[node])
+        else:
+            self.add_quadruple(QuadrupleType.COMPARISON, operator="==", arg1=operand, arg2=self.constant("0"),
+                               result=temp_var, data_type=operand_type(arena.data_type[operand_node], DataType.INT))
+        return temp_var
+    
+    def visit_identifier(self, node: int) -> int:
         # Devuelve el nombre de la variable TAL CUAL, exista o no en la tabla de símbolos.
         # Esto permite que el código intermedio se genere incluso si hay error semántico.
-        return node.value if node.value else "unknown_id"
+        return self.code.intern(self.arena.text(node) or "unknown_id", VARIABLE)
     
-    def visit_literal(self, node: ASTNode) -> str:
-        return node.value if node.value else "0"
+    def visit_literal(self, node: int) -> int:
+        return self.constant(self.arena.text(node) or "0")
     
-    def visit_stringliteral(self, node: ASTNode) -> str:
-        return f'"{node.value}"'
+    def visit_stringliteral(self, node: int) -> int:
+        return self.constant(f'"{self.arena.text(node)}"')
     
-    def visit_ifstatement(self, node: ASTNode) -> str:
-        if not node.children: return "void"
+    def visit_ifstatement(self, node: int) -> int:
+        condition, then_block, else_block = (self.arena.children(node) + [NONE, NONE, NONE])[:3]
+        if condition == NONE: return self.placeholder("void")
         
-        condition_result = self.visit_node(node.children[0])
+        condition_result = yield condition
         
         false_label = self.new_label("else")
         self.add_quadruple(
@@ -167,29 +201,30 @@ class IntermediateCodeGenerator:
         )
         
         # Bloque True
-        if len(node.children) > 1:
-            self.visit_node(node.children[1])
+        if then_block != NONE:
+            yield then_block
             
         end_label = None
-        if len(node.children) > 2: # Tiene Else
+        if else_block != NONE: # Tiene Else
             end_label = self.new_label("end_if")
             self.add_quadruple(QuadrupleType.JUMP, result=end_label)
         
         self.add_quadruple(QuadrupleType.LABEL, result=false_label)
         
         # Bloque Else
-        if len(node.children) > 2:
-            self.visit_node(node.children[2])
+        if else_block != NONE:
+            yield else_block
             self.add_quadruple(QuadrupleType.LABEL, result=end_label)
             
-        return "void"
+        return self.placeholder("void")
 
-    def visit_whilestatement(self, node: ASTNode) -> str:
+    def visit_whilestatement(self, node: int) -> int:
         start_label = self.new_label("while_start")
         self.add_quadruple(QuadrupleType.LABEL, result=start_label)
         
-        if node.children:
-            condition_result = self.visit_node(node.children[0])
+        condition = self.arena.first_child[node]
+        if condition != NONE:
+            condition_result = yield condition
             end_label = self.new_label("while_end")
             
             self.add_quadruple(
@@ -199,50 +234,54 @@ class IntermediateCodeGenerator:
                 result=end_label
             )
             
-            if len(node.children) > 1:
-                self.visit_node(node.children[1])
+            body = self.arena.next_sibling[condition]
+            if body != NONE:
+                yield body
                 
             self.add_quadruple(QuadrupleType.JUMP, result=start_label)
             self.add_quadruple(QuadrupleType.LABEL, result=end_label)
             
-        return "void"
+        return self.placeholder("void")
 
-    def visit_printstatement(self, node: ASTNode) -> str:
-        if node.children:
-            res = self.visit_node(node.children[0])
+    def visit_printstatement(self, node: int) -> int:
+        value = self.arena.first_child[node]
+        if value != NONE:
+            res = yield value
             self.add_quadruple(QuadrupleType.WRITE, arg1=res)
-        return "void"
+        return self.placeholder("void")
 
-    def visit_returnstatement(self, node: ASTNode) -> str:
-        val = "0"
-        if node.children:
-            val = self.visit_node(node.children[0])
+    def visit_returnstatement(self, node: int) -> int:
+        val = self.constant("0")
+        value = self.arena.first_child[node]
+        if value != NONE:
+            val = yield value
         self.add_quadruple(QuadrupleType.RETURN, arg1=val)
-        return "void"
+        return self.placeholder("void")
 
     # --- Helpers ---
-    def add_quadruple(self, quad_type, operator="", arg1=None, arg2=None, result=None):
-        # Conversión a string segura para evitar errores de tipo en el backend
-        s_arg1 = str(arg1) if arg1 is not None else None
-        s_arg2 = str(arg2) if arg2 is not None else None
-        s_res  = str(result) if result is not None else None
-        
-        quad = Quadruple(
-            index=len(self.quadruples),
-            operator=operator,
-            arg1=s_arg1,
-            arg2=s_arg2,
-            result=s_res,
-            quadruple_type=quad_type
-        )
-        self.quadruples.append(quad)
+    def add_quadruple(self, quad_type, operator="", arg1=NONE, arg2=NONE, result=NONE, data_type=None):
+        # Los operandos ya están internados: nombres, temporales, literales o el
+        # resultado de un visit_* (missing y visit_error también devuelven operandos)
+        self.code.add(quad_type, self.code.intern(operator, OPERATOR), arg1, arg2, result, data_type)
+
+    def constant(self, text: str) -> int:
+        return self.code.intern(text, CONSTANT)
+
+    def placeholder(self, text: str) -> int:
+        """Operando de relleno (void, null, error_*): se trata como una variable,
+        así que nunca se pliega ni se elimina"""
+        return self.code.intern(text, VARIABLE)
+
+    def or_missing(self, operand: Optional[int]) -> int:
+        # Un visit_* que no es de una expresión (AST con errores) no devuelve operando
+        return operand if operand is not None else self.missing
 
-    def new_temporal(self) -> str:
+    def new_temporal(self) -> int:
         t = f"t{self.temporal_counter}"
         self.temporal_counter += 1
-        return t
+        return self.code.intern(t, TEMPORARY)
     
-    def new_label(self, prefix) -> str:
+    def new_label(self, prefix) -> int:
         l = f"{prefix}_{self.label_counter}"
         self.label_counter += 1
-        return l
\ No newline at end of file
+        return self.code.intern(l, LABEL)
\ No newline at end of file
@@ -1,104 +1,327 @@
-from app.models.schemas import Token
-from typing import List, Tuple
+from app.models.schemas import Token, CompilerPhase
+from app.compiler.diagnostics import Diagnostic, error
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Tuple, Union
+import mmap
 import re
+import sys
 
-class Lexer:
-    def __init__(self):
-        # Definición de tokens para nuestro lenguaje similar a C
-        self.keywords = {
-            'if', 'else', 'while', 'for', 'return', 'function',
-            'int', 'float', 'bool', 'string', 'void', 'true', 'false', 'print'
-        }
-        
-        self.operators = {
-            '+', '-', '*', '/', '=', '==', '!=', '<', '>', '<=', '>=',
-            '&&', '||', '!', '++', '--', '+=', '-=', '*=', '/='
-        }
-        
-        self.delimiters = {
-            '(', ')', '{', '}', '[', ']', ';', ',', '.', ':'
-        }
-        
-        # Patrones regex para tokens
-        # --- CORRECCIÓN ---
-        # El ORDEN importa. WHITESPACE y COMMENT deben ir ANTES que OPERATOR
-        # para evitar que '//' sea detectado como OPERATOR en lugar de COMMENT.
-        self.token_specs = [
-            ('NUMBER',    r'\d+(\.\d*)?'),     # Enteros o decimales
-            ('STRING',    r'\"([^\\\"]|\\.)*\"'),  # Strings
-            ('CHAR',      r"\'([^\\\']|\\.)*\'"),  # Caracteres
-            
-            # Poner los tokens a ignorar ANTES de las reglas que podrían chocar
-            ('WHITESPACE', r'\s+'),            # Espacios en blanco
-            ('COMMENT',   r'//.*|/\*[\s\S]*?\*/'),  # Comentarios
-            
-            ('IDENTIFIER', r'[a-zA-Z_][a-zA-Z0-9_]*'),  # Identificadores
-            ('OPERATOR',  r'[+\-*/=<>!&|]+'),  # Operadores
-            ('DELIMITER', r'[(){}\[\];,.:]'),  # Delimitadores
-            ('MISMATCH',  r'.'),               # Cualquier otro carácter
-        ]
-        # --- FIN DE LA CORRECCIÓN ---
-        
-        # Compilar regex
-        self.token_regex = '|'.join(f'(?P<{name}>{pattern})' for name, pattern in self.token_specs)
-        self.pattern = re.compile(self.token_regex)
-    
-    def tokenize(self, code: str) -> Tuple[List[Token], List[str]]:
-        tokens = []
-        errors = []
-        line_num = 1
-        line_start = 0
-        
-        for mo in self.pattern.finditer(code):
-            kind = mo.lastgroup
-            value = mo.group()
-            column = mo.start() - line_start + 1
-            
-            if kind == 'NUMBER':
-                # Determinar si es entero o float
-                token_type = 'FLOAT' if '.' in value else 'INTEGER'
-                tokens.append(Token(type=token_type, value=value, line=line_num, column=column))
-                
-            elif kind == 'STRING':
-                tokens.append(Token(type='STRING', value=value[1:-1], line=line_num, column=column))
-                
-            elif kind == 'CHAR':
-                tokens.append(Token(type='CHAR', value=value[1:-1], line=line_num, column=column))
-                
-            elif kind == 'IDENTIFIER':
-                if value in self.keywords:
-                    tokens.append(Token(type='KEYWORD', value=value, line=line_num, column=column))
-                else:
-                    tokens.append(Token(type='IDENTIFIER', value=value, line=line_num, column=column))
-                    
-            elif kind == 'OPERATOR':
-                tokens.append(Token(type='OPERATOR', value=value, line=line_num, column=column))
-                
-            elif kind == 'DELIMITER':
-                tokens.append(Token(type='DELIMITER', value=value, line=line_num, column=column))
-                
-            elif kind == 'WHITESPACE':
-                # Contar saltos de línea para actualizar número de línea
-                line_breaks = value.count('\n')
-                if line_breaks > 0:
+class LexToken(NamedTuple):
+    """Token interno del compilador: una tupla, mucho más barata de crear que el
+    modelo Pydantic. Se convierte a schemas.Token solo al armar la respuesta."""
+    type: str
+    value: str
+    line: int
+    column: int
+    # Offsets [start, end) del lexema en el código
+    start: int
+    end: int
+
+    def __str__(self):
+        # Mismo formato que str() del modelo Token, que aparece en mensajes de error
+        return f"type={self.type!r} value={self.value!r} line={self.line} column={self.column}"
+
+    def to_schema(self) -> Token:
+        return Token.construct(type=self.type, value=self.value, line=self.line, column=self.column)
+
+def to_schema_tokens(tokens: List[LexToken]) -> List[Token]:
+    """Convierte los tokens internos a modelos de la API"""
+    return [t.to_schema() for t in tokens]
+
+# --- TABLAS DEL LENGUAJE ---
+# Se arman una sola vez al importar el módulo y las comparten todos los Lexer
+
+KEYWORDS = frozenset({
+    'if', 'else', 'while', 'for', 'return', 'function',
+    'int', 'float', 'bool', 'string', 'void', 'true', 'false', 'print'
+})
+
+OPERATORS = frozenset({
+    '+', '-', '*', '/', '=', '==', '!=', '<', '>', '<=', '>=',
+    '&&', '||', '!', '++', '--', '+=', '-=', '*=', '/='
+})
+
+DELIMITERS = frozenset({
+    '(', ')', '{', '}', '[', ']', ';', ',', '.', ':'
+})
+
+# Clases de carácter del autómata
+C_OTHER, C_SPACE, C_LETTER, C_DIGIT, C_OPERATOR, C_DELIMITER, C_QUOTE = range(7)
+
+def char_class(c: str) -> int:
+    # Igual que \s y \d de las regex: espacios y dígitos Unicode también cuentan
+    if c.isspace():
+        return C_SPACE
+    if c.isdecimal():
+        return C_DIGIT
+    return C_OTHER
+
+def byte_class(c: int) -> int:
+    # En buffers de bytes solo se reconoce ASCII (ver scan)
+    return C_OTHER
+
+class ScannerTables(NamedTuple):
+    """Tablas del escáner para un tipo de buffer. En str las claves son caracteres;
+    en bytes/mmap son enteros, porque indexar bytes devuelve int."""
+    classes: Dict[Any, int]
+    fallback: Callable[[Any], int]    # Clase de lo que no está en classes
+    spaces: FrozenSet[Any]
+    operator_dfa: Dict[str, Dict[Any, str]]
+    keywords: Dict[Any, str]          # Lexema -> palabra clave internada (str)
+    delimiters: Dict[Any, str]
+    quoted: Dict[Any, Tuple[Callable, str]]
+    identifier_tail: Callable
+    number_run: Callable
+    space_run: Callable
+    newline: Any                      # Para count/find: '\n' o b'\n'
+    newline_key: Any                  # Para comparar con code[pos]: '\n' o 10
+    comment_end: Any
+    slash: Any
+    star: Any
+    text: Optional[Callable[[Any], str]]  # Convierte un lexema a str (None si ya lo es)
+
+def build_tables(key: Callable[[str], Any], encode: Callable[[str], Any],
+                 fallback: Callable[[Any], int], text: Optional[Callable]) -> ScannerTables:
+    """Arma las tablas a partir de KEYWORDS, OPERATORS y DELIMITERS.
+
+    key convierte un carácter en la clave con la que se indexa (el carácter o su
+    código) y encode convierte lexemas y patrones (a str o a bytes).
+    """
+    classes = {}
+    for code in range(128):
+        c = chr(code)
+        if c.isspace():
+            classes[key(c)] = C_SPACE
+        elif c.isalpha() or c == '_':
+            classes[key(c)] = C_LETTER
+        elif c.isdigit():
+            classes[key(c)] = C_DIGIT
+    for op in OPERATORS:
+        classes[key(op[0])] = C_OPERATOR
+    for d in DELIMITERS:
+        classes[key(d)] = C_DELIMITER
+    classes[key('"')] = classes[key("'")] = C_QUOTE
+
+    # Autómata de operadores: estado (prefijo leído, siempre str) -> {carácter: siguiente
+    # estado}. Los estados que son operadores completos son de aceptación.
+    operator_dfa: Dict[str, Dict[Any, str]] = {}
+    for op in OPERATORS:
+        for i in range(len(op)):
+            operator_dfa.setdefault(op[:i], {})[key(op[i])] = sys.intern(op[:i + 1])
+
+    pattern = lambda regex: re.compile(encode(regex)).match
+    return ScannerTables(
+        classes=classes,
+        fallback=fallback,
+        spaces=frozenset(c for c, kind in classes.items() if kind == C_SPACE),
+        operator_dfa=operator_dfa,
+        # Una sola búsqueda da tipo y valor, y todas las apariciones comparten la cadena
+        keywords={encode(k): sys.intern(k) for k in KEYWORDS},
+        delimiters={key(d): d for d in DELIMITERS},
+        quoted={
+            key('"'): (pattern(r'\"(?:[^\\\"]|\\.)*\"'), 'STRING'),
+            key("'"): (pattern(r"\'(?:[^\\\']|\\.)*\'"), 'CHAR'),
+        },
+        # Corridas de una sola clase; se usan solo después de decidir el lexema por su
+        # primer carácter
+        identifier_tail=pattern(r'[a-zA-Z0-9_]*'),
+        number_run=pattern(r'\d+(?:\.\d*)?'),
+        space_run=pattern(r'\s*'),
+        newline=encode('\n'),
+        newline_key=key('\n'),
+        comment_end=encode('*/'),
+        slash=key('/'),
+        star=key('*'),
+        text=text,
+    )
+
+TEXT_TABLES = build_tables(lambda c: c, lambda s: s, char_class, None)
+BYTES_TABLES = build_tables(ord, str.encode, byte_class, bytes.decode)
+
+def scan(code: Union[str, bytes, mmap.mmap], pos: int, endpos: int, line_num: int, line_start: int,
+         errors: List[Diagnostic], state: list) -> Iterator[LexToken]:
+    """Escáner guiado por tablas: la clase del primer carácter decide el lexema y los
+    operadores se reconocen con el autómata de operadores, tomando siempre el más
+    largo que sea un operador válido ('=-' son dos operadores, no uno).
+
+    code puede ser un str o un buffer de bytes ASCII (bytes, mmap): así un archivo
+    mapeado en memoria se tokeniza sin copiarlo entero a un str. En un buffer los
+    offsets son de bytes; un byte no ASCII se reporta como carácter inesperado.
+
+    Genera los tokens que empiezan antes de endpos, agrega los errores a errors y
+    al terminar deja en state (offset, línea, inicio de línea).
+    """
+    tables = TEXT_TABLES if isinstance(code, str) else BYTES_TABLES
+    # Variables locales: este ciclo corre una vez por lexema
+    classes, fallback, spaces = tables.classes, tables.fallback, tables.spaces
+    keywords, delimiters, quoted = tables.keywords, tables.delimiters, tables.quoted
+    operator_dfa = tables.operator_dfa
+    operator_start = operator_dfa['']
+    identifier_tail, number_run, space_run = tables.identifier_tail, tables.number_run, tables.space_run
+    newline, newline_key, text = tables.newline, tables.newline_key, tables.text
+    slash, star = tables.slash, tables.star
+    rfind, find = code.rfind, code.find
+    count = getattr(code, 'count', None)
+    if count is None:  # mmap no tiene count
+        count = lambda sub, start, end: code[start:end].count(sub)
+    n = len(code)
+    # tuple.__new__ directo evita el __new__ en Python que genera NamedTuple
+    new_tuple, token_class = tuple.__new__, LexToken
+
+    while pos < endpos:
+        c = code[pos]
+        kind = classes.get(c)
+        if kind is None:
+            kind = fallback(c)
+
+        if kind == C_SPACE:
+            # Casi siempre es un solo espacio entre lexemas: la regex solo para corridas
+            end = pos + 1
+            if end < n and code[end] in spaces:
+                end = space_run(code, end).end()
+            if c == newline_key or end - pos > 1:
+                line_breaks = count(newline, pos, end)
+                if line_breaks:
                     line_num += line_breaks
-                    line_start = mo.end() - (len(value) - value.rfind('\n') - 1)
+                    line_start = rfind(newline, pos, end) + 1
+            pos = end
+            continue
+
+        if kind == C_LETTER:
+            end = identifier_tail(code, pos + 1).end()
+            value = code[pos:end]
+            keyword = keywords.get(value)
+            if keyword is None:
+                if text is not None:
+                    value = text(value)
+                yield new_tuple(token_class, ('IDENTIFIER', value, line_num, pos - line_start + 1, pos, end))
+            else:
+                yield new_tuple(token_class, ('KEYWORD', keyword, line_num, pos - line_start + 1, pos, end))
+            pos = end
+            continue
+
+        if kind == C_DELIMITER:
+            yield new_tuple(token_class, ('DELIMITER', delimiters[c], line_num, pos - line_start + 1, pos, pos + 1))
+            pos += 1
+            continue
+
+        if kind == C_OPERATOR:
+            if c == slash and pos + 1 < n:
+                nxt = code[pos + 1]
+                if nxt == slash:
+                    # Comentario de línea: el salto de línea queda para el espacio siguiente
+                    end = find(newline, pos)
+                    pos = n if end < 0 else end
+                    continue
+                if nxt == star:
+                    end = find(tables.comment_end, pos + 2)
+                    if end >= 0:
+                        end += 2
+                        line_breaks = count(newline, pos, end)
+                        if line_breaks:
+                            line_num += line_breaks
+                            line_start = rfind(newline, pos, end) + 1
+                        pos = end
+                        continue
+                    errors.append(error(
+                        CompilerPhase.LEXER, "L002",
+                        f"Comentario sin cerrar en línea {line_num}, columna {pos - line_start + 1}",
+                        pos, pos + 2))
+                    pos += 2
+                    continue
+            # Maximal munch: se avanza por el autómata y se recuerda el último operador completo
+            op = operator_start[c]
+            end = pos + 1
+            value, value_end = (op, end) if op in OPERATORS else (None, pos)
+            transitions = operator_dfa.get(op)
+            while transitions and end < n:
+                op = transitions.get(code[end])
+                if op is None:
+                    break
+                end += 1
+                if op in OPERATORS:
+                    value, value_end = op, end
+                transitions = operator_dfa.get(op)
+            if value is not None:
+                yield new_tuple(token_class, ('OPERATOR', value, line_num, pos - line_start + 1, pos, value_end))
+                pos = value_end
                 continue
-                
-            elif kind == 'COMMENT':
-                # Los comentarios se ignoran en el análisis léxico
-                line_breaks = value.count('\n')
-                if line_breaks > 0:
+            # Prefijo sin operador completo (p. ej. '&' suelto): carácter inesperado
+
+        elif kind == C_DIGIT:
+            end = number_run(code, pos).end()
+            value = code[pos:end]
+            if text is not None:
+                value = text(value)
+            # Determinar si es entero o float
+            yield new_tuple(token_class, ('FLOAT' if '.' in value else 'INTEGER', value,
+                           line_num, pos - line_start + 1, pos, end))
+            pos = end
+            continue
+
+        elif kind == C_QUOTE:
+            match, token_type = quoted[c]
+            mo = match(code, pos)
+            if mo is not None:
+                end = mo.end()
+                value = code[pos + 1:end - 1]
+                if text is not None:
+                    value = text(value)
+                yield new_tuple(token_class, (token_type, value, line_num, pos - line_start + 1, pos, end))
+                line_breaks = count(newline, pos, end)
+                if line_breaks:
                     line_num += line_breaks
-                    line_start = mo.end() - (len(value) - value.rfind('\n') - 1)
+                    line_start = rfind(newline, pos, end) + 1
+                pos = end
                 continue
-                
-            elif kind == 'MISMATCH':
-                errors.append(f"Carácter inesperado '{value}' en línea {line_num}, columna {column}")
-                
+            # Comilla sin cerrar: carácter inesperado
+
+        char = c if text is None else code[pos:pos + 1].decode('latin-1')
+        errors.append(error(
+            CompilerPhase.LEXER, "L001",
+            f"Carácter inesperado '{char}' en línea {line_num}, columna {pos - line_start + 1}",
+            pos, pos + 1))
+        pos += 1
+
+    state[:] = (pos, line_num, line_start)
+
+class Lexer:
+    """Interfaz del analizador léxico; todo el trabajo lo hace scan() con las tablas
+    del módulo, así que crear un Lexer no cuesta nada."""
+
+    keywords = KEYWORDS
+    operators = OPERATORS
+    delimiters = DELIMITERS
+    
+    def tokenize(self, code: str) -> Tuple[List[LexToken], List[Diagnostic]]:
+        tokens, errors, _ = self.tokenize_range(code)
         return tokens, errors
     
-    def pretty_print_tokens(self, tokens: List[Token]):
+    def tokenize_iter(self, code: str, errors: Optional[List[Diagnostic]] = None) -> Iterator[LexToken]:
+        """Genera los tokens a medida que se piden, sin armar la lista completa.
+        
+        Los errores léxicos se van agregando a errors conforme aparecen, así que
+        solo están completos cuando el generador se agotó.
+        """
+        return scan(code, 0, len(code), 1, 0, [] if errors is None else errors, [])
+    
+    def tokenize_range(self, code: str, pos: int = 0, endpos: Optional[int] = None,
+                       line_num: int = 1, line_start: int = 0
+                       ) -> Tuple[List[LexToken], List[Diagnostic], Tuple[int, int, int]]:
+        """Tokeniza code desde pos hasta el primer lexema que empiece en endpos o después.
+        
+        pos debe ser un límite entre lexemas; line_num y line_start describen la línea
+        en la que está pos. Devuelve los tokens, los errores y el estado (offset, línea,
+        inicio de línea) en el que se detuvo. Si un lexema cruza endpos, el offset
+        devuelto es mayor que endpos.
+        """
+        errors = []
+        state = []
+        if endpos is None:
+            endpos = len(code)
+        tokens = list(scan(code, pos, endpos, line_num, line_start, errors, state))
+        return tokens, errors, tuple(state)
+    
+    def pretty_print_tokens(self, tokens: List[LexToken]):
         """Método auxiliar para imprimir tokens de forma legible"""
         print(f"{'Token':<15} {'Valor':<15} {'Línea':<8} {'Columna':<8}")
         print("-" * 50)
@@ -0,0 +1,273 @@
+from app.models.schemas import Artifact, CompilerPhase
+from app.compiler.lexer import LexToken, scan
+from app.compiler.parser import Parser
+from app.compiler.arena import NONE, ROOT
+from app.compiler.semantic import SemanticAnalyzer
+from app.compiler.symbols import Scope
+from app.compiler.optimizer import CodeOptimizer
+from app.compiler.generator import CodeGenerator
+from app.compiler.quadruples import QuadrupleStore, RENAMED_KINDS
+from app.compiler.incremental import generate_function_ir, offset_renames, renumber_quadruples
+from app.compiler.pipeline import PHASE_ORDER
+from app.compiler.diagnostics import Diagnostic, LineCursor, error, warning
+from app.compiler.trace import Tracer, TRACE_OFF
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, TextIO, Union
+import mmap
+import os
+import re
+import time
+
+# Artefactos que se escriben a archivo y sufijo de cada uno
+ARTIFACT_SUFFIX = {
+    Artifact.INTERMEDIATE_CODE: ".ir.tsv",
+    Artifact.OPTIMIZED_CODE: ".opt.tsv",
+    Artifact.OBJECT_CODE: ".py",
+}
+
+QUADRUPLE_COLUMNS = ("index", "operator", "arg1", "arg2", "result", "quadruple_type", "data_type")
+
+NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+@contextmanager
+def open_source(path: str) -> Iterator[Union[str, mmap.mmap]]:
+    """Mapea el archivo en memoria. El lexer trabaja directo sobre el mmap si el
+    archivo es ASCII; si no, se decodifica a str (los offsets de un buffer son de
+    bytes y las columnas no coincidirían con los caracteres)."""
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield ""  # Archivo vacío: no se puede mapear
+            return
+        try:
+            if NON_ASCII.search(buffer):
+                yield str(buffer, "utf-8")
+            else:
+                yield buffer
+        finally:
+            buffer.close()
+
+def write_quadruples(out: TextIO, code: QuadrupleStore, base: int = 0,
+                     renames: Optional[Dict[str, str]] = None):
+    """Escribe cuádruplos como TSV, desplazando índices y renombrando al vuelo
+    (cada string de la tabla se renombra una sola vez, sin copiar el código)"""
+    rename = renames.get if renames else (lambda name, default: default)
+    # Solo temporales y etiquetas salen de contadores; NONE (-1) se escribe vacío
+    names = [rename(text, text) if kind in RENAMED_KINDS else text
+             for text, kind in zip(code.strings, code.kind)] + [""]
+    out.write("".join(
+        f"{n + base}\t{names[operator]}\t{names[arg1]}\t{names[arg2]}\t{names[result]}"
+        f"\t{quadruple_type.value}\t{data_type.value if data_type else ''}\n"
+        for n, (operator, arg1, arg2, result, quadruple_type, data_type) in enumerate(zip(*code.columns()))
+    ))
+
+class FileCompilation:
+    """Compila un archivo enorme función por función, sin tenerlo nunca entero en memoria.
+
+    El lexer avanza sobre el buffer solo hasta el siguiente 'function'; cada función
+    se analiza, se genera, se optimiza y se escribe a los archivos de salida, y
+    luego se descarta. Temporales, etiquetas e índices se renumeran como si el
+    programa se hubiera generado de una sola vez. A diferencia de la API, el
+    optimizador trabaja dentro de cada función (sus pases no cruzan funciones).
+    """
+
+    def __init__(self, source: Union[str, bytes, mmap.mmap], outputs: Dict[Artifact, TextIO],
+                 diagnostics: TextIO, path: str = "<entrada>", max_diagnostics: Optional[int] = None,
+                 tracer: Optional[Tracer] = None):
+        self.source = source
+        self.outputs = outputs
+        self.diagnostics_out = diagnostics
+        self.path = path
+        self.max_diagnostics = max_diagnostics
+        self.tracer = tracer or Tracer(TRACE_OFF)
+        self.cursor = LineCursor(source)
+
+        self.phase_timings: Dict[str, float] = {phase.value: 0.0 for phase in PHASE_ORDER}
+        self.metrics = {"functions_count": 0, "tokens_count": 0,
+                        "quadruples_count": 0, "optimized_count": 0, "temporals_count": 0,
+                        "errors_count": 0, "warnings_count": 0}
+
+        self.analyzer = SemanticAnalyzer(self.tracer)
+        self.optimizer = CodeOptimizer(self.tracer)
+        self.generator = CodeGenerator(Scope(), self.tracer)
+        self.header_written = False
+        # Bases de numeración: cuádruplos (original y optimizado), temporales y etiquetas
+        self.quad_base = self.optimized_base = self.temp_base = self.label_base = 0
+
+    def timed(self, phase: CompilerPhase, start: float):
+        self.phase_timings[phase.value] += (time.perf_counter() - start) * 1000
+
+    # --- DIAGNÓSTICOS ---
+
+    def report(self, diagnostics: List[Diagnostic]):
+        """Escribe los diagnósticos de una función ordenados por posición"""
+        for d in sorted(diagnostics, key=lambda d: -1 if d.start is None else d.start):
+            if d.severity.value == "error":
+                self.metrics["errors_count"] += 1
+            else:
+                self.metrics["warnings_count"] += 1
+            shown = self.metrics["errors_count"] + self.metrics["warnings_count"]
+            if self.max_diagnostics is not None and shown > self.max_diagnostics:
+                continue
+            line, column = self.cursor.position(d.start) if d.start is not None else (0, 0)
+            self.diagnostics_out.write(
+                f"{self.path}:{line}:{column}: {d.severity.value} {d.code}: {d.message}\n")
+
+    # --- COMPILACIÓN ---
+
+    def function_tokens(self, lexer_errors: List[Diagnostic]) -> Iterator[List[LexToken]]:
+        """Tokens agrupados por función: cada grupo empieza en un 'function' (salvo el
+        primero, si el archivo empieza con otra cosa). El tiempo del lexer es el que
+        pasa dentro de este generador."""
+        tokens = scan(self.source, 0, len(self.source), 1, 0, lexer_errors, [])
+        group: List[LexToken] = []
+        start = time.perf_counter()
+        for token in tokens:
+            if token.type == "KEYWORD" and token.value == "function" and group:
+                self.timed(CompilerPhase.LEXER, start)
+                yield group
+                start = time.perf_counter()
+                group = []
+            group.append(token)
+        self.timed(CompilerPhase.LEXER, start)
+        if group:
+            yield group
+
+    def run(self) -> Dict[str, float]:
+        """Compila todo el archivo; devuelve las métricas"""
+        lexer_errors: List[Diagnostic] = []
+        groups = self.function_tokens(lexer_errors)
+        for n, tokens in enumerate(groups):
+            self.metrics["tokens_count"] += len(tokens)
+            if n == 0 and tokens[0].value != "function":
+                # Igual que Parser.parse_program: nada antes de la primera función es
+                # válido y el programa queda vacío. Se sigue tokenizando para reportar
+                # los errores léxicos.
+                first = tokens[0]
+                self.report(lexer_errors + [error(
+                    CompilerPhase.PARSER, "P001", f"Tokens inesperados después del programa: {first}",
+                    first.start, first.end)])
+                lexer_errors.clear()
+                for rest in groups:
+                    self.metrics["tokens_count"] += len(rest)
+                    self.report(lexer_errors)
+                    lexer_errors.clear()
+                break
+            diagnostics = lexer_errors[:]
+            lexer_errors.clear()
+            self.compile_function(tokens, diagnostics)
+            self.report(diagnostics)
+        self.report(lexer_errors)
+        self.finish()
+        return self.metrics
+
+    def compile_function(self, tokens: List[LexToken], diagnostics: List[Diagnostic]):
+        """Todas las fases sobre una función; los diagnósticos se agregan a diagnostics"""
+        start = time.perf_counter()
+        arena, parse_errors = Parser().parse(tokens)
+        diagnostics.extend(parse_errors)
+        function = arena.first_child[ROOT]
+        self.timed(CompilerPhase.PARSER, start)
+        if function == NONE:
+            return
+        self.metrics["functions_count"] += 1
+
+        start = time.perf_counter()
+        analyzer = self.analyzer
+        try:
+            table = analyzer.analyze_function(arena, function)
+        except Exception as e:
+            diagnostics.append(error(CompilerPhase.SEMANTIC, "S900", f"Fallo análisis semántico: {e}"))
+            table = None
+        diagnostics.extend(analyzer.errors)
+        diagnostics.extend(analyzer.warnings)
+        analyzer.errors, analyzer.warnings = [], []
+        self.timed(CompilerPhase.SEMANTIC, start)
+
+        start = time.perf_counter()
+        try:
+            quads, temp_count, labels = generate_function_ir(arena, function, self.tracer)
+        except Exception as e:
+            diagnostics.append(error(CompilerPhase.INTERMEDIATE, "G900", f"Fallo generación intermedia: {e}"))
+            return
+        renames = offset_renames(temp_count, labels, self.temp_base, self.label_base)
+        out = self.outputs.get(Artifact.INTERMEDIATE_CODE)
+        if out is not None:
+            write_quadruples(out, quads, self.quad_base, renames)
+        self.timed(CompilerPhase.INTERMEDIATE, start)
+
+        start = time.perf_counter()
+        try:
+            optimized, _ = self.optimizer.optimize(quads)
+        except Exception as e:
+            diagnostics.append(warning(CompilerPhase.OPTIMIZER, "G901", f"Error optimizando: {e}"))
+            optimized = quads
+        placed = renumber_quadruples(optimized, temp_count, labels, self.temp_base, self.label_base)
+        out = self.outputs.get(Artifact.OPTIMIZED_CODE)
+        if out is not None:
+            write_quadruples(out, placed, self.optimized_base)
+        self.timed(CompilerPhase.OPTIMIZER, start)
+
+        start = time.perf_counter()
+        out = self.outputs.get(Artifact.OBJECT_CODE)
+        if out is not None and placed:
+            try:
+                self.generate_object_code(out, table, placed)
+            except Exception as e:
+                diagnostics.append(error(CompilerPhase.CODEGEN, "G902", f"Error código objeto: {e}"))
+        self.timed(CompilerPhase.CODEGEN, start)
+
+        self.quad_base += len(quads)
+        self.optimized_base += len(optimized)
+        self.temp_base += temp_count
+        self.label_base += len(labels)
+        self.metrics["quadruples_count"] = self.quad_base
+        self.metrics["optimized_count"] = self.optimized_base
+        self.metrics["temporals_count"] = self.temp_base
+
+    def generate_object_code(self, out: TextIO, table: Optional[Scope], code: QuadrupleStore):
+        gen = self.generator
+        gen.generated_code = []
+        if not self.header_written:
+            gen.generate_header()
+            self.header_written = True
+        # Las variables locales se buscan en la tabla de la función
+        gen.set_symbol_table(table or Scope())
+        gen.generate_functions(code)
+        out.write("\n".join(gen.generated_code) + "\n")
+
+    def finish(self):
+        out = self.outputs.get(Artifact.OBJECT_CODE)
+        if out is None:
+            return
+        start = time.perf_counter()
+        gen = self.generator
+        if not self.header_written:
+            out.write("# No se pudo generar código\n")
+        else:
+            gen.generated_code = []
+            gen.generate_footer()
+            out.write("\n".join(gen.generated_code) + "\n")
+        self.timed(CompilerPhase.CODEGEN, start)
+
+def compile_file(path: str, output_prefix: str, artifacts: List[Artifact], diagnostics: TextIO,
+                 max_diagnostics: Optional[int] = None) -> Dict[str, float]:
+    """Compila el archivo path y escribe cada artefacto en output_prefix + sufijo.
+    Devuelve las métricas, con los tiempos por fase en "phase_timings"."""
+    files = {artifact: open(output_prefix + ARTIFACT_SUFFIX[artifact], "w", encoding="utf-8")
+             for artifact in artifacts}
+    try:
+        for artifact in (Artifact.INTERMEDIATE_CODE, Artifact.OPTIMIZED_CODE):
+            if artifact in files:
+                files[artifact].write("\t".join(QUADRUPLE_COLUMNS) + "\n")
+        with open_source(path) as source:
+            run = FileCompilation(source, files, diagnostics, path, max_diagnostics)
+            metrics = run.run()
+            metrics["phase_timings"] = run.phase_timings
+            metrics["source_bytes"] = os.path.getsize(path)
+            metrics["mapped"] = not isinstance(source, str)
+    finally:
+        for f in files.values():
+            f.close()
+    return metrics
@@ -1,163 +1,217 @@
-from app.models.schemas import Quadruple, QuadrupleType
-from typing import List, Tuple, Any, Optional
-import re
+from app.models.schemas import QuadrupleType, DataType
+from app.compiler.trace import Tracer, default_tracer
+from app.compiler.quadruples import QuadrupleStore, NONE, OPERATOR, CONSTANT, TEMPORARY
+from typing import List, Tuple, Any, Optional, Dict
+import operator
+import time
+
+# Operaciones que se pliegan directo en int o float según el tipo del cuádruplo
+# (la división va aparte: entera en int, como la genera CodeGenerator)
+NUMERIC_OPERATIONS = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul,
+    '>': operator.gt, '<': operator.lt, '>=': operator.ge, '<=': operator.le,
+    '==': operator.eq, '!=': operator.ne,
+}
+NUMERIC_PARSERS = {DataType.INT: int, DataType.FLOAT: float}
+
+# Tipos de cuádruplo que se pliegan, que pueden ser código muerto y que cortan
+# la eliminación de asignaciones redundantes
+FOLDABLE_TYPES = frozenset({QuadrupleType.ARITHMETIC, QuadrupleType.COMPARISON})
+DEAD_CODE_TYPES = frozenset({QuadrupleType.ASSIGNMENT, QuadrupleType.ARITHMETIC})
+BARRIER_TYPES = frozenset({QuadrupleType.LABEL, QuadrupleType.JUMP, QuadrupleType.CALL, QuadrupleType.RETURN})
 
 class CodeOptimizer:
-    def __init__(self):
+    def __init__(self, tracer: Optional[Tracer] = None):
+        self.tracer = tracer or default_tracer
         self.optimizations_applied = []
+        # Mensajes ya registrados, para no repetirlos sin recorrer la lista
+        self.logged = set()
+        # Tiempo acumulado (ms) de cada pase a lo largo de todas las pasadas
+        self.pass_timings: Dict[str, float] = {}
     
-    def optimize(self, quadruples: List[Quadruple]) -> Tuple[List[Quadruple], List[str]]:
+    def optimize(self, code: QuadrupleStore) -> Tuple[QuadrupleStore, List[str]]:
+        """Optimiza el código intermedio; cada pase devuelve un store nuevo (con la
+        misma tabla de strings) y el de entrada no se modifica"""
         self.optimizations_applied = []
-        if not quadruples: return [], []
+        self.logged = set()
+        self.pass_timings = {}
+        if not code: return code.empty(), []
         
-        current_quads = [q.copy() for q in quadruples]
+        current = code
         pass_count = 0
         max_passes = 10 
         
-        print("=== INICIANDO OPTIMIZACIÓN ===")
+        if self.tracer.info: self.tracer.emit("=== INICIANDO OPTIMIZACIÓN ===")
         
         while pass_count < max_passes:
             pass_count += 1
-            prev_quads_str = str([q.dict() for q in current_quads])
+            previous = current
             
             try:
-                current_quads = self.constant_propagation(current_quads)
-                current_quads = self.constant_folding(current_quads)
-                current_quads = self.jump_optimization(current_quads)
-                current_quads = self.redundant_assignment_elimination(current_quads)
-                current_quads = self.dead_code_elimination(current_quads)
+                for opt_pass in (self.constant_propagation, self.constant_folding,
+                                 self.jump_optimization, self.redundant_assignment_elimination,
+                                 self.dead_code_elimination):
+                    pass_start = time.perf_counter()
+                    current = opt_pass(current)
+                    elapsed = (time.perf_counter() - pass_start) * 1000
+                    self.pass_timings[opt_pass.__name__] = self.pass_timings.get(opt_pass.__name__, 0) + elapsed
             except Exception as e:
-                print(f"Error en pase de optimización {pass_count}: {e}")
+                if self.tracer.info: self.tracer.emit(f"Error en pase de optimización {pass_count}: {e}")
                 # Si falla una optimización, salir con lo que tenemos para no colgar
                 break
             
-            if str([q.dict() for q in current_quads]) == prev_quads_str:
+            # Misma tabla de strings: comparar los índices es comparar los cuádruplos
+            if current.columns() == previous.columns():
                 self.log(f"🔄 Convergencia alcanzada en la pasada {pass_count}")
                 break
         
-        for i, quad in enumerate(current_quads):
-            quad.index = i
-            
-        return current_quads, self.optimizations_applied
+        return current, self.optimizations_applied
     
     # --- MÉTODOS DE OPTIMIZACIÓN (Sin cambios lógicos, solo robustez) ---
 
-    def constant_propagation(self, quadruples: List[Quadruple]) -> List[Quadruple]:
-        constant_map = {}
-        optimized = []
-        for quad in quadruples:
-            new_quad = quad.copy()
-            
-            # Robustez: verificar que args existen
-            if quad.arg1 and quad.arg1 in constant_map:
-                new_quad.arg1 = constant_map[quad.arg1]
-                self.log(f"Propagación: {quad.arg1} -> {constant_map[quad.arg1]}")
-            if quad.arg2 and quad.arg2 in constant_map:
-                new_quad.arg2 = constant_map[quad.arg2]
-                self.log(f"Propagación: {quad.arg2} -> {constant_map[quad.arg2]}")
+    def constant_propagation(self, code: QuadrupleStore) -> QuadrupleStore:
+        optimized = code.copy()
+        arg1s, arg2s, results, types = optimized.arg1, optimized.arg2, optimized.result, optimized.quadruple_type
+        strings, kinds = optimized.strings, optimized.kind
+        constant_map: Dict[int, int] = {}
+        for i in range(len(optimized)):
+            # Robustez: verificar que args existen (NONE nunca está en el mapa)
+            arg1 = arg1s[i]
+            if arg1 in constant_map:
+                value = arg1s[i] = constant_map[arg1]
+                self.log(f"Propagación: {strings[arg1]} -> {strings[value]}")
+            arg2 = arg2s[i]
+            if arg2 in constant_map:
+                value = arg2s[i] = constant_map[arg2]
+                self.log(f"Propagación: {strings[arg2]} -> {strings[value]}")
             
-            if quad.quadruple_type == QuadrupleType.ASSIGNMENT:
-                if self.is_constant(new_quad.arg1) and new_quad.result:
-                    constant_map[new_quad.result] = new_quad.arg1
-                elif new_quad.result in constant_map:
-                    del constant_map[new_quad.result]
-            elif quad.result and quad.result in constant_map:
-                del constant_map[quad.result]
-            
-            optimized.append(new_quad)
+            result = results[i]
+            if types[i] is QuadrupleType.ASSIGNMENT:
+                value = arg1s[i]
+                if value != NONE and kinds[value] == CONSTANT and result != NONE and strings[result]:
+                    constant_map[result] = value
+                elif result in constant_map:
+                    del constant_map[result]
+            elif result in constant_map:
+                del constant_map[result]
         return optimized
 
-    def constant_folding(self, quadruples: List[Quadruple]) -> List[Quadruple]:
-        optimized = []
-        for quad in quadruples:
+    def constant_folding(self, code: QuadrupleStore) -> QuadrupleStore:
+        optimized = code.copy()
+        operators, arg1s, arg2s = optimized.operator, optimized.arg1, optimized.arg2
+        types, data_types, strings = optimized.quadruple_type, optimized.data_type, optimized.strings
+        kinds = optimized.kind
+        assign = optimized.intern("=", OPERATOR)
+        for i in range(len(optimized)):
             # Solo si ambos argumentos son constantes válidas
-            if (quad.quadruple_type in [QuadrupleType.ARITHMETIC, QuadrupleType.COMPARISON] and
-                self.is_constant(quad.arg1) and self.is_constant(quad.arg2)):
-                
-                res = self.evaluate_constant_expression(quad.arg1, quad.arg2, quad.operator)
+            arg1, arg2 = arg1s[i], arg2s[i]
+            if (types[i] in FOLDABLE_TYPES and arg1 != NONE and arg2 != NONE and
+                kinds[arg1] == CONSTANT and kinds[arg2] == CONSTANT):
+                a1, a2, op = strings[arg1], strings[arg2], strings[operators[i]]
+                res = self.evaluate_typed(a1, a2, op, data_types[i])
+                if res is None:
+                    res = self.evaluate_constant_expression(a1, a2, op)
                 if res is not None:
-                    new_quad = Quadruple(
-                        index=quad.index, operator="=", arg1=str(res), 
-                        result=quad.result, quadruple_type=QuadrupleType.ASSIGNMENT
-                    )
-                    optimized.append(new_quad)
-                    self.log(f"Plegado: {quad.arg1} {quad.operator} {quad.arg2} -> {res}")
-                    continue
-            optimized.append(quad)
+                    operators[i], arg1s[i], arg2s[i] = assign, optimized.intern(str(res), CONSTANT), NONE
+                    types[i], data_types[i] = QuadrupleType.ASSIGNMENT, None
+                    self.log(f"Plegado: {a1} {op} {a2} -> {res}")
         return optimized
 
-    def jump_optimization(self, quadruples: List[Quadruple]) -> List[Quadruple]:
-        optimized = []
-        i = 0
-        while i < len(quadruples):
-            quad = quadruples[i]
+    def jump_optimization(self, code: QuadrupleStore) -> QuadrupleStore:
+        optimized = code.copy()
+        operators, arg1s, arg2s, results = optimized.operator, optimized.arg1, optimized.arg2, optimized.result
+        types, data_types, strings = optimized.quadruple_type, optimized.data_type, optimized.strings
+        kinds = optimized.kind
+        if_false, goto = optimized.intern("if_false", OPERATOR), optimized.intern("goto", OPERATOR)
+        kept = []
+        count = len(optimized)
+        for i in range(count):
             # Optimización de if_false con constante
-            if quad.operator == "if_false" and self.is_constant(quad.arg1):
+            arg1 = arg1s[i]
+            if operators[i] == if_false and arg1 != NONE and kinds[arg1] == CONSTANT:
                 try:
-                    val = float(quad.arg1)
+                    val = float(strings[arg1])
                     if val != 0: 
-                        self.log(f"Rama muerta eliminada (if_false {quad.arg1})")
-                        i+=1; continue
+                        self.log(f"Rama muerta eliminada (if_false {strings[arg1]})")
+                        continue
                     else:
                         self.log(f"Salto optimizado a incondicional")
-                        optimized.append(Quadruple(index=quad.index, operator="goto", result=quad.result, quadruple_type=QuadrupleType.JUMP))
-                        i+=1; continue
-                except: pass # Si falla conversión float, ignorar
+                        operators[i], arg1s[i], arg2s[i] = goto, NONE, NONE
+                        types[i], data_types[i] = QuadrupleType.JUMP, None
+                        kept.append(i)
+                        continue
+                except ValueError: pass # Si falla conversión float, ignorar
 
-            if (quad.quadruple_type == QuadrupleType.JUMP and i + 1 < len(quadruples) and 
-                quadruples[i+1].quadruple_type == QuadrupleType.LABEL and quad.result == quadruples[i+1].result):
-                self.log(f"Salto redundante eliminado a {quad.result}")
-                i+=1; continue
-            optimized.append(quad)
-            i+=1
-        return optimized
+            if (types[i] is QuadrupleType.JUMP and i + 1 < count and
+                types[i+1] is QuadrupleType.LABEL and results[i] == results[i+1]):
+                self.log(f"Salto redundante eliminado a {strings[results[i]] if results[i] != NONE else None}")
+                continue
+            kept.append(i)
+        return optimized.select(kept)
 
-    def dead_code_elimination(self, quadruples: List[Quadruple]) -> List[Quadruple]:
-        used = set()
-        ref_labels = set()
-        for q in quadruples:
-            if q.arg1: used.add(q.arg1)
-            if q.arg2: used.add(q.arg2)
-            if q.operator == "if_false": used.add(q.arg1)
-            if q.quadruple_type == QuadrupleType.WRITE: used.add(q.arg1) 
-            if q.quadruple_type == QuadrupleType.JUMP: ref_labels.add(q.result)
+    def dead_code_elimination(self, code: QuadrupleStore) -> QuadrupleStore:
+        # Los operandos usados y las etiquetas referenciadas, como índices en la tabla
+        # (if_false y write solo leen arg1, que ya está en used)
+        used = set(code.arg1)
+        used.update(code.arg2)
+        types, results, strings, kinds = code.quadruple_type, code.result, code.strings, code.kind
+        ref_labels = {results[i] for i in range(len(code)) if types[i] is QuadrupleType.JUMP}
             
-        optimized = []
-        for quad in quadruples:
-            if (quad.quadruple_type in [QuadrupleType.ASSIGNMENT, QuadrupleType.ARITHMETIC] and
-                self.is_temporary(quad.result) and quad.result not in used):
-                self.log(f"Eliminación código muerto: {quad.result}")
+        kept = []
+        for i in range(len(code)):
+            quad_type, result = types[i], results[i]
+            if (quad_type in DEAD_CODE_TYPES and result != NONE and
+                kinds[result] == TEMPORARY and result not in used):
+                self.log(f"Eliminación código muerto: {strings[result]}")
                 continue
-            if (quad.quadruple_type == QuadrupleType.LABEL and quad.result and 
-                not quad.result.startswith("func_") and quad.result not in ref_labels):
-                self.log(f"Etiqueta muerta eliminada: {quad.result}")
+            if (quad_type is QuadrupleType.LABEL and result != NONE and strings[result] and
+                not strings[result].startswith("func_") and result not in ref_labels):
+                self.log(f"Etiqueta muerta eliminada: {strings[result]}")
                 continue
-            optimized.append(quad)
-        return optimized
+            kept.append(i)
+        return code.select(kept)
 
-    def redundant_assignment_elimination(self, quadruples: List[Quadruple]) -> List[Quadruple]:
-        optimized = []
-        vals = {}
-        for quad in quadruples:
-            if quad.quadruple_type in [QuadrupleType.LABEL, QuadrupleType.JUMP, QuadrupleType.CALL, QuadrupleType.RETURN]:
-                vals.clear(); optimized.append(quad); continue
+    def redundant_assignment_elimination(self, code: QuadrupleStore) -> QuadrupleStore:
+        types, arg1s, results, strings = code.quadruple_type, code.arg1, code.result, code.strings
+        kept = []
+        vals: Dict[int, int] = {}
+        for i in range(len(code)):
+            quad_type, result = types[i], results[i]
+            if quad_type in BARRIER_TYPES:
+                vals.clear(); kept.append(i); continue
             
-            if quad.quadruple_type == QuadrupleType.ASSIGNMENT:
-                if quad.result in vals and vals[quad.result] == quad.arg1:
-                    self.log(f"Asignación redundante eliminada: {quad.result} = {quad.arg1}")
+            if quad_type is QuadrupleType.ASSIGNMENT:
+                arg1 = arg1s[i]
+                if result in vals and vals[result] == arg1:
+                    self.log(f"Asignación redundante eliminada: {code.text(result)} = {code.text(arg1)}")
                     continue
-                if quad.result: vals[quad.result] = quad.arg1
-            elif quad.result in vals: 
-                del vals[quad.result]
-            optimized.append(quad)
-        return optimized
+                if result != NONE and strings[result]: vals[result] = arg1
+            elif result in vals: 
+                del vals[result]
+            kept.append(i)
+        return code.select(kept)
 
-    def is_constant(self, val):
-        if not val: return False
-        return bool(re.match(r'^-?\d+(\.\d+)?$', str(val))) or (str(val).startswith('"') and str(val).endswith('"'))
-    
-    def is_temporary(self, val):
-        return val and str(val).startswith('t')
+    def evaluate_typed(self, a1, a2, op, data_type):
+        """Pliega una operación de tipo conocido sin pasar por float: int con int
+        (división entera), float con float y concatenación de strings. None si el
+        tipo no se conoce o los operandos no son de ese tipo."""
+        parse = NUMERIC_PARSERS.get(data_type)
+        if parse is not None:
+            try:
+                v1, v2 = parse(a1), parse(a2)
+            except ValueError:
+                return None
+            operation = NUMERIC_OPERATIONS.get(op)
+            if operation is not None:
+                res = operation(v1, v2)
+                return int(res) if type(res) is bool else res
+            if op == '/':
+                if not v2: return 0
+                return v1 // v2 if data_type is DataType.INT else v1 / v2
+            return None
+        if data_type is DataType.STRING and op == '+' and a1[0] == a2[0] == '"':
+            return f'"{a1[1:-1]}{a2[1:-1]}"'
+        return None
 
     def evaluate_constant_expression(self, a1, a2, op):
         try:
@@ -169,8 +223,12 @@ class CodeOptimizer:
             elif op == '>': return 1 if v1 > v2 else 0
             elif op == '<': return 1 if v1 < v2 else 0
             elif op == '==': return 1 if v1 == v2 else 0
+            elif op == '&&': return 1 if v1 and v2 else 0
+            elif op == '||': return 1 if v1 or v2 else 0
             return None
         except: return None
 
     def log(self, msg):
-        if msg not in self.optimizations_applied: self.optimizations_applied.append(msg)
\ No newline at end of file
+        if msg not in self.logged:
+            self.logged.add(msg)
+            self.optimizations_applied.append(msg)
\ No newline at end of file
@@ -0,0 +1,185 @@
+from app.models.schemas import (
+    CompileRequest, CompileResponse, CompilerPhase, SymbolTable
+)
+from app.compiler.lexer import Lexer
+from app.compiler.parser import Parser
+from app.compiler.arena import AstArena, PROGRAM, ROOT
+from app.compiler.semantic import SemanticAnalyzer, FunctionAnalysis
+from app.compiler.incremental import RecordingGenerator, FunctionIR, merge_function_ir
+from app.compiler.pipeline import CompilationRun, PHASE_ORDER
+from app.compiler.trace import Tracer, TRACE_OFF
+from app.compiler.diagnostics import Diagnostic
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, NamedTuple, Optional
+import os
+
+# Procesos que compilan en paralelo las funciones de un programa grande (0 = nunca).
+# Apagado por defecto: con el executor de procesos cada compilación ya ocupa un núcleo.
+PARALLEL_WORKERS = int(os.environ.get("COMPILER_PARALLEL_WORKERS", 0))
+# Tamaño mínimo del código (caracteres) para repartirlo entre procesos
+PARALLEL_MIN_CHARS = int(os.environ.get("COMPILER_PARALLEL_MIN_CHARS", 200_000))
+# Trozos por worker: más trozos reparten mejor la carga, menos ahorran envíos
+CHUNKS_PER_WORKER = 4
+
+QUIET = Tracer(TRACE_OFF)
+
+class Chunk(NamedTuple):
+    """Funciones consecutivas del programa, desde un 'function' hasta el siguiente trozo"""
+    text: str
+    # Offset del trozo en el programa, su línea y el offset donde empieza esa línea
+    start: int
+    line: int
+    line_start: int
+    # El texto termina con el 'function' del trozo siguiente, que el parser solo usa
+    # como anticipación (ver Parser.parse)
+    sentinel: bool
+
+class ChunkResult(NamedTuple):
+    # None si el parser falló (en serie tampoco habría AST)
+    arena: Optional[AstArena]
+    parse_errors: List[Diagnostic]
+    # Un análisis por función (None si falló y hay que repetirlo); None si no se pidió la fase
+    analyses: Optional[List[Optional[FunctionAnalysis]]]
+    # Código intermedio con contadores propios; None si no se pidió la fase
+    ir: Optional[FunctionIR]
+
+def compile_chunk(chunk: Chunk, last_phase: int) -> ChunkResult:
+    """Sintáctico, semántico e intermedio de un trozo (corre en un worker). Los
+    errores léxicos ya los reportó el proceso principal."""
+    tokens, _, _ = Lexer().tokenize_range(chunk.text, 0, len(chunk.text), chunk.line,
+                                          chunk.line_start - chunk.start)
+    arena, parse_errors = Parser().parse(tokens, stop=len(tokens) - 1 if chunk.sentinel else None)
+    if arena is None:
+        return ChunkResult(None, [e.shifted(chunk.start) for e in parse_errors], None, None)
+    # Offsets del trozo -> offsets del programa
+    arena.shift(chunk.start, 0)
+    parse_errors = [e.shifted(chunk.start) for e in parse_errors]
+
+    analyses = ir = None
+    if last_phase >= PHASE_ORDER.index(CompilerPhase.SEMANTIC):
+        analyzer = SemanticAnalyzer(QUIET)
+        analyses = []
+        for function in arena.children(ROOT):
+            try:
+                analyses.append(analyzer.analyze_detached(arena, function))
+            except Exception:
+                analyses.append(None)  # Se repite en el proceso principal, que reporta el fallo
+    if last_phase >= PHASE_ORDER.index(CompilerPhase.INTERMEDIATE):
+        gen = RecordingGenerator(SymbolTable(), QUIET)
+        ir = (gen.generate(arena), gen.temporal_counter, gen.created_labels)
+    return ChunkResult(arena, parse_errors, analyses, ir)
+
+pool: Optional[ProcessPoolExecutor] = None
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool de workers, creado la primera vez que se usa en este proceso"""
+    global pool
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    return pool
+
+class ParallelRun(CompilationRun):
+    """CompilationRun que reparte las funciones de un programa grande entre procesos.
+
+    El léxico corre aquí y el código se parte en cada 'function' de nivel superior
+    (ninguna función depende del cuerpo de otra). Cada worker analiza sintáctica y
+    semánticamente un trozo de funciones consecutivas y genera su código intermedio
+    con contadores propios. Los resultados se unen en orden: los arenas bajo un
+    solo Program, las tablas de símbolos con SemanticAnalyzer.merge (direcciones
+    globales) y los cuádruplos con merge_function_ir (temporales y etiquetas), así
+    que la respuesta es la misma que en serie. El tiempo de los workers se cuenta
+    en la fase sintáctica.
+    """
+
+    def __init__(self, request: CompileRequest, workers: int = PARALLEL_WORKERS):
+        super().__init__(request)
+        self.workers = workers
+        # El lexer corre completo aquí: hace falta para ubicar los cortes
+        self.stream_tokens = False
+        self.results: Optional[List[ChunkResult]] = None
+        # Nodo de cada función en el arena unido
+        self.functions: List[int] = []
+
+    def split_chunks(self) -> Optional[List[Chunk]]:
+        """Trozos de funciones consecutivas con cantidades de tokens parecidas; None si
+        no hay nada que repartir"""
+        tokens, code = self.tokens, self.request.code
+        cuts = [i for i, t in enumerate(tokens) if t.type == "KEYWORD" and t.value == "function"]
+        if len(cuts) < 2 or cuts[0] != 0:
+            return None  # Una sola función, o un preámbulo que deja el programa vacío
+
+        size = len(tokens) / min(len(cuts), self.workers * CHUNKS_PER_WORKER)
+        bounds = [0]
+        for cut in cuts[1:]:
+            if cut >= len(bounds) * size:
+                bounds.append(cut)
+
+        chunks = []
+        for n, first in enumerate(bounds):
+            token = tokens[first]
+            sentinel = n + 1 < len(bounds)
+            end = tokens[bounds[n + 1]].end if sentinel else len(code)
+            chunks.append(Chunk(code[token.start:end], token.start, token.line,
+                                token.start - (token.column - 1), sentinel))
+        return chunks
+
+    def run_parser(self) -> bool:
+        if not self.tokens:
+            return False
+        chunks = self.split_chunks()
+        if chunks is None:
+            return super().run_parser()
+        try:
+            results = list(process_pool(self.workers).map(compile_chunk, chunks, repeat(self.last_phase)))
+        except Exception:
+            return super().run_parser()  # Pool caído: se compila en serie
+
+        ast = AstArena()
+        ast.add(PROGRAM)
+        parse_errors = self.errors[CompilerPhase.PARSER]
+        for n, result in enumerate(results):
+            parse_errors.extend(result.parse_errors)
+            if result.arena is None:
+                return True  # Sin AST, como en serie
+            offset = ast.extend(result.arena)
+            for function in result.arena.children(ROOT):
+                self.functions.append(function + offset)
+                ast.append_child(ROOT, function + offset)
+            if any(e.code == "P001" for e in result.parse_errors):
+                # Quedaron tokens sueltos: en serie el programa termina en este trozo
+                results = results[:n + 1]
+                break
+        self.ast, self.results = ast, results
+        # Sin contar el Program de cada trozo, que quedó suelto
+        self.metrics["ast_nodes_count"] = len(ast) - len(results)
+        self.metrics["parallel_chunks"] = len(results)
+        return True
+
+    def analyze(self, analyzer: SemanticAnalyzer):
+        if self.results is None:
+            return super().analyze(analyzer)
+        parts = [part for result in self.results for part in result.analyses]
+        analyzer.merge(self.ast, self.functions, parts)
+
+    def run_intermediate(self) -> bool:
+        if self.results is None:
+            return super().run_intermediate()
+        self.intermediate_code, temporals, _ = merge_function_ir([result.ir for result in self.results])
+        self.metrics["quadruples_count"] = len(self.intermediate_code)
+        self.metrics["temporals_count"] = temporals
+        return True
+
+def compilation_run(request: CompileRequest) -> CompilationRun:
+    """ParallelRun si el programa es grande y hay workers configurados; si no, CompilationRun.
+    Con debug se compila en serie para que la traza quede completa."""
+    if PARALLEL_WORKERS > 1 and len(request.code) >= PARALLEL_MIN_CHARS and not request.debug:
+        return ParallelRun(request)
+    return CompilationRun(request)
+
+def compile_request(request: CompileRequest) -> CompileResponse:
+    """Como compile_program, pero reparte entre procesos los programas grandes"""
+    run = compilation_run(request)
+    for _ in run.phases():
+        pass
+    return run.response()
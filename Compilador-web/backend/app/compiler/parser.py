@@ -1,54 +1,287 @@
-from app.models.schemas import ASTNode, Token
-from typing import List, Optional, Tuple
-from app.compiler.lexer import Lexer
+from app.models.schemas import CompilerPhase, DataType
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import os
+from app.compiler.lexer import Lexer, LexToken
+from app.compiler.diagnostics import Diagnostic, error
+from app.compiler.arena import (
+    AstArena, PROGRAM, FUNCTION_DECLARATION, BLOCK, VARIABLE_DECLARATION, ASSIGNMENT,
+    EXPRESSION_STATEMENT, IF_STATEMENT, WHILE_STATEMENT, RETURN_STATEMENT, PRINT_STATEMENT,
+    BINARY_EXPRESSION, UNARY_EXPRESSION, IDENTIFIER, LITERAL, STRING_LITERAL, BOOLEAN_LITERAL
+)
+
+RELATIONAL_OPERATORS = frozenset({">", "<", "==", "!=", ">=", "<="})
+ADDITIVE_OPERATORS = frozenset({"+", "-"})
+MULTIPLICATIVE_OPERATORS = frozenset({"*", "/"})
+ARITHMETIC_OPERATORS = ADDITIVE_OPERATORS | MULTIPLICATIVE_OPERATORS
+LOGICAL_OPERATORS = frozenset({"&&", "||"})
+
+# Precedencia de los operadores binarios (mayor liga más fuerte). Los relacionales
+# comparten nivel, como en la gramática original.
+BINARY_PRECEDENCE = {
+    "||": 1,
+    "&&": 2,
+    **dict.fromkeys(RELATIONAL_OPERATORS, 3),
+    **dict.fromkeys(ADDITIVE_OPERATORS, 4),
+    **dict.fromkeys(MULTIPLICATIVE_OPERATORS, 5),
+}
+UNARY_OPERATORS = frozenset({"-", "!"})
+UNARY_PRECEDENCE = 6
+
+TYPE_KEYWORDS = frozenset({"int", "float", "bool", "string"})
+BOOLEAN_KEYWORDS = frozenset({"true", "false"})
+LITERAL_TYPES = frozenset({"INTEGER", "FLOAT"})
+
+NUMERIC_TYPES = frozenset({DataType.INT, DataType.FLOAT})
+# Tipo declarado por cada palabra clave de tipo
+DECLARED_TYPES = {data_type.value: data_type for data_type in DataType}
+
+def operand_type(left: Optional[DataType], right: Optional[DataType]) -> Optional[DataType]:
+    """Tipo en el que se opera con left y right: el de los dos si coinciden, float si
+    se mezclan int y float; None si alguno no se conoce o no combinan"""
+    if left is right and left is not DataType.VOID:
+        return left
+    if left in NUMERIC_TYPES and right in NUMERIC_TYPES:
+        return DataType.FLOAT
+    return None
+
+def binary_type(operator: str, left: Optional[DataType], right: Optional[DataType]) -> Optional[DataType]:
+    """Tipo del resultado de left operator right (None si no se puede deducir)"""
+    if operator in RELATIONAL_OPERATORS or operator in LOGICAL_OPERATORS:
+        return DataType.BOOL
+    data_type = operand_type(left, right)
+    if data_type in NUMERIC_TYPES or (data_type is DataType.STRING and operator == "+"):
+        return data_type
+    return None
+
+def unary_type(operator: str, operand: Optional[DataType]) -> Optional[DataType]:
+    if operator == "!":
+        return DataType.BOOL
+    return operand if operand in NUMERIC_TYPES else None
+
+# Tokens ya consumidos que se acumulan antes de descartarlos en modo streaming
+DEFAULT_LOOKAHEAD = 64
+
+# Máximo de bloques abiertos a la vez y de operadores unarios encadenados. Ninguna
+# fase usa la pila de Python (los árboles de la respuesta se mandan entre procesos y
+# se serializan sin recursión, ver app.api.encoding), así que solo acotan el tamaño
+# del árbol que recibe el cliente. Los paréntesis no agregan nodos y no cuentan.
+DEFAULT_MAX_NESTING = int(os.environ.get("COMPILER_MAX_NESTING", 500))
+DEFAULT_MAX_UNARY = int(os.environ.get("COMPILER_MAX_UNARY", 5000))
+
+class TokenBuffer:
+    """Ventana de tokens del parser.
+
+    Con una lista es un acceso por índice. Con un iterador (p. ej. Lexer.tokenize_iter)
+    los tokens se piden al lexer a medida que el parser avanza y los que quedan atrás
+    se descartan: el parser es LL(1) y nunca vuelve atrás, así que la memoria queda
+    acotada por la ventana y no por el tamaño del archivo.
+    """
+
+    def __init__(self, tokens: Iterable[LexToken], lookahead: int = DEFAULT_LOOKAHEAD):
+        if isinstance(tokens, list):
+            self.tokens, self.source = tokens, None
+            self.last_end = tokens[-1].end if tokens else 0
+        else:
+            self.tokens, self.source = [], iter(tokens)
+            self.last_end = 0  # Fin del último token leído (para errores al final de la entrada)
+        self.offset = 0  # Índice absoluto de self.tokens[0]
+        self.lookahead = lookahead
+
+    def get(self, index: int) -> Optional[LexToken]:
+        tokens = self.tokens
+        i = index - self.offset
+        if i < len(tokens):
+            return tokens[i]
+        if self.source is None:
+            return None
+
+        # Antes de pedir más, descartamos lo que ya no se puede volver a leer
+        drop = index - self.offset
+        if drop >= self.lookahead:
+            del tokens[:drop]
+            self.offset += drop
+            i -= drop
+        while i >= len(tokens):
+            token = next(self.source, None)
+            if token is None:
+                self.source = None
+                return None
+            tokens.append(token)
+            self.last_end = token.end
+        return tokens[i]
+
+    def pulled(self) -> int:
+        """Cantidad de tokens leídos hasta ahora"""
+        return self.offset + len(self.tokens)
 
 class Parser:
-    def __init__(self):
-        self.tokens = []
+    """Parser LL(1) que arma el AST en un AstArena.
+
+    De paso deduce el DataType de cada expresión al armar su nodo y lo guarda en
+    arena.data_type. Solo usa las declaraciones de variables y un scope por bloque
+    (función, then, else y cuerpo del while, los mismos del semántico), así que una
+    función da los mismos tipos analizada sola que dentro del programa. Un
+    identificador sin variable visible, o una operación entre tipos que no
+    combinan, queda sin tipo (None).
+    """
+
+    def __init__(self, max_nesting: int = DEFAULT_MAX_NESTING, max_unary: int = DEFAULT_MAX_UNARY):
+        self.buffer: Optional[TokenBuffer] = None
         self.current_token = None
         self.token_index = 0
         self.errors = []
+        self.max_nesting = max_nesting
+        self.max_unary = max_unary
+        # Índice del 'function' donde termina el programa (ver parse)
+        self.stop: Optional[int] = None
+        self.arena = AstArena()
+        # Bloques abiertos: (Block, sentencia if/while dueña o None para el de la función,
+        # tamaño del arena antes de esa sentencia)
+        self.blocks: List[Tuple[int, Optional[int], int]] = []
+        # Tamaño del arena al empezar la sentencia actual: si se abandona, el arena
+        # vuelve a ese tamaño y no quedan nodos sueltos
+        self.statement_start = 0
+        # Por nombre, la pila de tipos de las variables visibles (el de arriba es el más interno)
+        self.visible: Dict[str, List[Optional[DataType]]] = {}
+        # Nombres declarados en cada bloque abierto
+        self.scopes: List[Set[str]] = []
     
-    def parse(self, tokens: List[Token]) -> Tuple[Optional[ASTNode], List[str]]:
-        self.tokens = tokens
+    def parse(self, tokens: Iterable[LexToken], lookahead: int = DEFAULT_LOOKAHEAD,
+              stop: Optional[int] = None) -> Tuple[Optional[AstArena], List[Diagnostic]]:
+        """tokens puede ser la lista completa o un iterador: en ese caso el lexer y el
+        parser trabajan en paralelo y solo se guarda una ventana de tokens.
+        
+        Con stop, el token stop es el 'function' que empieza el resto del programa:
+        el análisis termina ahí y ese token solo se ve como anticipación, así que un
+        trozo del programa da los mismos errores que dentro del programa completo.
+        
+        Devuelve el AST como arena (el Program es el nodo 0). Los parse_* devuelven
+        el índice del nodo que arman, o None si la construcción estaba rota."""
+        self.buffer = TokenBuffer(tokens, lookahead)
+        self.stop = stop
         self.token_index = 0
         self.errors = []
+        self.blocks = []
+        self.visible, self.scopes = {}, []
+        self.arena = AstArena()
         
-        if not tokens:
-            return None, ["No hay tokens para analizar"]
-        
-        self.current_token = self.tokens[0]
+        self.current_token = self.buffer.get(0)
+        if not self.current_token:
+            return None, [error(CompilerPhase.PARSER, "P000", "No hay tokens para analizar")]
         
         try:
-            ast = self.parse_program()
+            self.parse_program()
             
             # Si hay tokens restantes, es un error
-            if self.current_token:
-                self.errors.append(f"Tokens inesperados después del programa: {self.current_token}")
+            if self.current_token and self.token_index != self.stop:
+                self.error("P001", f"Tokens inesperados después del programa: {self.current_token}")
             
-            return ast, self.errors
+            return self.arena, self.errors
         except Exception as e:
-            self.errors.append(f"Error de parsing: {str(e)}")
+            self.error("P002", f"Error de parsing: {str(e)}")
             return None, self.errors
     
     def advance(self):
         self.token_index += 1
-        if self.token_index < len(self.tokens):
-            self.current_token = self.tokens[self.token_index]
+        self.current_token = self.buffer.get(self.token_index)
+    
+    def peek(self) -> Optional[LexToken]:
+        """El token siguiente al actual (única anticipación que usa la gramática)"""
+        return self.buffer.get(self.token_index + 1)
+    
+    def at_function(self) -> bool:
+        token = self.current_token
+        return token is not None and token.value == "function" and token.type == "KEYWORD"
+    
+    def synchronize(self):
+        """Recuperación en modo pánico: descarta tokens hasta el final de la construcción
+        rota (';' consumido) o hasta un '}' o 'function' que cierran algo de afuera.
+        Los bloques anidados se saltean enteros."""
+        depth = 0
+        while self.current_token:
+            value = self.current_token.value
+            if value == "{" and self.current_token.type == "DELIMITER":
+                depth += 1
+            elif value == "}" and self.current_token.type == "DELIMITER":
+                if depth == 0:
+                    return
+                depth -= 1
+                if depth == 0:
+                    self.advance()
+                    return
+            elif value == ";" and depth == 0 and self.current_token.type == "DELIMITER":
+                self.advance()
+                return
+            elif self.at_function():
+                return
+            self.advance()
+    
+    def error(self, code: str, message: str):
+        """Registra un error en el token actual (o al final de la entrada si ya no hay)"""
+        token = self.current_token
+        if token is not None:
+            start, end = token.start, token.end
         else:
-            self.current_token = None
+            start = end = self.buffer.last_end
+        # Al cerrar en cascada las construcciones abiertas (p. ej. un '}' que falta
+        # antes de 'function' o del final) basta con el primer error en esa posición
+        last = self.errors[-1] if self.errors else None
+        if last is not None and last.start == start and last.end == end:
+            return
+        self.errors.append(error(CompilerPhase.PARSER, code, message, start, end))
+    
+    def node(self, kind: int, token: LexToken, value: Optional[str] = None,
+             children: Optional[List[int]] = None) -> int:
+        """Nodo del AST ubicado en el token que lo origina"""
+        arena = self.arena
+        node = arena.add(kind, value, token.line, token.start, token.end)
+        if children:
+            for child in children:
+                arena.append_child(node, child)
+        return node
+    
+    def typed(self, node: int, data_type: Optional[DataType]) -> int:
+        self.arena.data_type[node] = data_type
+        return node
+    
+    def identifier(self, token: LexToken) -> int:
+        """Identificador de una expresión, con el tipo de la variable visible"""
+        stack = self.visible.get(token.value)
+        return self.typed(self.node(IDENTIFIER, token, token.value), stack[-1] if stack else None)
+    
+    def declare(self, name: str, data_type: Optional[DataType]) -> bool:
+        """Hace visible la variable en el bloque actual; como en el semántico, una
+        segunda declaración en el mismo bloque no cuenta (devuelve False)"""
+        declared = self.scopes[-1]
+        if name in declared:
+            return False
+        declared.add(name)
+        self.visible.setdefault(name, []).append(data_type)
+        return True
+    
+    def undeclare(self, name: str):
+        """Deshace declare para una declaración que quedó rota"""
+        self.scopes[-1].discard(name)
+        self.visible[name].pop()
+    
+    def close_block(self):
+        """Desapila el bloque actual y sus variables"""
+        visible = self.visible
+        for name in self.scopes.pop():
+            visible[name].pop()
+        self.blocks.pop()
     
     def expect(self, token_type: str, value: str = None) -> bool:
         if not self.current_token:
-            self.errors.append(f"Se esperaba {token_type} pero no hay más tokens")
+            self.error("P003", f"Se esperaba {token_type} pero no hay más tokens")
             return False
         
         if self.current_token.type != token_type:
-            self.errors.append(f"Se esperaba {token_type} pero se encontró {self.current_token.type} en línea {self.current_token.line}")
+            self.error("P004", f"Se esperaba {token_type} pero se encontró {self.current_token.type} en línea {self.current_token.line}")
             return False
         
         if value and self.current_token.value != value:
-            self.errors.append(f"Se esperaba '{value}' pero se encontró '{self.current_token.value}' en línea {self.current_token.line}")
+            self.error("P005", f"Se esperaba '{value}' pero se encontró '{self.current_token.value}' en línea {self.current_token.line}")
             return False
         
         return True
@@ -60,22 +293,29 @@ class Parser:
             return True
         return False
     
-    def parse_program(self) -> ASTNode:
+    def parse_program(self) -> int:
         """Program → Function*"""
-        node = ASTNode(type="Program", children=[])
+        node = self.arena.add(PROGRAM)
         
-        while self.current_token:
-            if self.current_token.type == "KEYWORD" and self.current_token.value == "function":
-                function_node = self.parse_function()
-                if function_node:
-                    node.children.append(function_node)
+        while self.at_function() and self.token_index != self.stop:
+            mark = len(self.arena)
+            function_node = self.parse_function()
+            if function_node is not None:
+                self.arena.append_child(node, function_node)
             else:
-                break
+                # El error ya se reportó: se sigue en la próxima función
+                self.arena.truncate(mark)
+                self.advance_to_function()
         
         return node
     
-    def parse_function(self) -> Optional[ASTNode]:
+    def advance_to_function(self):
+        while self.current_token and not self.at_function():
+            self.advance()
+    
+    def parse_function(self) -> Optional[int]:
         """Function → 'function' IDENTIFIER '(' ')' Block"""
+        function_token = self.current_token
         if not self.consume("KEYWORD", "function"):
             return None
         
@@ -92,45 +332,91 @@ class Parser:
             return None
         
         block_node = self.parse_block()
-        if not block_node:
+        if block_node is None:
             return None
         
-        return ASTNode(
-            type="FunctionDeclaration",
-            value=function_name,
-            children=[block_node]
-        )
+        return self.node(FUNCTION_DECLARATION, function_token, function_name, [block_node])
     
-    def parse_block(self) -> Optional[ASTNode]:
-        """Block → '{' Statement* '}'"""
-        if not self.consume("DELIMITER", "{"):
+    def parse_block(self) -> Optional[int]:
+        """Block → '{' Statement* '}'
+        
+        Sin recursión: los bloques de if/while anidados son marcos de self.blocks.
+        Un if o while deja su bloque abierto y se completa al cerrarlo, así que la
+        profundidad solo la limita max_nesting."""
+        base = len(self.blocks)
+        if not self.open_block(None):
             return None
         
-        node = ASTNode(type="Block", children=[])
-        
-        while self.current_token and self.current_token.value != "}":
-            statement = self.parse_statement()
-            if statement:
-                node.children.append(statement)
+        while True:
+            block, owner, mark = self.blocks[-1]
+            token = self.current_token
+            if token is not None and token.value != "}" and not self.at_function():
+                depth = len(self.blocks)
+                reported = len(self.errors)
+                mark = self.statement_start = len(self.arena)
+                statement = self.parse_statement()
+                if len(self.blocks) > depth:
+                    continue  # Abrió un bloque: la sentencia termina al cerrarlo
             else:
-                if self.current_token:
-                    self.errors.append(f"Error al parsear statement cerca de '{self.current_token.value}' en línea {self.current_token.line}")
-                    self.advance() 
-                else:
-                    break 
-        
-        if not self.consume("DELIMITER", "}"):
-            return None
-        
-        return node
+                # Cierre del bloque; si falta el '}' lo reporta el consume
+                self.close_block()
+                closed = self.consume("DELIMITER", "}")
+                if len(self.blocks) == base:
+                    return block if closed else None
+                depth = len(self.blocks)
+                # El bloque del else es parte de la misma sentencia if
+                self.statement_start = mark
+                statement = self.close_statement(owner, block) if closed else None
+                if len(self.blocks) > depth:
+                    continue  # if ... else: se abrió el bloque del else
+                reported = -1  # El error ya se reportó al cerrar
+            
+            if statement is not None:
+                self.arena.append_child(self.blocks[-1][0], statement)
+                continue
+            self.arena.truncate(mark)
+            # Un solo error por sentencia rota: el primero que se haya reportado
+            if len(self.errors) == reported and self.current_token:
+                self.error("P006", f"Error al parsear statement cerca de '{self.current_token.value}' en línea {self.current_token.line}")
+            self.synchronize()
+    
+    def open_block(self, owner: Optional[int]) -> bool:
+        """Consume el '{' y apila el bloque nuevo (del if/while owner, que empezó en
+        statement_start)"""
+        token = self.current_token
+        if not self.expect("DELIMITER", "{"):
+            return False
+        if len(self.blocks) >= self.max_nesting:
+            self.nesting_error()
+            return False
+        self.advance()
+        self.blocks.append((self.node(BLOCK, token), owner, self.statement_start))
+        self.scopes.append(set())
+        return True
     
-    def parse_statement(self) -> Optional[ASTNode]:
+    def close_statement(self, owner: int, block: int) -> Optional[int]:
+        """Agrega el bloque cerrado a su if/while; un if puede seguir con 'else' {"""
+        arena = self.arena
+        arena.append_child(owner, block)
+        token = self.current_token
+        # Recién cerrado el bloque then: es el segundo hijo (el primero es la condición)
+        if (arena.kind[owner] == IF_STATEMENT and arena.next_sibling[arena.first_child[owner]] == block
+                and token is not None and token.value == "else" and token.type == "KEYWORD"):
+            self.advance()
+            if not self.open_block(owner):
+                return None
+        return owner
+    
+    def nesting_error(self):
+        self.error("P009", f"Anidamiento demasiado profundo (máximo {self.max_nesting} niveles) en línea {self.current_token.line}")
+    
+    def parse_statement(self) -> Optional[int]:
         """Statement → Declaration | Assignment | IfStatement | WhileStatement | ReturnStatement"""
         if not self.current_token:
             return None
         
         if self.current_token.type == "KEYWORD":
-            if self.current_token.value in ["int", "float", "bool", "string"]:
+            if self.current_token.value in TYPE_KEYWORDS:
                 return self.parse_declaration()
             elif self.current_token.value == "if":
                 return self.parse_if_statement()
@@ -143,7 +429,7 @@ class Parser:
         
         return self.parse_assignment_or_expression()
     
-    def parse_declaration(self) -> Optional[ASTNode]:
+    def parse_declaration(self) -> Optional[int]:
         """Declaration → Type IDENTIFIER ('=' Expression)? ';'"""
         type_token = self.current_token
         self.advance() 
@@ -151,127 +437,120 @@ class Parser:
         if not self.expect("IDENTIFIER"):
             return None
         
-        identifier = self.current_token.value
+        identifier_token = self.current_token
         self.advance() 
         
+        # Visible ya en el inicializador, como en el semántico
+        name = identifier_token.value
+        declared = self.declare(name, DECLARED_TYPES.get(type_token.value))
+        
         initializer = None
         if self.current_token and self.current_token.value == "=":
             self.advance() 
             initializer = self.parse_expression()
         
         if not self.consume("DELIMITER", ";"):
+            if declared:
+                self.undeclare(name)
             return None
         
-        children = [ASTNode(type="Identifier", value=identifier)]
-        if initializer:
+        children = [self.node(IDENTIFIER, identifier_token, identifier_token.value)]
+        if initializer is not None:
             children.append(initializer)
         
-        return ASTNode(
-            type="VariableDeclaration",
-            value=type_token.value,
-            children=children
-        )
-    
-    def parse_assignment_or_expression(self) -> Optional[ASTNode]:
-        """Assignment → IDENTIFIER '=' Expression ';'"""
-        if self.current_token and self.current_token.type == "IDENTIFIER":
-            identifier = self.current_token.value
-            save_index = self.token_index
-            
-            self.advance() 
-            
-            if self.current_token and self.current_token.value == "=":
-                self.advance() 
-                expression = self.parse_expression()
-                
-                if expression and self.current_token and self.current_token.value == ";":
-                    self.advance() 
-                    return ASTNode(
-                        type="Assignment",
-                        value="=",
-                        children=[
-                            ASTNode(type="Identifier", value=identifier),
-                            expression
-                        ]
-                    )
-            
-            self.token_index = save_index
-            self.current_token = self.tokens[save_index]
+        return self.node(VARIABLE_DECLARATION, type_token, type_token.value, children)
+    
+    def parse_assignment_or_expression(self) -> Optional[int]:
+        """Assignment → IDENTIFIER '=' Expression ';'
+        ExpressionStatement → Expression ';'
+        
+        Se decide mirando un token adelante, sin retroceder."""
+        start_token = self.current_token
+        following = self.peek()
+        if (start_token.type == "IDENTIFIER" and following is not None
+                and following.value == "=" and following.type == "OPERATOR"):
+            self.advance()
+            self.advance()
+            expression = self.parse_expression()
+            if expression is None or not self.end_of_statement():
+                return None
+            return self.node(ASSIGNMENT, start_token, "=", [self.identifier(start_token), expression])
         
         expression = self.parse_expression()
-        if expression and self.current_token and self.current_token.value == ";":
+        if expression is None or not self.end_of_statement():
+            return None
+        return self.node(EXPRESSION_STATEMENT, start_token, children=[expression])
+    
+    def end_of_statement(self) -> bool:
+        """Consume el ';' que cierra una sentencia de expresión"""
+        token = self.current_token
+        if token is not None and token.value == ";" and token.type == "DELIMITER":
             self.advance()
-            return ASTNode(type="ExpressionStatement", children=[expression])
-        
-        if expression:
-            self.errors.append(f"Se esperaba ';' después de la expresión en línea {self.current_token.line}")
-        
-        return None
+            return True
+        line = token.line if token is not None else "final"
+        self.error("P007", f"Se esperaba ';' después de la expresión en línea {line}")
+        return False
     
-    def parse_if_statement(self) -> Optional[ASTNode]:
+    def parse_if_statement(self) -> Optional[int]:
+        """IfStatement → 'if' '(' Expression ')' Block ('else' Block)?
+        Solo el encabezado: los bloques los maneja parse_block."""
+        if_token = self.current_token
         if not self.consume("KEYWORD", "if"):
             return None
         
-        if not self.consume("DELIMITER", "("):
-            return None
-        
-        condition = self.parse_expression()
-        if not condition:
+        condition = self.parse_condition()
+        if condition is None:
             return None
         
-        if not self.consume("DELIMITER", ")"):
+        node = self.node(IF_STATEMENT, if_token, children=[condition])
+        return node if self.open_block(node) else None
+    
+    def parse_while_statement(self) -> Optional[int]:
+        """WhileStatement → 'while' '(' Expression ')' Block
+        Solo el encabezado: el cuerpo lo maneja parse_block."""
+        while_token = self.current_token
+        if not self.consume("KEYWORD", "while"):
             return None
         
-        then_branch = self.parse_block()
-        if not then_branch:
+        condition = self.parse_condition()
+        if condition is None:
             return None
         
-        else_branch = None
-        if self.current_token and self.current_token.value == "else":
-            self.advance() 
-            else_branch = self.parse_block()
-        
-        children = [condition, then_branch]
-        if else_branch:
-            children.append(else_branch)
-        
-        return ASTNode(type="IfStatement", children=children)
+        node = self.node(WHILE_STATEMENT, while_token, children=[condition])
+        return node if self.open_block(node) else None
     
-    def parse_while_statement(self) -> Optional[ASTNode]:
-        if not self.consume("KEYWORD", "while"):
-            return None
-        
+    def parse_condition(self) -> Optional[int]:
+        """'(' Expression ')'"""
         if not self.consume("DELIMITER", "("):
             return None
         
         condition = self.parse_expression()
-        if not condition:
+        if condition is None:
             return None
         
         if not self.consume("DELIMITER", ")"):
             return None
-        
-        body = self.parse_block()
-        if not body:
-            return None
-        
-        return ASTNode(type="WhileStatement", children=[condition, body])
+        return condition
     
-    def parse_return_statement(self) -> Optional[ASTNode]:
+    def parse_return_statement(self) -> Optional[int]:
+        return_token = self.current_token
         if not self.consume("KEYWORD", "return"):
             return None
         
         expression = None
         if self.current_token and self.current_token.value != ";":
             expression = self.parse_expression()
+            if expression is None:
+                return None
         
         if not self.consume("DELIMITER", ";"):
             return None
         
-        children = [expression] if expression else []
-        return ASTNode(type="ReturnStatement", children=children)
+        children = [expression] if expression is not None else []
+        return self.node(RETURN_STATEMENT, return_token, children=children)
     
-    def parse_print_statement(self) -> Optional[ASTNode]:
+    def parse_print_statement(self) -> Optional[int]:
+        print_token = self.current_token
         if not self.consume("KEYWORD", "print"):
             return None
         
@@ -279,7 +558,7 @@ class Parser:
             return None
         
         expression = self.parse_expression()
-        if not expression:
+        if expression is None:
             return None
         
         if not self.consume("DELIMITER", ")"):
@@ -288,107 +567,119 @@ class Parser:
         if not self.consume("DELIMITER", ";"):
             return None
         
-        return ASTNode(type="PrintStatement", children=[expression])
+        return self.node(PRINT_STATEMENT, print_token, children=[expression])
     
-    def parse_expression(self) -> Optional[ASTNode]:
-        return self.parse_relational_expression()
+    def parse_expression(self) -> Optional[int]:
+        """Expresión por precedencia, sin recursión: los operandos y los operadores
+        pendientes (con los paréntesis abiertos) van en dos pilas. Los binarios asocian
+        a la izquierda y los unarios ligan más fuerte que cualquier binario.
+        Si la expresión está rota se descartan los nodos que llegó a armar."""
+        mark = len(self.arena)
+        expression = self.parse_operands()
+        if expression is None:
+            self.arena.truncate(mark)
+        return expression
     
-    def parse_relational_expression(self) -> Optional[ASTNode]:
-        left = self.parse_additive_expression()
-        if not left:
-            return None
-        
-        while self.current_token and self.current_token.value in [">", "<", "==", "!=", ">=", "<="]:
-            operator = self.current_token.value
-            self.advance() 
-            right = self.parse_additive_expression()
-            if not right:
-                return None
+    def parse_operands(self) -> Optional[int]:
+        """Cuerpo de parse_expression (None si la expresión está rota)"""
+        operands: List[int] = []
+        # (token, precedencia); los paréntesis abiertos tienen precedencia 0
+        pending: List[Tuple[LexToken, int]] = []
+        unary = 0
+        open_parens = 0
+        
+        while True:
+            # Prefijos del operando: unarios y paréntesis
+            token = self.current_token
+            while token is not None:
+                if token.value in UNARY_OPERATORS and token.type == "OPERATOR":
+                    if unary >= self.max_unary:
+                        self.error("P009", f"Demasiados operadores unarios anidados (máximo {self.max_unary}) en línea {token.line}")
+                        return None
+                    precedence = UNARY_PRECEDENCE
+                    unary += 1
+                elif token.value == "(" and token.type == "DELIMITER":
+                    precedence = 0
+                    open_parens += 1
+                else:
+                    break
+                pending.append((token, precedence))
+                self.advance()
+                token = self.current_token
             
-            left = ASTNode(
-                type="BinaryExpression",
-                value=operator,
-                children=[left, right]
-            )
-        
-        return left
-
-    def parse_additive_expression(self) -> Optional[ASTNode]:
-        left = self.parse_multiplicative_expression()
-        if not left:
-            return None
-        
-        while self.current_token and self.current_token.value in ["+", "-"]:
-            operator = self.current_token.value
-            self.advance() 
-            right = self.parse_multiplicative_expression()
-            if not right:
+            primary = self.parse_primary_expression()
+            if primary is None:
                 return None
+            operands.append(primary)
             
-            left = ASTNode(
-                type="BinaryExpression",
-                value=operator,
-                children=[left, right]
-            )
-        
-        return left
+            # Después del operando: un binario, un ')' o el final de la expresión
+            while True:
+                token = self.current_token
+                precedence = BINARY_PRECEDENCE.get(token.value, 0) if token is not None and token.type == "OPERATOR" else 0
+                unary -= self.reduce(operands, pending, precedence or 1)
+                if precedence:
+                    pending.append((token, precedence))
+                    self.advance()
+                    break
+                if not open_parens:
+                    return operands[-1]
+                if not self.consume("DELIMITER", ")"):
+                    return None
+                pending.pop()
+                open_parens -= 1
     
-    def parse_multiplicative_expression(self) -> Optional[ASTNode]:
-        left = self.parse_primary_expression()
-        if not left:
-            return None
-        
-        while self.current_token and self.current_token.value in ["*", "/"]:
-            operator = self.current_token.value
-            self.advance() 
-            right = self.parse_primary_expression()
-            if not right:
-                return None
-            
-            left = ASTNode(
-                type="BinaryExpression",
-                value=operator,
-                children=[left, right]
-            )
-        
-        return left
+    def reduce(self, operands: List[int], pending: List[Tuple[LexToken, int]],
+               min_precedence: int) -> int:
+        """Arma los nodos de los operadores pendientes que ligan al menos con
+        min_precedence. Devuelve cuántos unarios se cerraron."""
+        unary = 0
+        while pending and pending[-1][1] >= min_precedence:
+            token, precedence = pending.pop()
+            types = self.arena.data_type
+            if precedence == UNARY_PRECEDENCE:
+                operand = operands[-1]
+                operands[-1] = self.typed(self.node(UNARY_EXPRESSION, token, token.value, [operand]),
+                                          unary_type(token.value, types[operand]))
+                unary += 1
+            else:
+                right = operands.pop()
+                left = operands[-1]
+                operands[-1] = self.typed(self.node(BINARY_EXPRESSION, token, token.value, [left, right]),
+                                          binary_type(token.value, types[left], types[right]))
+        return unary
     
-    def parse_primary_expression(self) -> Optional[ASTNode]:
+    def parse_primary_expression(self) -> Optional[int]:
         if not self.current_token:
             return None
         
         if self.current_token.type == "IDENTIFIER":
-            node = ASTNode(type="Identifier", value=self.current_token.value)
+            node = self.identifier(self.current_token)
             self.advance()
             return node
         
-        elif self.current_token.type in ["INTEGER", "FLOAT"]:
-            node = ASTNode(type="Literal", value=self.current_token.value)
+        elif self.current_token.type in LITERAL_TYPES:
+            # El lexer marca como FLOAT los números con punto
+            value = self.current_token.value
+            node = self.typed(self.node(LITERAL, self.current_token, value),
+                              DataType.FLOAT if "." in (value or "") else DataType.INT)
             self.advance()
             return node
         
         elif self.current_token.type == "STRING":
-            node = ASTNode(type="StringLiteral", value=self.current_token.value)
+            node = self.typed(self.node(STRING_LITERAL, self.current_token, self.current_token.value),
+                              DataType.STRING)
             self.advance()
             return node
         
         # --- CORRECCIÓN AQUÍ ---
         # Ahora detectamos 'true' y 'false' como KEYWORDs válidas para expresiones booleanas
         elif (self.current_token.type == "KEYWORD" and 
-              self.current_token.value in ["true", "false"]):
-            node = ASTNode(type="BooleanLiteral", value=self.current_token.value)
+              self.current_token.value in BOOLEAN_KEYWORDS):
+            node = self.typed(self.node(BOOLEAN_LITERAL, self.current_token, self.current_token.value),
+                              DataType.BOOL)
             self.advance()
             return node
         
-        elif self.current_token.value == "(":
-            self.advance() 
-            expression = self.parse_expression()
-            if not expression:
-                return None
-            if not self.consume("DELIMITER", ")"):
-                return None
-            return expression
-        
         else:
-            self.errors.append(f"Expresión primaria esperada pero se encontró {self.current_token.type} '{self.current_token.value}' en línea {self.current_token.line}")
+            self.error("P008", f"Expresión primaria esperada pero se encontró {self.current_token.type} '{self.current_token.value}' en línea {self.current_token.line}")
             return None
\ No newline at end of file
@@ -0,0 +1,358 @@
+from app.models.schemas import (
+    CompileRequest, CompileResponse, SymbolTable, CompilerPhase, Artifact, PhaseChunk, Token,
+    DiagnosticInfo, ASTNode, Quadruple
+)
+from app.compiler.lexer import Lexer, to_schema_tokens
+from app.compiler.parser import Parser
+from app.compiler.semantic import SemanticAnalyzer
+from app.compiler.symbols import Scope
+from app.compiler.intermediate import IntermediateCodeGenerator
+from app.compiler.generator import CodeGenerator
+from app.compiler.optimizer import CodeOptimizer
+from app.compiler.quadruples import QuadrupleStore
+from app.compiler.trace import request_tracer
+from app.compiler.diagnostics import Diagnostic, SourceIndex, error, warning, messages
+from app.compiler.arena import AstArena
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import time
+
+PHASE_ORDER = [
+    CompilerPhase.LEXER, CompilerPhase.PARSER, CompilerPhase.SEMANTIC,
+    CompilerPhase.INTERMEDIATE, CompilerPhase.OPTIMIZER, CompilerPhase.CODEGEN
+]
+
+# Fase que produce cada artefacto
+ARTIFACT_PHASE = {
+    Artifact.TOKENS: CompilerPhase.LEXER,
+    Artifact.AST: CompilerPhase.PARSER,
+    Artifact.SYMBOL_TABLE: CompilerPhase.SEMANTIC,
+    Artifact.INTERMEDIATE_CODE: CompilerPhase.INTERMEDIATE,
+    Artifact.OPTIMIZED_CODE: CompilerPhase.OPTIMIZER,
+    Artifact.OPTIMIZATION_LOG: CompilerPhase.OPTIMIZER,
+    Artifact.OBJECT_CODE: CompilerPhase.CODEGEN,
+}
+
+# Categoría con la que se reportan los errores de cada fase
+PHASE_ERROR_TYPE = {
+    CompilerPhase.LEXER: "Léxico",
+    CompilerPhase.PARSER: "Sintáctico",
+    CompilerPhase.SEMANTIC: "Semántico",
+    CompilerPhase.INTERMEDIATE: "Generación",
+    CompilerPhase.OPTIMIZER: "Generación",
+    CompilerPhase.CODEGEN: "Generación",
+}
+
+def plan_compilation(request: CompileRequest) -> Tuple[int, Set[Artifact]]:
+    """Calcula hasta qué fase (índice en PHASE_ORDER) hay que llegar y qué artefactos devolver"""
+    artifacts = set(Artifact) if request.artifacts is None else set(request.artifacts)
+
+    if request.stop_after is not None:
+        last_phase = PHASE_ORDER.index(request.stop_after)
+    elif request.artifacts is not None:
+        # Solo hasta la fase más profunda que produce algún artefacto pedido
+        last_phase = max((PHASE_ORDER.index(ARTIFACT_PHASE[a]) for a in artifacts), default=0)
+    else:
+        last_phase = len(PHASE_ORDER) - 1
+
+    return last_phase, artifacts
+
+class CompilationRun:
+    """Estado de una compilación. phases() ejecuta las fases una a una y entrega
+    el resultado de cada una en cuanto termina; response() arma la respuesta final."""
+
+    def __init__(self, request: CompileRequest):
+        self.request = request
+        self.last_phase, self.artifacts = plan_compilation(request)
+        self.tracer = request_tracer(request.debug)
+
+        # Tiempo (ms) de cada fase; los pases del optimizador van como "optimizer.<pase>"
+        self.phase_timings: Dict[str, float] = {}
+        self.metrics = {
+            "compilation_time": 0, "tokens_count": 0, "ast_nodes_count": 0,
+            "symbols_count": 0, "quadruples_count": 0, "temporals_count": 0,
+            "errors_count": 0, "warnings_count": 0, "optimization_reduction": 0,
+            "phase_timings": self.phase_timings
+        }
+
+        # Errores por fase y advertencias acumuladas, como diagnósticos con posición
+        self.errors: Dict[CompilerPhase, List[Diagnostic]] = {phase: [] for phase in PHASE_ORDER}
+        self.warnings: List[Diagnostic] = []
+        self.index: Optional[SourceIndex] = None
+
+        self.tokens = []
+        # Scopes del semántico; el árbol de SymbolTable se arma solo si se pide (symbol_table_model)
+        self.symbols: Optional[Scope] = None
+        self.symbol_table: Optional[SymbolTable] = None
+        # AST plano de las fases; el árbol de ASTNode se arma solo si se pide (ast_model)
+        self.ast: Optional[AstArena] = None
+        self.ast_tree: Optional[ASTNode] = None
+        # Si no se piden los tokens, el lexer alimenta al parser bajo demanda y la
+        # lista completa de tokens nunca se arma (ver run_parser)
+        self.stream_tokens = Artifact.TOKENS not in self.artifacts and self.runs(CompilerPhase.PARSER)
+        # Tokens ya convertidos a modelos de la API (solo si se piden)
+        self.schema_tokens: Optional[List[Token]] = None
+        # Código intermedio y optimizado; los modelos Quadruple se arman solo si se piden
+        self.intermediate_code: Optional[QuadrupleStore] = None
+        self.optimized_code: Optional[QuadrupleStore] = None
+        self.quadruple_lists: Dict[Artifact, List[Quadruple]] = {}
+        self.optimization_log = []
+        self.object_code = ""
+        self.start_time = time.time()
+
+    def runs(self, phase: CompilerPhase) -> bool:
+        return PHASE_ORDER.index(phase) <= self.last_phase
+
+    def phases(self) -> Iterator[PhaseChunk]:
+        """Ejecuta cada fase pedida y produce un PhaseChunk al terminarla"""
+        self.start_time = time.time()
+        if self.tracer.info: self.tracer.emit("=== COMPILACIÓN FORZADA (Optimiza incluso con errores) ===")
+
+        for phase, run_phase in (
+            (CompilerPhase.LEXER, self.run_lexer),
+            (CompilerPhase.PARSER, self.run_parser),
+            (CompilerPhase.SEMANTIC, self.run_semantic),
+            (CompilerPhase.INTERMEDIATE, self.run_intermediate),
+            (CompilerPhase.OPTIMIZER, self.run_optimizer),
+            (CompilerPhase.CODEGEN, self.run_codegen),
+        ):
+            if not self.runs(phase):
+                break
+
+            warnings_before = len(self.warnings)
+            phase_start = time.perf_counter()
+            if not run_phase():
+                continue  # Faltaba la entrada de la fase (p. ej. no hubo AST)
+            self.phase_timings[phase.value] = (time.perf_counter() - phase_start) * 1000
+
+            yield self.phase_chunk(phase, self.warnings[warnings_before:])
+
+    # --- FASES (cada una devuelve False si no tenía con qué ejecutarse) ---
+
+    def run_lexer(self) -> bool:
+        # 1. LÉXICO
+        if self.stream_tokens:
+            return False  # Corre dentro de run_parser
+        try:
+            self.tokens, self.errors[CompilerPhase.LEXER] = Lexer().tokenize(self.request.code)
+            self.metrics["tokens_count"] = len(self.tokens)
+        except Exception as e: self.errors[CompilerPhase.LEXER].append(error(CompilerPhase.LEXER, "L900", str(e)))
+        return True
+
+    def run_parser(self) -> bool:
+        # 2. SINTÁCTICO (Si hay tokens)
+        if self.stream_tokens:
+            return self.run_streaming_parser()
+        if not self.tokens:
+            return False
+        try:
+            self.ast, self.errors[CompilerPhase.PARSER] = Parser().parse(self.tokens)
+            # Truco: Si hay AST parcial, úsalo. Si es None, no podemos seguir.
+            self.metrics["ast_nodes_count"] = len(self.ast)
+        except Exception as e: self.errors[CompilerPhase.PARSER].append(error(CompilerPhase.PARSER, "P900", str(e)))
+        return True
+
+    def run_streaming_parser(self) -> bool:
+        """Léxico y sintáctico en un solo paso: el parser pide los tokens a
+        Lexer.tokenize_iter y solo guarda una ventana. El tiempo del lexer queda
+        dentro del de esta fase."""
+        lexer_errors = self.errors[CompilerPhase.LEXER]
+        tokens = Lexer().tokenize_iter(self.request.code, lexer_errors)
+        parser = Parser()
+        try:
+            self.ast, self.errors[CompilerPhase.PARSER] = parser.parse(tokens)
+            self.metrics["ast_nodes_count"] = len(self.ast)
+        except Exception as e: self.errors[CompilerPhase.PARSER].append(error(CompilerPhase.PARSER, "P900", str(e)))
+
+        # El parser pudo detenerse antes del final: el resto se tokeniza igual para
+        # reportar todos los errores léxicos y contar los tokens
+        pulled = parser.buffer.pulled() if parser.buffer else 0
+        self.metrics["tokens_count"] = pulled + sum(1 for _ in tokens)
+        if not pulled:
+            # Sin tokens no hubo análisis sintáctico (igual que sin streaming)
+            self.ast, self.errors[CompilerPhase.PARSER] = None, []
+            self.metrics["ast_nodes_count"] = 0
+        return True
+
+    def run_semantic(self) -> bool:
+        # 3. SEMÁNTICO (Solo para tabla de símbolos y errores, no detiene flujo)
+        if self.ast is None:
+            return False
+        try:
+            analyzer = SemanticAnalyzer(self.tracer)
+            analyzer.check(self.ast)
+            self.errors[CompilerPhase.SEMANTIC] = analyzer.errors
+            self.warnings.extend(analyzer.warnings)
+            self.symbols = analyzer.scopes.root
+            self.metrics["symbols_count"] = len(self.symbols.symbols)
+        except Exception as e:
+            self.errors[CompilerPhase.SEMANTIC].append(
+                error(CompilerPhase.SEMANTIC, "S900", f"Fallo análisis semántico: {e}"))
+            self.symbols = Scope() # Tabla vacía para no romper el siguiente paso
+        return True
+
+    def run_intermediate(self) -> bool:
+        # 4. INTERMEDIO (CRÍTICO: Generar pase lo que pase)
+        if self.ast is None:
+            return False
+        try:
+            # El generador no consulta la tabla de símbolos
+            gen = IntermediateCodeGenerator(SymbolTable(), self.tracer)
+
+            # generate() ahora atrapa sus propios errores internos y devuelve lo que pudo
+            self.intermediate_code = gen.generate(self.ast)
+            self.metrics["quadruples_count"] = len(self.intermediate_code)
+            self.metrics["temporals_count"] = gen.temporal_counter
+        except Exception as e:
+            self.errors[CompilerPhase.INTERMEDIATE].append(
+                error(CompilerPhase.INTERMEDIATE, "G900", f"Fallo generación intermedia: {e}"))
+        return True
+
+    def run_optimizer(self) -> bool:
+        # 5. OPTIMIZACIÓN (Si hay ALGO de código intermedio, optimizarlo)
+        if not self.intermediate_code:
+            return False
+        opt = CodeOptimizer(self.tracer)
+        try:
+            self.optimized_code, self.optimization_log = opt.optimize(self.intermediate_code)
+
+            # Calcular métricas
+            orig = len(self.intermediate_code)
+            new_l = len(self.optimized_code)
+            if orig > 0:
+                self.metrics["optimization_reduction"] = ((orig - new_l) / orig) * 100
+        except Exception as e:
+            self.warnings.append(warning(CompilerPhase.OPTIMIZER, "G901", f"Error optimizando: {e}"))
+            self.optimized_code = self.intermediate_code # Fallback al original
+        for pass_name, elapsed in opt.pass_timings.items():
+            self.phase_timings[f"optimizer.{pass_name}"] = elapsed
+        return True
+
+    def run_codegen(self) -> bool:
+        # 6. CÓDIGO OBJETO
+        quads_final = self.optimized_code if self.optimized_code else self.intermediate_code
+        if not quads_final:
+            return False
+        try:
+            st_to_use = self.symbols or Scope()
+            self.object_code = CodeGenerator(st_to_use, self.tracer).generate(quads_final)
+        except Exception as e:
+            self.errors[CompilerPhase.CODEGEN].append(
+                error(CompilerPhase.CODEGEN, "G902", f"Error código objeto: {e}"))
+        return True
+
+    # --- RESULTADOS ---
+
+    def source_code(self) -> str:
+        return self.request.code
+
+    def source_index(self) -> SourceIndex:
+        """Tabla de líneas del código; se arma solo si algún diagnóstico la necesita"""
+        if self.index is None:
+            self.index = SourceIndex(self.source_code())
+        return self.index
+
+    def phase_errors(self, phases: List[CompilerPhase]) -> List[Diagnostic]:
+        return [d for phase in phases for d in self.errors[phase]]
+
+    def serialized_errors(self, errors: List[Diagnostic]) -> List[str]:
+        """Errores en formato tipo|línea|mensaje (línea 0 si no tienen posición)"""
+        if not errors:
+            return []
+        index = self.source_index()
+        return [f"{PHASE_ERROR_TYPE[d.phase]}|{index.line(d.start)}|{d.message}" for d in errors]
+
+    def diagnostic_infos(self, diagnostics: List[Diagnostic]) -> List[DiagnosticInfo]:
+        if not diagnostics:
+            return []
+        index = self.source_index()
+        return [index.info(d) for d in diagnostics]
+
+    def token_models(self) -> List[Token]:
+        """Tokens como modelos de la API; se convierten una sola vez"""
+        if self.schema_tokens is None:
+            self.schema_tokens = to_schema_tokens(self.tokens)
+        return self.schema_tokens
+
+    def ast_model(self) -> Optional[ASTNode]:
+        """AST como árbol de modelos de la API; se convierte una sola vez"""
+        if self.ast_tree is None and self.ast is not None:
+            self.ast_tree = self.ast.to_ast()
+        return self.ast_tree
+
+    def symbol_table_model(self) -> Optional[SymbolTable]:
+        """Tabla de símbolos como árbol de modelos de la API; se convierte una sola vez"""
+        if self.symbol_table is None and self.symbols is not None:
+            self.symbol_table = self.symbols.to_model()
+        return self.symbol_table
+
+    def quadruple_models(self, artifact: Artifact) -> List[Quadruple]:
+        """Código intermedio u optimizado como modelos de la API; se convierte una sola vez"""
+        models = self.quadruple_lists.get(artifact)
+        if models is None:
+            code = getattr(self, artifact.value)
+            models = self.quadruple_lists[artifact] = code.to_quadruples() if code is not None else []
+        return models
+
+    def artifact_value(self, artifact: Artifact) -> Any:
+        # Cada artefacto se guarda en el atributo del mismo nombre
+        if artifact in (Artifact.INTERMEDIATE_CODE, Artifact.OPTIMIZED_CODE):
+            return self.quadruple_models(artifact)
+        if artifact is Artifact.TOKENS:
+            return self.token_models()
+        if artifact is Artifact.AST:
+            return self.ast_model()
+        if artifact is Artifact.SYMBOL_TABLE:
+            return self.symbol_table_model()
+        return getattr(self, artifact.value)
+
+    def phase_chunk(self, phase: CompilerPhase, warnings: List[Diagnostic]) -> PhaseChunk:
+        """Resultado parcial de una fase con solo los artefactos pedidos que produce"""
+        produced = [artifact for artifact, producer in ARTIFACT_PHASE.items()
+                    if producer is phase and artifact in self.artifacts]
+        error_phases = [phase]
+        if phase is CompilerPhase.PARSER and self.stream_tokens:
+            error_phases.insert(0, CompilerPhase.LEXER)  # El lexer corrió dentro del parser
+        errors = self.phase_errors(error_phases)
+        return PhaseChunk(
+            phase=phase.value,
+            time=self.phase_timings.get(phase.value, 0),
+            errors=self.serialized_errors(errors),
+            warnings=messages(warnings),
+            diagnostics=self.diagnostic_infos(errors + warnings),
+            **{artifact.value: self.artifact_value(artifact) for artifact in produced}
+        )
+
+    def response(self) -> CompileResponse:
+        errors = self.phase_errors(PHASE_ORDER)
+        serialized_errors = self.serialized_errors(errors)
+
+        self.metrics["errors_count"] = len(serialized_errors)
+        self.metrics["warnings_count"] = len(self.warnings)
+        self.metrics["compilation_time"] = (time.time() - self.start_time) * 1000
+
+        # Solo se serializan los artefactos pedidos
+        artifacts = self.artifacts
+        return CompileResponse(
+            success=len(serialized_errors) == 0,
+            tokens=self.token_models() if Artifact.TOKENS in artifacts else None,
+            ast=self.ast_model() if Artifact.AST in artifacts else None,
+            symbol_table=self.symbol_table_model() if Artifact.SYMBOL_TABLE in artifacts else None,
+            intermediate_code=(self.quadruple_models(Artifact.INTERMEDIATE_CODE)
+                               if Artifact.INTERMEDIATE_CODE in artifacts else None),
+            optimized_code=(self.quadruple_models(Artifact.OPTIMIZED_CODE)
+                            if Artifact.OPTIMIZED_CODE in artifacts else None),
+            optimization_log=self.optimization_log if Artifact.OPTIMIZATION_LOG in artifacts else [],
+            object_code=self.object_code if Artifact.OBJECT_CODE in artifacts else None,
+            errors=serialized_errors,
+            warnings=messages(self.warnings),
+            diagnostics=self.diagnostic_infos(errors + self.warnings),
+            metrics=self.metrics,
+            trace=self.tracer.lines() if self.request.debug else None
+        )
+
+def compile_program(request: CompileRequest) -> CompileResponse:
+    """Ejecuta las seis fases del compilador sobre el código de la petición"""
+    run = CompilationRun(request)
+    for _ in run.phases():
+        pass
+    return run.response()
@@ -0,0 +1,124 @@
+from app.models.schemas import Quadruple, QuadrupleType, DataType
+from typing import Dict, List, Optional
+
+# Ausencia de operando (arg2 de una asignación, arg1 de una etiqueta...)
+NONE = -1
+
+# Clase de cada string de la tabla: el índice en KIND_NAMES es el valor que se guarda.
+# La asigna quien crea el string (IntermediateCodeGenerator), así los pases no
+# tienen que adivinarla por el texto: una variable t1 o total no es un temporal.
+KIND_NAMES = ("operator", "constant", "temporary", "variable", "label")
+OPERATOR, CONSTANT, TEMPORARY, VARIABLE, LABEL = range(len(KIND_NAMES))
+
+# Clases que se numeran con contadores del generador (ver offset_renames)
+RENAMED_KINDS = frozenset({TEMPORARY, LABEL})
+
+class QuadrupleStore:
+    """Código intermedio plano para las fases internas: cada cuádruplo es una
+    posición en arreglos paralelos (operador, arg1, arg2, resultado, tipo de
+    cuádruplo y tipo de dato) y operadores y operandos son índices en una tabla de
+    strings internados, cada uno con su clase (kind). El índice de un cuádruplo es
+    su posición. No hay un objeto por cuádruplo; los modelos Quadruple se arman
+    solo para la respuesta (to_quadruples).
+
+    Un string se interna por texto y clase: el temporal t0 y una variable t0 son
+    operandos distintos. La tabla solo crece, así que copy y select la comparten:
+    un mismo operando tiene el mismo índice en todas las copias y dos operandos
+    son iguales si y solo si sus índices lo son.
+    """
+
+    def __init__(self):
+        self.operator: List[int] = []
+        self.arg1: List[int] = []
+        self.arg2: List[int] = []
+        self.result: List[int] = []
+        self.quadruple_type: List[QuadrupleType] = []
+        self.data_type: List[Optional[DataType]] = []
+        self.strings: List[str] = []
+        # Clase de cada string de la tabla
+        self.kind: List[int] = []
+        # Un diccionario texto -> índice por clase
+        self.string_ids: List[Dict[str, int]] = [{} for _ in KIND_NAMES]
+
+    def __len__(self) -> int:
+        return len(self.operator)
+
+    def intern(self, text: Optional[str], kind: int) -> int:
+        if text is None:
+            return NONE
+        ids = self.string_ids[kind]
+        string_id = ids.get(text)
+        if string_id is None:
+            string_id = ids[text] = len(self.strings)
+            self.strings.append(text)
+            self.kind.append(kind)
+        return string_id
+
+    def text(self, string_id: int) -> Optional[str]:
+        return self.strings[string_id] if string_id != NONE else None
+
+    def add(self, quadruple_type: QuadrupleType, operator: int, arg1: int = NONE,
+            arg2: int = NONE, result: int = NONE, data_type: Optional[DataType] = None):
+        """Agrega un cuádruplo; operador y operandos ya internados"""
+        self.operator.append(operator)
+        self.arg1.append(arg1)
+        self.arg2.append(arg2)
+        self.result.append(result)
+        self.quadruple_type.append(quadruple_type)
+        self.data_type.append(data_type)
+
+    # --- COPIAS ---
+
+    def empty(self) -> "QuadrupleStore":
+        """Store vacío con la misma tabla de strings"""
+        store = QuadrupleStore()
+        store.strings, store.kind, store.string_ids = self.strings, self.kind, self.string_ids
+        return store
+
+    def copy(self) -> "QuadrupleStore":
+        store = self.empty()
+        store.operator, store.arg1, store.arg2 = self.operator[:], self.arg1[:], self.arg2[:]
+        store.result, store.quadruple_type, store.data_type = self.result[:], self.quadruple_type[:], self.data_type[:]
+        return store
+
+    def select(self, positions: List[int]) -> "QuadrupleStore":
+        """Store con solo los cuádruplos de esas posiciones, en ese orden"""
+        store = self.empty()
+        for name in ("operator", "arg1", "arg2", "result", "quadruple_type", "data_type"):
+            column = getattr(self, name)
+            setattr(store, name, [column[i] for i in positions])
+        return store
+
+    def columns(self) -> tuple:
+        """Todos los arreglos, para comparar dos stores con la misma tabla"""
+        return (self.operator, self.arg1, self.arg2, self.result, self.quadruple_type, self.data_type)
+
+    def extend(self, other: "QuadrupleStore", renames: Optional[Dict[str, str]] = None):
+        """Agrega los cuádruplos de other al final, renombrando con renames sus
+        temporales y etiquetas (cada string distinto se traduce una sola vez)"""
+        intern = self.intern
+        if renames:
+            ids = [intern(renames.get(text, text) if kind in RENAMED_KINDS else text, kind)
+                   for text, kind in zip(other.strings, other.kind)]
+        else:
+            ids = [intern(text, kind) for text, kind in zip(other.strings, other.kind)]
+        ids.append(NONE)  # ids[NONE] (el último) sigue siendo NONE
+        self.operator.extend([ids[i] for i in other.operator])
+        self.arg1.extend([ids[i] for i in other.arg1])
+        self.arg2.extend([ids[i] for i in other.arg2])
+        self.result.extend([ids[i] for i in other.result])
+        self.quadruple_type.extend(other.quadruple_type)
+        self.data_type.extend(other.data_type)
+
+    # --- CONVERSIONES ---
+
+    def to_quadruples(self, base: int = 0) -> List[Quadruple]:
+        """Cuádruplos como modelos de la API, con índices desde base"""
+        strings = self.strings + [None]  # El índice NONE (-1) cae en el None agregado
+        construct = Quadruple.model_construct
+        return [
+            construct(index=base + n, operator=strings[operator], arg1=strings[arg1], arg2=strings[arg2],
+                      result=strings[result], quadruple_type=quadruple_type, line=None, data_type=data_type)
+            for n, (operator, arg1, arg2, result, quadruple_type, data_type) in enumerate(zip(
+                self.operator, self.arg1, self.arg2, self.result, self.quadruple_type, self.data_type))
+        ]
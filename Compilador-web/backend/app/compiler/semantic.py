@@ -1,258 +1,405 @@
-from app.models.schemas import ASTNode, SymbolTable, Symbol, SemanticResult, SymbolType, DataType
-from typing import List, Optional, Dict
+from app.models.schemas import SemanticResult, SymbolType, DataType, CompilerPhase
+from app.compiler.trace import Tracer, default_tracer
+from app.compiler.diagnostics import Diagnostic, error, warning, messages
+from app.compiler.walker import AstVisitor
+from app.compiler.arena import AstArena, NONE, ROOT
+from app.compiler.symbols import Scope, Scopes, SymbolEntry
+from typing import FrozenSet, List, NamedTuple, Optional, Set, Tuple
 
-class SemanticAnalyzer:
-    def __init__(self):
-        self.current_scope = "global"
-        self.symbol_table = SymbolTable(scope_name="global", level=0)
-        self.errors = []
-        self.warnings = []
-        self.scope_stack = [self.symbol_table]
+class FunctionAnalysis(NamedTuple):
+    """Análisis de una función hecho aparte (en otro proceso) con contadores
+    propios, para incorporarlo después con SemanticAnalyzer.merge"""
+    name: str
+    symbol: SymbolEntry
+    table: Scope
+    # Direcciones de memoria usadas, numeradas desde 0
+    memory: int
+    errors: List[Diagnostic]
+    warnings: List[Diagnostic]
+    # Advertencias de las verificaciones finales (S102 y S103), que van al final
+    unused: List[Diagnostic]
+    uninitialized: List[Diagnostic]
+    # Nombres que no se encontraron en ningún scope
+    unresolved: FrozenSet[str]
+
+def relocate(symbol: SymbolEntry, table: Scope, base: int):
+    """Suma base a la dirección de memoria del símbolo y de todos los de table"""
+    symbol.memory_address += base
+    for scope in table.walk():
+        for entry in scope.symbols.values():
+            entry.memory_address += base
+
+class SemanticAnalyzer(AstVisitor):
+    def __init__(self, tracer: Optional[Tracer] = None):
+        self.tracer = tracer or default_tracer
+        # Scopes con búsqueda en O(1); la tabla de la API se arma solo en result()
+        self.scopes = Scopes()
+        self.errors: List[Diagnostic] = []
+        self.warnings: List[Diagnostic] = []
         self.memory_counter = 0
+        # Nombres usados sin declarar (ver merge)
+        self.unresolved: Set[str] = set()
+        self.arena: Optional[AstArena] = None
     
-    def analyze(self, ast: ASTNode) -> SemanticResult:
+    @property
+    def current_scope(self) -> str:
+        return self.scopes.current.scope_name
+    
+    def analyze(self, ast: Optional[AstArena]) -> SemanticResult:
         """Analiza el AST semánticamente"""
-        if not ast:
+        if ast is None:
+            self.errors.append(error(CompilerPhase.SEMANTIC, "S000", "No hay AST para analizar"))
             return SemanticResult(
-                symbol_table=self.symbol_table,
-                errors=["No hay AST para analizar"]
+                symbol_table=self.scopes.root.to_model(),
+                errors=messages(self.errors)
             )
         
-        print("=== INICIANDO ANÁLISIS SEMÁNTICO ===")
-        self.visit_node(ast)
-        self.check_unused_variables()
-        self.check_initialized_variables()
-        
-        print(f"=== ANÁLISIS COMPLETADO ===")
-        print(f"Errores: {len(self.errors)}")
-        print(f"Advertencias: {len(self.warnings)}")
-        print(f"Símbolos en tabla global: {len(self.symbol_table.symbols)}")
-        
+        self.check(ast)
+        return self.result()
+    
+    def check(self, ast: AstArena):
+        """Como analyze, pero deja errores, advertencias y scopes en el analizador
+        sin armar la tabla de símbolos de la API"""
+        if self.tracer.info: self.tracer.emit("=== INICIANDO ANÁLISIS SEMÁNTICO ===")
+        self.arena = ast
+        self.visit_node(ROOT)
+        self.finish()
+    
+    def finish(self):
+        """Verificaciones finales, una vez visitado el programa entero"""
+        self.check_variables()
+        self.summary()
+    
+    def summary(self):
+        if self.tracer.info:
+            self.tracer.emit(f"=== ANÁLISIS COMPLETADO ===")
+            self.tracer.emit(f"Errores: {len(self.errors)}")
+            self.tracer.emit(f"Advertencias: {len(self.warnings)}")
+            self.tracer.emit(f"Símbolos en tabla global: {len(self.scopes.root.symbols)}")
+    
+    def result(self) -> SemanticResult:
+        """Resultado con la tabla de símbolos convertida a modelos de la API"""
         return SemanticResult(
-            symbol_table=self.symbol_table,
-            errors=self.errors,
-            warnings=self.warnings
+            symbol_table=self.scopes.root.to_model(),
+            errors=messages(self.errors),
+            warnings=messages(self.warnings)
         )
     
+    def analyze_function(self, arena: AstArena, node: int) -> Optional[Scope]:
+        """Analiza una sola función, para compilar programas enormes por partes.
+        
+        Las advertencias de variables se calculan sobre la tabla de la función, que
+        luego se separa de la global para no acumular el programa entero en memoria
+        (en la global solo queda el símbolo de la función). Devuelve esa tabla, o
+        None si la función estaba redeclarada y no se analizó su cuerpo.
+        """
+        children = self.scopes.root.children
+        before = len(children)
+        self.arena = arena
+        self.visit_node(node)
+        if len(children) == before:
+            return None
+        table = children.pop()
+        self.check_variables(table)
+        return table
+    
+    def analyze_detached(self, arena: AstArena, node: int) -> FunctionAnalysis:
+        """Analiza una función como si fuera la única del programa, para hacerlo en
+        otro proceso; merge la incorpora después en su lugar."""
+        self.scopes = Scopes()
+        self.memory_counter = 0
+        self.errors, self.warnings = [], []
+        self.unresolved = set()
+        self.arena = arena
+        self.visit_node(node)
+        name = arena.text(node)
+        table = self.scopes.root.children[0]
+        unused, uninitialized = self.deferred_checks(table)
+        return FunctionAnalysis(name, self.scopes.root.symbols[name], table, self.memory_counter,
+                                self.errors, self.warnings, unused, uninitialized,
+                                frozenset(self.unresolved))
+    
+    def merge(self, arena: AstArena, functions: List[int], parts: List[Optional[FunctionAnalysis]]):
+        """Une los análisis hechos aparte de las funciones de arena, en orden, con el
+        mismo resultado que check(): las direcciones siguen la numeración global y
+        las advertencias finales quedan al final. Una función se analiza de nuevo
+        aquí si no hay análisis aparte (None), si su nombre ya estaba declarado o si
+        usó un nombre que aquí sí existe (una función anterior)."""
+        if self.tracer.info: self.tracer.emit("=== INICIANDO ANÁLISIS SEMÁNTICO (POR PARTES) ===")
+        self.arena = arena
+        symbols, children = self.scopes.root.symbols, self.scopes.root.children
+        unused: List[Diagnostic] = []
+        uninitialized: List[Diagnostic] = []
+        for node, part in zip(functions, parts):
+            if part is None or part.name in symbols or not part.unresolved.isdisjoint(symbols):
+                before = len(children)
+                self.visit_node(node)
+                if len(children) > before:
+                    function_unused, function_uninitialized = self.deferred_checks(children[-1])
+                    unused.extend(function_unused)
+                    uninitialized.extend(function_uninitialized)
+                continue
+            if self.memory_counter:
+                relocate(part.symbol, part.table, self.memory_counter)
+            self.scopes.declare(part.symbol)
+            children.append(part.table)
+            self.memory_counter += part.memory
+            self.errors.extend(part.errors)
+            self.warnings.extend(part.warnings)
+            unused.extend(part.unused)
+            uninitialized.extend(part.uninitialized)
+        self.warnings.extend(unused)
+        self.warnings.extend(uninitialized)
+        self.summary()
+    
+    def deferred_checks(self, table: Scope) -> Tuple[List[Diagnostic], List[Diagnostic]]:
+        """Advertencias S102 y S103 de table, sin dejarlas en warnings"""
+        unused: List[Diagnostic] = []
+        uninitialized: List[Diagnostic] = []
+        for scope in table.walk():
+            for symbol_name, symbol in scope.symbols.items():
+                if symbol.symbol_type != SymbolType.VARIABLE:
+                    continue
+                if not symbol.used:
+                    unused.append(warning(
+                        CompilerPhase.SEMANTIC, "S102",
+                        f"Variable '{symbol_name}' declarada pero no usada en scope '{symbol.scope}'",
+                        *self.span(symbol.node)))
+                elif not symbol.initialized:
+                    uninitialized.append(warning(
+                        CompilerPhase.SEMANTIC, "S103",
+                        f"Variable '{symbol_name}' usada pero no inicializada en scope '{symbol.scope}'",
+                        *self.span(symbol.node)))
+        return unused, uninitialized
+    
+    def span(self, node: Optional[int]):
+        if node is None:
+            return None, None
+        start, end = self.arena.span(node)
+        if start == NONE:
+            return None, None
+        return start, end
+    
+    def error(self, code: str, message: str, node: Optional[int]):
+        self.errors.append(error(CompilerPhase.SEMANTIC, code, message, *self.span(node)))
+    
+    def warning(self, code: str, message: str, node: Optional[int]):
+        self.warnings.append(warning(CompilerPhase.SEMANTIC, code, message, *self.span(node)))
+    
     def enter_scope(self, scope_name: str):
         """Entra a un nuevo scope"""
-        parent_table = self.scope_stack[-1]
-        new_table = SymbolTable(
-            scope_name=scope_name,
-            parent=parent_table,
-            level=parent_table.level + 1
-        )
-        parent_table.children.append(new_table)
-        self.scope_stack.append(new_table)
-        self.current_scope = scope_name
-        print(f"🔽 Entrando al scope: {scope_name}")
+        self.scopes.enter(scope_name)
+        if self.tracer.debug: self.tracer.emit(f"🔽 Entrando al scope: {scope_name}")
     
     def exit_scope(self):
         """Sale del scope actual"""
-        if len(self.scope_stack) > 1:
-            old_scope = self.scope_stack.pop()
-            self.current_scope = self.scope_stack[-1].scope_name
-            print(f"🔼 Saliendo del scope: {old_scope.scope_name}")
+        old_scope = self.scopes.exit()
+        if old_scope is not None and self.tracer.debug:
+            self.tracer.emit(f"🔼 Saliendo del scope: {old_scope.scope_name}")
     
-    def get_current_table(self) -> SymbolTable:
+    def get_current_table(self) -> Scope:
         """Obtiene la tabla de símbolos actual"""
-        return self.scope_stack[-1]
+        return self.scopes.current
     
-    def visit_node(self, node: ASTNode):
-        """Visita un nodo del AST y realiza análisis semántico"""
-        if not node:
-            return
-            
-        method_name = f'visit_{node.type.lower()}'
-        visitor = getattr(self, method_name, self.visit_default)
-        return visitor(node)
+    def line(self, node: int) -> Optional[int]:
+        line = self.arena.line_of(node)
+        return line if line != NONE else None
     
-    def visit_default(self, node: ASTNode):
+    def visit_default(self, node: int):
         """Visitante por defecto para nodos no especificados"""
-        if node.children:
-            for child in node.children:
-                self.visit_node(child)
+        yield from self.arena.children(node)
     
-    def visit_program(self, node: ASTNode):
+    def visit_program(self, node: int):
         """Visita el nodo Program"""
-        if node.children:
-            for child in node.children:
-                self.visit_node(child)
+        yield from self.arena.children(node)
     
-    def visit_functiondeclaration(self, node: ASTNode):
+    def visit_functiondeclaration(self, node: int):
         """Visita una declaración de función"""
-        function_name = node.value
+        arena = self.arena
+        function_name = arena.text(node)
         
         # Verificar si la función ya existe en scope global
-        if function_name in self.symbol_table.symbols:
-            self.errors.append(f"Función '{function_name}' ya declarada (línea {node.line})")
+        if function_name in self.scopes.root.symbols:
+            self.error("S001", f"Función '{function_name}' ya declarada (línea {self.line(node)})", node)
             return
         
         # Agregar función a la tabla global
-        function_entry = Symbol(
+        self.scopes.declare(SymbolEntry(
             name=function_name,
             symbol_type=SymbolType.FUNCTION,
             data_type=DataType.VOID,
             scope="global",
-            line=node.line or 0,
+            line=self.line(node) or 0,
             memory_address=self.allocate_memory()
-        )
-        self.symbol_table.symbols[function_name] = function_entry
+        ))
         
         # Entrar al scope de la función
         self.enter_scope(function_name)
         
         # Visitar el cuerpo de la función
-        if node.children:
-            self.visit_node(node.children[0])  # Block
+        block = arena.first_child[node]
+        if block != NONE:
+            yield block
         
         # Salir del scope de la función
         self.exit_scope()
     
-    def visit_block(self, node: ASTNode):
+    def visit_block(self, node: int):
         """Visita un bloque de código"""
-        if node.children:
-            for child in node.children:
-                self.visit_node(child)
+        yield from self.arena.children(node)
     
-    def visit_variabledeclaration(self, node: ASTNode):
+    def visit_variabledeclaration(self, node: int):
         """Visita una declaración de variable"""
-        if not node.children:
+        arena = self.arena
+        identifier = arena.first_child[node]
+        if identifier == NONE:
             return
         
-        variable_name = node.children[0].value
-        variable_type = DataType(node.value)  # 'int', 'float', etc.
+        variable_name = arena.text(identifier)
+        variable_type = DataType(arena.text(node))  # 'int', 'float', etc.
         
         current_table = self.get_current_table()
         
         # Verificar si la variable ya existe en el scope actual
         if variable_name in current_table.symbols:
-            self.errors.append(f"Variable '{variable_name}' ya declarada en el scope '{self.current_scope}' (línea {node.line})")
+            self.error("S002", f"Variable '{variable_name}' ya declarada en el scope '{self.current_scope}' (línea {self.line(node)})", node)
             return
         
         # Determinar si está inicializada
-        is_initialized = len(node.children) > 1 and node.children[1].type != "Empty"
+        initializer = arena.next_sibling[identifier]
+        is_initialized = initializer != NONE
         
         # Agregar variable a la tabla de símbolos actual
-        current_table.symbols[variable_name] = Symbol(
+        self.scopes.declare(SymbolEntry(
             name=variable_name,
             symbol_type=SymbolType.VARIABLE,
             data_type=variable_type,
-            scope=self.current_scope,
-            line=node.line or 0,
+            scope=current_table.scope_name,
+            line=self.line(node) or 0,
             initialized=is_initialized,
-            memory_address=self.allocate_memory()
-        )
+            memory_address=self.allocate_memory(),
+            node=node
+        ))
         
-        print(f"📝 Variable declarada: {variable_name} ({variable_type}) en scope {self.current_scope}")
+        if self.tracer.debug: self.tracer.emit(f"📝 Variable declarada: {variable_name} ({variable_type}) en scope {self.current_scope}")
         
         # Verificar inicialización
         if is_initialized:
-            self.visit_node(node.children[1])  # Expression de inicialización
+            yield initializer  # Expression de inicialización
     
-    def visit_assignment(self, node: ASTNode):
+    def visit_assignment(self, node: int):
         """Visita una asignación"""
-        if not node.children:
+        arena = self.arena
+        identifier = arena.first_child[node]
+        if identifier == NONE:
             return
         
-        variable_name = node.children[0].value
+        variable_name = arena.text(identifier)
         
         # Verificar si la variable existe
         symbol = self.lookup_symbol(variable_name)
         if not symbol:
-            self.errors.append(f"Variable '{variable_name}' no declarada (línea {node.line})")
+            self.unresolved.add(variable_name)
+            self.error("S003", f"Variable '{variable_name}' no declarada (línea {self.line(node)})", node)
         else:
             # Marcar variable como inicializada y usada
             symbol.initialized = True
             symbol.used = True
-            print(f"🔄 Variable asignada: {variable_name}")
+            if self.tracer.debug: self.tracer.emit(f"🔄 Variable asignada: {variable_name}")
         
         # Visitar la expresión del lado derecho
-        if len(node.children) > 1:
-            self.visit_node(node.children[1])
+        expression = arena.next_sibling[identifier]
+        if expression != NONE:
+            yield expression
     
-    def visit_identifier(self, node: ASTNode):
+    def visit_identifier(self, node: int):
         """Visita un identificador"""
-        variable_name = node.value
+        variable_name = self.arena.text(node)
         
         # Verificar si la variable existe
         symbol = self.lookup_symbol(variable_name)
         if not symbol:
-            self.errors.append(f"Variable '{variable_name}' no declarada (línea {node.line})")
+            self.unresolved.add(variable_name)
+            self.error("S003", f"Variable '{variable_name}' no declarada (línea {self.line(node)})", node)
         else:
             # Marcar variable como usada
             symbol.used = True
             
             # Verificar si está inicializada
             if not symbol.initialized:
-                self.warnings.append(f"Variable '{variable_name}' usada pero puede no estar inicializada (línea {node.line})")
+                self.warning("S101", f"Variable '{variable_name}' usada pero puede no estar inicializada (línea {self.line(node)})", node)
             
-            print(f"🔍 Variable usada: {variable_name}")
+            if self.tracer.debug: self.tracer.emit(f"🔍 Variable usada: {variable_name}")
     
-    def visit_ifstatement(self, node: ASTNode):
+    def visit_ifstatement(self, node: int):
         """Visita una sentencia if"""
-        if node.children:
-            # Visitar condición
-            self.visit_node(node.children[0])
-            
-            # Entrar al scope del bloque then
-            self.enter_scope(f"if_block_{node.line}")
-            
-            # Visitar bloque then
-            if len(node.children) > 1:
-                self.visit_node(node.children[1])
-            
-            # Salir del scope del bloque then
+        condition, then_block, else_block = (self.arena.children(node) + [NONE, NONE, NONE])[:3]
+        if condition == NONE:
+            return
+        line = self.line(node)
+        
+        # Visitar condición
+        yield condition
+        
+        # Entrar al scope del bloque then
+        self.enter_scope(f"if_block_{line}")
+        
+        # Visitar bloque then
+        if then_block != NONE:
+            yield then_block
+        
+        # Salir del scope del bloque then
+        self.exit_scope()
+        
+        # Visitar bloque else si existe
+        if else_block != NONE:
+            self.enter_scope(f"else_block_{line}")
+            yield else_block
             self.exit_scope()
-            
-            # Visitar bloque else si existe
-            if len(node.children) > 2:
-                self.enter_scope(f"else_block_{node.line}")
-                self.visit_node(node.children[2])
-                self.exit_scope()
     
-    def visit_whilestatement(self, node: ASTNode):
+    def visit_whilestatement(self, node: int):
         """Visita una sentencia while"""
-        if node.children:
-            # Visitar condición
-            self.visit_node(node.children[0])
-            
-            # Entrar al scope del bloque while
-            self.enter_scope(f"while_block_{node.line}")
-            
-            # Visitar cuerpo
-            if len(node.children) > 1:
-                self.visit_node(node.children[1])
-            
-            # Salir del scope del bloque while
-            self.exit_scope()
+        condition = self.arena.first_child[node]
+        if condition == NONE:
+            return
+        
+        # Visitar condición
+        yield condition
+        
+        # Entrar al scope del bloque while
+        self.enter_scope(f"while_block_{self.line(node)}")
+        
+        # Visitar cuerpo
+        body = self.arena.next_sibling[condition]
+        if body != NONE:
+            yield body
+        
+        # Salir del scope del bloque while
+        self.exit_scope()
     
-    def visit_returnstatement(self, node: ASTNode):
+    def visit_returnstatement(self, node: int):
         """Visita una sentencia return"""
-        if node.children:
-            for child in node.children:
-                self.visit_node(child)
+        yield from self.arena.children(node)
     
-    def visit_binaryexpression(self, node: ASTNode):
+    def visit_binaryexpression(self, node: int):
         """Visita una expresión binaria"""
-        if node.children:
-            for child in node.children:
-                self.visit_node(child)
+        yield from self.arena.children(node)
+    
+    def visit_unaryexpression(self, node: int):
+        """Visita una expresión unaria (-x, !x)"""
+        yield from self.arena.children(node)
     
-    def visit_literal(self, node: ASTNode):
+    def visit_literal(self, node: int):
         """Visita un literal"""
         pass  # Los literales no requieren análisis semántico
     
-    def visit_stringliteral(self, node: ASTNode):
+    def visit_stringliteral(self, node: int):
         """Visita un string literal"""
         pass
     
-    def lookup_symbol(self, name: str) -> Optional[Symbol]:
-        """Busca un símbolo en la tabla actual y padres"""
-        for table in reversed(self.scope_stack):
-            if name in table.symbols:
-                return table.symbols[name]
-        return None
+    def lookup_symbol(self, name: str) -> Optional[SymbolEntry]:
+        """Busca un símbolo en la tabla actual y padres (en O(1), ver Scopes)"""
+        return self.scopes.lookup(name)
     
     def allocate_memory(self) -> int:
         """Asigna una dirección de memoria única"""
@@ -260,27 +407,9 @@ class SemanticAnalyzer:
         self.memory_counter += 1
         return address
     
-    def check_unused_variables(self):
-        """Verifica variables declaradas pero no usadas"""
-        def check_table(table: SymbolTable):
-            for symbol_name, symbol in table.symbols.items():
-                if symbol.symbol_type == SymbolType.VARIABLE and not symbol.used:
-                    self.warnings.append(f"Variable '{symbol_name}' declarada pero no usada en scope '{symbol.scope}'")
-            
-            for child_table in table.children:
-                check_table(child_table)
-        
-        check_table(self.symbol_table)
-    
-    def check_initialized_variables(self):
-        """Verifica variables no inicializadas"""
-        def check_table(table: SymbolTable):
-            for symbol_name, symbol in table.symbols.items():
-                if (symbol.symbol_type == SymbolType.VARIABLE and 
-                    symbol.used and not symbol.initialized):
-                    self.warnings.append(f"Variable '{symbol_name}' usada pero no inicializada en scope '{symbol.scope}'")
-            
-            for child_table in table.children:
-                check_table(child_table)
-        
-        check_table(self.symbol_table)
\ No newline at end of file
+    def check_variables(self, root: Optional[Scope] = None):
+        """Verifica variables no usadas y no inicializadas (desde root o el scope
+        global) en una sola pasada: primero van todas las S102 y después las S103"""
+        unused, uninitialized = self.deferred_checks(root or self.scopes.root)
+        self.warnings.extend(unused)
+        self.warnings.extend(uninitialized)
@@ -0,0 +1,118 @@
+from app.models.schemas import Symbol, SymbolTable, SymbolType, DataType
+from typing import Dict, Iterator, List, Optional, Union
+
+class SymbolEntry:
+    """Símbolo mientras dura la compilación; se convierte a Symbol solo para la respuesta"""
+    __slots__ = ("name", "symbol_type", "data_type", "scope", "line", "initialized", "used",
+                 "memory_address", "node")
+
+    def __init__(self, name: str, symbol_type: SymbolType, data_type: DataType, scope: str,
+                 line: int, initialized: bool = False, memory_address: Optional[int] = None,
+                 node: Optional[int] = None):
+        self.name = name
+        self.symbol_type = symbol_type
+        self.data_type = data_type
+        self.scope = scope
+        self.line = line
+        self.initialized = initialized
+        self.used = False
+        self.memory_address = memory_address
+        # Nodo de la declaración, para ubicar las advertencias finales
+        self.node = node
+
+    def to_model(self) -> Symbol:
+        return Symbol(name=self.name, symbol_type=self.symbol_type, data_type=self.data_type,
+                      scope=self.scope, line=self.line, initialized=self.initialized,
+                      used=self.used, memory_address=self.memory_address)
+
+class Scope:
+    """Tabla de símbolos de un scope, con los mismos campos que SymbolTable"""
+    __slots__ = ("symbols", "scope_name", "level", "children")
+
+    def __init__(self, scope_name: str = "global", level: int = 0):
+        self.symbols: Dict[str, SymbolEntry] = {}
+        self.scope_name = scope_name
+        self.level = level
+        self.children: List["Scope"] = []
+
+    def walk(self) -> Iterator["Scope"]:
+        """Este scope y todos los anidados, en preorden (sin recursión)"""
+        stack = [self]
+        while stack:
+            scope = stack.pop()
+            yield scope
+            stack.extend(reversed(scope.children))
+
+    def to_model(self) -> SymbolTable:
+        """Árbol de SymbolTable (modelos de la API) de este scope"""
+        models: Dict[int, SymbolTable] = {}
+        for scope in reversed(list(self.walk())):  # Los hijos antes que el padre
+            models[id(scope)] = SymbolTable(
+                symbols={name: entry.to_model() for name, entry in scope.symbols.items()},
+                scope_name=scope.scope_name,
+                level=scope.level,
+                children=[models.pop(id(child)) for child in scope.children]
+            )
+        return models[id(self)]
+
+class Scopes:
+    """Scopes anidados del análisis semántico con búsqueda en O(1).
+
+    Además del árbol de Scope se guarda, por nombre, la pila de los símbolos
+    visibles con ese nombre (el de arriba es el del scope más interno). Declarar
+    apila, salir de un scope desapila sus símbolos, y buscar es mirar el tope,
+    en vez de recorrer los scopes abiertos de adentro hacia afuera.
+    """
+
+    def __init__(self):
+        self.root = Scope("global", 0)
+        self.stack = [self.root]
+        self.visible: Dict[str, List[SymbolEntry]] = {}
+
+    @property
+    def current(self) -> Scope:
+        return self.stack[-1]
+
+    def enter(self, scope_name: str) -> Scope:
+        parent = self.stack[-1]
+        scope = Scope(scope_name, parent.level + 1)
+        parent.children.append(scope)
+        self.stack.append(scope)
+        return scope
+
+    def exit(self) -> Optional[Scope]:
+        """Cierra el scope actual (nunca el global) y lo devuelve"""
+        if len(self.stack) == 1:
+            return None
+        scope = self.stack.pop()
+        visible = self.visible
+        for name in scope.symbols:
+            visible[name].pop()
+        return scope
+
+    def declare(self, entry: SymbolEntry):
+        """Agrega entry al scope actual"""
+        self.stack[-1].symbols[entry.name] = entry
+        stack = self.visible.get(entry.name)
+        if stack is None:
+            self.visible[entry.name] = [entry]
+        else:
+            stack.append(entry)
+
+    def lookup(self, name: str) -> Optional[SymbolEntry]:
+        """Símbolo visible con ese nombre desde el scope actual"""
+        stack = self.visible.get(name)
+        return stack[-1] if stack else None
+
+def variables_by_scope(table: Union[Scope, SymbolTable]) -> Dict[str, List[str]]:
+    """Variables declaradas en cada scope (por nombre del scope), en el orden de la
+    tabla. Sirve para Scope y para SymbolTable; es el índice que usa el generador."""
+    index: Dict[str, List[str]] = {}
+    stack = [table]
+    while stack:
+        table = stack.pop()
+        for symbol in table.symbols.values():
+            if symbol.symbol_type == SymbolType.VARIABLE:
+                index.setdefault(symbol.scope, []).append(symbol.name)
+        stack.extend(reversed(table.children))
+    return index
@@ -0,0 +1,54 @@
+from collections import deque
+from typing import List, Optional
+import os
+
+# Niveles de traza: cada nivel incluye a los anteriores
+TRACE_OFF = 0
+TRACE_INFO = 1    # Encabezados y resúmenes de cada fase
+TRACE_DEBUG = 2   # Una línea por identificador, scope, etc.
+
+LEVEL_NAMES = {"off": TRACE_OFF, "info": TRACE_INFO, "debug": TRACE_DEBUG}
+
+DEFAULT_LEVEL = LEVEL_NAMES.get(os.environ.get("COMPILER_TRACE_LEVEL", "off").lower(), TRACE_OFF)
+DEFAULT_BUFFER_SIZE = int(os.environ.get("COMPILER_TRACE_BUFFER", 1000))
+
+class Tracer:
+    """Traza del compilador filtrada por nivel.
+
+    Los puntos de traza se escriben como `if tracer.debug: tracer.emit(f"...")`,
+    así que con la traza apagada ni siquiera se construye el mensaje. Si se crea
+    con buffer, los mensajes van a un ring buffer acotado en vez de a stdout.
+    """
+
+    def __init__(self, level: int = DEFAULT_LEVEL, buffer_size: Optional[int] = None):
+        self.level = level
+        self.info = level >= TRACE_INFO
+        self.debug = level >= TRACE_DEBUG
+        self.buffer = deque(maxlen=buffer_size) if buffer_size else None
+        self.dropped = 0
+
+    def emit(self, message: str):
+        if self.buffer is None:
+            print(message)
+            return
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(message)
+
+    def lines(self) -> List[str]:
+        """Contenido del ring buffer (las líneas más recientes)"""
+        if self.buffer is None:
+            return []
+        lines = list(self.buffer)
+        if self.dropped:
+            lines.insert(0, f"... {self.dropped} líneas de traza descartadas ...")
+        return lines
+
+# Traza global (stdout) usada cuando una fase se crea sin tracer propio
+default_tracer = Tracer()
+
+def request_tracer(debug: bool) -> Tracer:
+    """Tracer de una petición: en modo debug captura todo en un ring buffer"""
+    if debug:
+        return Tracer(TRACE_DEBUG, buffer_size=DEFAULT_BUFFER_SIZE)
+    return default_tracer
@@ -0,0 +1,77 @@
+from types import GeneratorType
+from app.compiler.arena import AstArena, KIND_NAMES, NONE
+from typing import Any, Callable, List, Optional, Tuple
+
+def walk(root: int, visit: Callable[[int], Any],
+         on_error: Optional[Callable[[int, Exception], Any]] = None) -> Any:
+    """Recorre el AST (nodos del arena) con una pila explícita en vez de la pila de Python.
+
+    visit(node) devuelve el resultado del nodo, o un generador que hace yield de
+    cada hijo que quiere visitar, recibe su resultado con send y termina con
+    return. Así un visitante se escribe igual que el recursivo
+    (resultado = yield hijo) y la profundidad del árbol no tiene límite.
+    Si visit o el generador lanzan una excepción, el nodo vale on_error(node, e)
+    (o se propaga si no hay on_error).
+    """
+    stack: List[Tuple[GeneratorType, int]] = []
+    node = root
+    while True:
+        # Bajar: visitar node
+        try:
+            step = visit(node)
+        except Exception as e:
+            if on_error is None:
+                raise
+            step = on_error(node, e)
+        if type(step) is GeneratorType:
+            stack.append((step, node))
+            result = None
+        else:
+            result = step
+
+        # Subir: entregar el resultado al generador de arriba hasta que pida otro hijo
+        while stack:
+            generator, parent = stack[-1]
+            try:
+                node = generator.send(result)
+                break
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+            except Exception as e:
+                stack.pop()
+                if on_error is None:
+                    raise
+                result = on_error(parent, e)
+        else:
+            return result
+
+class AstVisitor:
+    """Base de los visitantes del AST. La tabla de visit_* por tipo de nodo se arma
+    una sola vez por clase (al definirla), no en cada instancia ni en cada nodo."""
+
+    # Resultado de visitar un hijo ausente (NONE)
+    missing: Any = None
+    # visit_error(node, e): resultado de un nodo cuyo visit_* lanzó una excepción;
+    # None para que la excepción se propague
+    visit_error: Optional[Callable[[int, Exception], Any]] = None
+    # visit_* de cada tipo de nodo, indexado por el tipo del arena
+    visit_table: List[Callable[["AstVisitor", int], Any]] = []
+    arena: Optional[AstArena] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.visit_table = [getattr(cls, f"visit_{name.lower()}", cls.visit_default) for name in KIND_NAMES]
+
+    def visit_node(self, node: int) -> Any:
+        """Visita node y su subárbol (ver walk)"""
+        return walk(node, self.dispatch, self.visit_error)
+
+    def dispatch(self, node: int) -> Any:
+        if node == NONE:
+            return self.missing
+        return self.visit_table[self.arena.kind[node]](self, node)
+
+    def visit_default(self, node: int) -> Any:
+        for child in self.arena.children(node):
+            yield child
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 from enum import Enum
 
@@ -15,8 +15,54 @@ class DataType(str, Enum):
     STRING = "string"
     VOID = "void"
 
+class CompilerPhase(str, Enum):
+    LEXER = "lexer"
+    PARSER = "parser"
+    SEMANTIC = "semantic"
+    INTERMEDIATE = "intermediate"
+    OPTIMIZER = "optimizer"
+    CODEGEN = "codegen"
+
+class Severity(str, Enum):
+    ERROR = "error"
+    WARNING = "warning"
+
+class Artifact(str, Enum):
+    TOKENS = "tokens"
+    AST = "ast"
+    SYMBOL_TABLE = "symbol_table"
+    INTERMEDIATE_CODE = "intermediate_code"
+    OPTIMIZED_CODE = "optimized_code"
+    OPTIMIZATION_LOG = "optimization_log"
+    OBJECT_CODE = "object_code"
+
 class CompileRequest(BaseModel):
     code: str
+    # Artefactos a devolver (None = todos). Errores y advertencias siempre se devuelven.
+    artifacts: Optional[List[Artifact]] = None
+    # Última fase a ejecutar (None = la más profunda que necesiten los artefactos)
+    stop_after: Optional[CompilerPhase] = None
+    # Captura la traza de depuración del compilador y la devuelve en la respuesta
+    debug: bool = False
+
+class BatchCompileRequest(BaseModel):
+    programs: List[CompileRequest]
+
+class TextEdit(BaseModel):
+    """Reemplaza el texto [start, end) (offsets en code points, no en unidades UTF-16) por text"""
+    start: int
+    end: int
+    text: str = ""
+
+class SessionCompileRequest(BaseModel):
+    # Sin session_id (o con code) se abre/reinicia la sesión con ese código completo
+    session_id: Optional[str] = None
+    code: Optional[str] = None
+    # Ediciones sobre el texto de la sesión, aplicadas en orden
+    edits: List[TextEdit] = []
+    artifacts: Optional[List[Artifact]] = None
+    stop_after: Optional[CompilerPhase] = None
+    debug: bool = False
 
 class Token(BaseModel):
     type: str
@@ -30,6 +76,9 @@ class ASTNode(BaseModel):
     children: Optional[List['ASTNode']] = None
     line: Optional[int] = None
     data_type: Optional[DataType] = None
+    # Offsets [start, end) del token principal del nodo; solo para diagnósticos
+    start: Optional[int] = Field(None, exclude=True)
+    end: Optional[int] = Field(None, exclude=True)
 
 class QuadrupleType(str, Enum):
     ARITHMETIC = "arithmetic"
@@ -51,6 +100,8 @@ class Quadruple(BaseModel):
     result: Optional[str] = None
     quadruple_type: QuadrupleType
     line: Optional[int] = None
+    # Tipo con que opera (int, float, string...) en aritméticas y comparaciones
+    data_type: Optional[DataType] = None
 
 class Symbol(BaseModel):
     name: str
@@ -85,6 +136,18 @@ class IntermediateCode(BaseModel):
     temporal_counter: int = 0
     label_counter: int = 0
 
+class DiagnosticInfo(BaseModel):
+    """Diagnóstico estructurado (errores y advertencias de todas las fases)"""
+    phase: CompilerPhase
+    severity: Severity
+    code: str
+    message: str
+    # Offsets [start, end) en el código; None si el diagnóstico no tiene posición
+    start: Optional[int] = None
+    end: Optional[int] = None
+    line: int = 0
+    column: int = 0
+
 class CompileResponse(BaseModel):
     success: bool
     ast: Optional[ASTNode] = None
@@ -100,4 +163,29 @@ class CompileResponse(BaseModel):
     object_code: Optional[str] = None
     errors: List[str] = []
     warnings: List[str] = []
-    metrics: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    # Los mismos errores y advertencias, con fase, código y posición
+    diagnostics: List[DiagnosticInfo] = []
+    metrics: Optional[Dict[str, Any]] = None
+    # Traza de depuración (solo con debug=True en la petición)
+    trace: Optional[List[str]] = None
+    # Sesión de compilación incremental (solo en /api/compile/session)
+    session_id: Optional[str] = None
+
+class PhaseChunk(BaseModel):
+    """Resultado parcial de una fase en /api/compile/stream"""
+    phase: str
+    time: float = 0
+    errors: List[str] = []
+    warnings: List[str] = []
+    diagnostics: List[DiagnosticInfo] = []
+    tokens: Optional[List[Token]] = None
+    ast: Optional[ASTNode] = None
+    symbol_table: Optional[SymbolTable] = None
+    intermediate_code: Optional[List[Quadruple]] = None
+    optimized_code: Optional[List[Quadruple]] = None
+    optimization_log: Optional[List[str]] = None
+    object_code: Optional[str] = None
+    # Solo en el último fragmento (phase == "done")
+    success: Optional[bool] = None
+    metrics: Optional[Dict[str, Any]] = None
+    trace: Optional[List[str]] = None
@@ -0,0 +1,150 @@
+import random
+from typing import Dict, List, Optional
+
+# Formas de programa del benchmark: cada una estresa una parte distinta del compilador
+SHAPES: Dict[str, Dict[str, int]] = {
+    # Muchas funciones pequeñas
+    "functions": {"functions": 60, "statements": 10, "depth": 1, "expression_terms": 4, "loop_body": 4},
+    # Bloques if/while anidados muy profundo
+    "nesting": {"functions": 2, "statements": 2, "depth": 40, "expression_terms": 3, "loop_body": 2},
+    # Expresiones largas con paréntesis y todos los operadores
+    "expressions": {"functions": 4, "statements": 20, "depth": 1, "expression_terms": 60, "loop_body": 2},
+    # Muchas declaraciones de variables en una sola función
+    "variables": {"functions": 1, "statements": 800, "depth": 0, "expression_terms": 3, "loop_body": 2},
+    # Ciclos while con cuerpos grandes
+    "loops": {"functions": 4, "statements": 4, "depth": 2, "expression_terms": 5, "loop_body": 60},
+}
+
+ARITHMETIC_OPERATORS = ["+", "-", "*", "/"]
+RELATIONAL_OPERATORS = ["<", ">", "<=", ">=", "==", "!="]
+
+class ProgramGenerator:
+    """Genera programas válidos (léxica, sintáctica y semánticamente) del lenguaje.
+
+    Todas las variables se declaran e inicializan antes de usarse y los divisores
+    son constantes distintas de cero, así que el compilador recorre todas sus
+    fases sin errores. Con la misma semilla el programa es siempre el mismo.
+    """
+
+    def __init__(self, functions: int = 10, statements: int = 10, depth: int = 1,
+                 expression_terms: int = 4, loop_body: int = 4, scale: float = 1.0,
+                 seed: int = 0):
+        self.functions = max(1, int(functions * scale))
+        self.statements = max(1, int(statements * scale))
+        self.depth = depth
+        self.expression_terms = max(1, expression_terms)
+        self.loop_body = max(1, loop_body)
+        self.random = random.Random(seed)
+        self.lines: List[str] = []
+        self.variable_counter = 0
+
+    def generate(self) -> str:
+        self.lines = []
+        for n in range(self.functions):
+            self.generate_function("main" if n == 0 else f"f_{n}")
+        return "\n".join(self.lines) + "\n"
+
+    # --- ESTRUCTURA ---
+
+    def emit(self, indent: int, text: str):
+        self.lines.append("    " * indent + text)
+
+    def new_variable(self) -> str:
+        self.variable_counter += 1
+        return f"v{self.variable_counter}"
+
+    def generate_function(self, name: str):
+        self.emit(0, f"function {name}() {{")
+        scope: List[str] = []
+        # Un par de variables base para que las expresiones siempre tengan operandos
+        for _ in range(2):
+            self.declare(1, scope)
+        for _ in range(self.statements):
+            self.generate_statement(1, scope, self.depth)
+        self.emit(1, f"return {self.random.choice(scope)};")
+        self.emit(0, "}")
+
+    def generate_block(self, indent: int, outer: List[str], depth: int, statements: int):
+        # Las variables del bloque solo son visibles dentro de él
+        scope = list(outer)
+        for _ in range(statements):
+            self.generate_statement(indent, scope, depth)
+
+    def generate_statement(self, indent: int, scope: List[str], depth: int):
+        """depth > 1 anida bloques; depth == 1 admite algún if/while suelto y depth == 0
+        solo sentencias simples"""
+        if depth > 1:
+            # Anidamos: alternamos if/else y while hasta agotar la profundidad
+            if depth % 2 == 0:
+                self.emit(indent, f"if ({self.condition(scope)}) {{")
+                self.generate_block(indent + 1, scope, depth - 1, 1)
+                self.emit(indent, "} else {")
+                self.generate_block(indent + 1, scope, 0, 1)
+                self.emit(indent, "}")
+            else:
+                self.generate_loop(indent, scope, depth - 1)
+            return
+
+        choice = self.random.random()
+        if choice < 0.4 or len(scope) < 2:
+            self.declare(indent, scope)
+        elif choice < 0.75:
+            self.emit(indent, f"{self.random.choice(scope)} = {self.expression(scope)};")
+        elif choice < 0.85:
+            self.emit(indent, f"print({self.random.choice(scope)});")
+        elif depth == 0:
+            self.emit(indent, f"{self.random.choice(scope)} = {self.expression(scope)};")
+        elif choice < 0.95:
+            self.generate_loop(indent, scope, 1)
+        else:
+            self.emit(indent, f"if ({self.condition(scope)}) {{")
+            self.generate_block(indent + 1, scope, 0, 2)
+            self.emit(indent, "}")
+
+    def generate_loop(self, indent: int, scope: List[str], depth: int):
+        counter = self.declare(indent, scope, "0")
+        self.emit(indent, f"while ({counter} < {self.random.randint(2, 100)}) {{")
+        self.emit(indent + 1, f"{counter} = {counter} + 1;")
+        self.generate_block(indent + 1, scope, depth - 1, self.loop_body if depth <= 1 else 1)
+        self.emit(indent, "}")
+
+    def declare(self, indent: int, scope: List[str], value: Optional[str] = None) -> str:
+        name = self.new_variable()
+        if value is None:
+            value = self.expression(scope) if scope else str(self.random.randint(0, 100))
+        self.emit(indent, f"int {name} = {value};")
+        scope.append(name)
+        return name
+
+    # --- EXPRESIONES ---
+
+    def operand(self, scope: List[str]) -> str:
+        if scope and self.random.random() < 0.6:
+            return self.random.choice(scope)
+        return str(self.random.randint(1, 100))
+
+    def expression(self, scope: List[str]) -> str:
+        terms = self.random.randint(max(1, self.expression_terms // 2), self.expression_terms)
+        parts = [self.operand(scope)]
+        open_parens = 0
+        for _ in range(terms - 1):
+            operator = self.random.choice(ARITHMETIC_OPERATORS)
+            if operator == "/":
+                parts.append(f"/ {self.random.randint(1, 9)}")
+                continue
+            if open_parens < 8 and self.random.random() < 0.15:
+                parts.append(f"{operator} ({self.operand(scope)}")
+                open_parens += 1
+            else:
+                parts.append(f"{operator} {self.operand(scope)}")
+            if open_parens and self.random.random() < 0.2:
+                parts[-1] += ")"
+                open_parens -= 1
+        return " ".join(parts) + ")" * open_parens
+
+    def condition(self, scope: List[str]) -> str:
+        return f"{self.operand(scope)} {self.random.choice(RELATIONAL_OPERATORS)} {self.operand(scope)}"
+
+def generate_program(shape: str = "functions", scale: float = 1.0, seed: int = 0) -> str:
+    """Programa sintético con la forma dada (ver SHAPES)"""
+    return ProgramGenerator(**SHAPES[shape], scale=scale, seed=seed).generate()
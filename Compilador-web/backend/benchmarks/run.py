@@ -0,0 +1,191 @@
+"""Micro-benchmarks por fase del compilador.
+
+Uso (desde Compilador-web/backend):
+
+    python -m benchmarks.run                         # todas las formas, compara con baseline.json
+    python -m benchmarks.run --shape loops --scale 4 --repeat 5
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json --tolerance 0.25
+
+Cada fase se mide por separado con la salida de la fase anterior ya calculada:
+mediana y mínimo de varias repeticiones, throughput (tokens o cuádruplos por
+segundo) y pico de memoria (tracemalloc, en una ejecución aparte para no
+distorsionar los tiempos). Sale con código 1 si alguna fase empeora más que la
+tolerancia respecto a la línea base.
+"""
+from app.compiler.lexer import Lexer
+from app.compiler.parser import Parser
+from app.compiler.semantic import SemanticAnalyzer
+from app.compiler.intermediate import IntermediateCodeGenerator
+from app.compiler.optimizer import CodeOptimizer
+from app.compiler.generator import CodeGenerator
+from app.compiler.trace import Tracer, TRACE_OFF
+from benchmarks.generator import SHAPES, generate_program
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+# Diferencias menores que esto (ms) se consideran ruido aunque superen la tolerancia
+NOISE_FLOOR_MS = 2.0
+
+# La traza apagada siempre, sin importar COMPILER_TRACE_LEVEL
+QUIET = Tracer(TRACE_OFF)
+
+def prepare(code: str) -> Dict[str, Any]:
+    """Ejecuta el pipeline una vez para tener la entrada de cada fase"""
+    tokens, lexer_errors = Lexer().tokenize(code)
+    ast, parser_errors = Parser().parse(tokens)
+    semantic = SemanticAnalyzer(QUIET).analyze(ast)
+    ic = IntermediateCodeGenerator(semantic.symbol_table, QUIET).generate(ast)
+    optimized, _ = CodeOptimizer(QUIET).optimize(ic)
+    errors = lexer_errors + parser_errors + semantic.errors
+    if errors:
+        raise ValueError(f"El programa generado no es válido: {errors[:3]}")
+    return {"code": code, "tokens": tokens, "ast": ast, "symbol_table": semantic.symbol_table,
+            "quadruples": ic, "optimized": optimized}
+
+# (fase, función a medir, unidad del throughput)
+PHASES: List[Tuple[str, Callable[[Dict[str, Any]], Any], str]] = [
+    ("lexer", lambda d: Lexer().tokenize(d["code"]), "tokens"),
+    ("parser", lambda d: Parser().parse(d["tokens"]), "tokens"),
+    ("semantic", lambda d: SemanticAnalyzer(QUIET).analyze(d["ast"]), "tokens"),
+    ("intermediate", lambda d: IntermediateCodeGenerator(d["symbol_table"], QUIET).generate(d["ast"]), "tokens"),
+    ("optimizer", lambda d: CodeOptimizer(QUIET).optimize(d["quadruples"]), "quadruples"),
+    ("codegen", lambda d: CodeGenerator(d["symbol_table"], QUIET).generate(d["optimized"]), "quadruples"),
+]
+
+def measure_time(func: Callable, data: Dict[str, Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(data)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def measure_peak_memory(func: Callable, data: Dict[str, Any]) -> float:
+    """Pico de memoria (KB) asignada durante una ejecución de la fase"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        func(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - base) / 1024
+
+def benchmark_shape(shape: str, scale: float, repeat: int, seed: int) -> Dict[str, Any]:
+    data = prepare(generate_program(shape, scale, seed))
+    units = {"tokens": len(data["tokens"]), "quadruples": len(data["quadruples"])}
+    phases = {}
+    for name, func, unit in PHASES:
+        func(data)  # Calentamiento
+        samples = measure_time(func, data, repeat)
+        median = statistics.median(samples)
+        phases[name] = {
+            "median_ms": round(median, 3),
+            "min_ms": round(min(samples), 3),
+            "throughput": round(units[unit] / (median / 1000), 1) if median > 0 else 0,
+            "unit": f"{unit}/s",
+            "peak_kb": round(measure_peak_memory(func, data), 1),
+        }
+    return {"source_bytes": len(data["code"]), "tokens": units["tokens"],
+            "quadruples": units["quadruples"], "phases": phases}
+
+def run_suite(shapes: List[str], scale: float, repeat: int, seed: int) -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "scale": scale,
+        "seed": seed,
+        "results": {shape: benchmark_shape(shape, scale, repeat, seed) for shape in shapes},
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Fases más lentas o con más memoria que la línea base (más allá de la tolerancia)"""
+    regressions = []
+    if (report["scale"], report["seed"]) != (baseline.get("scale"), baseline.get("seed")):
+        return [f"La línea base usa scale={baseline.get('scale')} seed={baseline.get('seed')}: no es comparable"]
+    for shape, result in report["results"].items():
+        base_phases = baseline["results"].get(shape, {}).get("phases", {})
+        for phase, current in result["phases"].items():
+            base = base_phases.get(phase)
+            if base is None:
+                continue
+            slower = current["median_ms"] - base["median_ms"]
+            if slower > NOISE_FLOOR_MS and current["median_ms"] > base["median_ms"] * (1 + tolerance):
+                regressions.append(f"{shape}/{phase}: {base['median_ms']:.1f} ms -> {current['median_ms']:.1f} ms")
+            if current["peak_kb"] > base["peak_kb"] * (1 + tolerance) and current["peak_kb"] - base["peak_kb"] > 64:
+                regressions.append(f"{shape}/{phase}: pico {base['peak_kb']:.0f} KB -> {current['peak_kb']:.0f} KB")
+    return regressions
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None):
+    print(f"Python {report['python']} ({report['machine']}), scale={report['scale']}")
+    print(f"{'Forma/fase':<26} {'Mediana ms':>11} {'Mín ms':>9} {'Throughput':>18} {'Pico KB':>10} {'vs base':>8}")
+    print("-" * 87)
+    for shape, result in report["results"].items():
+        print(f"{shape} ({result['source_bytes']} bytes, {result['tokens']} tokens, {result['quadruples']} cuádruplos)")
+        base_phases = (baseline or {}).get("results", {}).get(shape, {}).get("phases", {})
+        for phase, r in result["phases"].items():
+            base = base_phases.get(phase)
+            ratio = f"{r['median_ms'] / base['median_ms']:.2f}x" if base and base["median_ms"] > 0 else ""
+            throughput = f"{r['throughput']:.0f} {r['unit']}"
+            print(f"  {phase:<24} {r['median_ms']:>11.2f} {r['min_ms']:>9.2f} {throughput:>18} {r['peak_kb']:>10.0f} {ratio:>8}")
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks por fase del compilador")
+    parser.add_argument("--shape", action="append", choices=sorted(SHAPES),
+                        help="Forma de programa a medir (repetible; por defecto todas)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplica el tamaño de los programas")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por fase")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="RUTA", help="Guarda el resultado como nueva línea base")
+    parser.add_argument("--compare", metavar="RUTA", default=DEFAULT_BASELINE,
+                        help="Línea base con la que comparar (si existe)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Empeoramiento relativo permitido antes de fallar (0.25 = 25%%)")
+    parser.add_argument("--json", action="store_true", help="Imprime el resultado en JSON")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.shape or list(SHAPES), args.scale, args.repeat, args.seed)
+
+    baseline = None
+    if not args.save and args.compare and os.path.exists(args.compare):
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nLínea base guardada en {args.save}")
+        return 0
+
+    if baseline is None:
+        return 0
+    regressions = compare(report, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegresiones respecto a {args.compare} (tolerancia {args.tolerance:.0%}):", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    print(f"\nSin regresiones respecto a {args.compare}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
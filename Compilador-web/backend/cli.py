@@ -0,0 +1,70 @@
+"""Compila archivos del lenguaje desde la línea de comandos, sin pasar por la API.
+
+Uso (desde Compilador-web/backend):
+
+    python cli.py programa.txt                        # escribe programa.ir.tsv, .opt.tsv y .py
+    python cli.py programa.txt -o salida/ --emit object_code
+    python cli.py enorme.txt --max-diagnostics 20 --json
+
+El archivo se mapea en memoria y se compila función por función: los artefactos
+se van escribiendo a disco y nada crece con el tamaño del programa, así que sirve
+para programas generados de cientos de MB. Los diagnósticos van a stderr como
+archivo:línea:columna. Al final se imprimen los tiempos por fase. Sale con código
+1 si hubo errores.
+"""
+from app.models.schemas import Artifact
+from app.compiler.offline import ARTIFACT_SUFFIX, compile_file
+from typing import Any, Dict, List
+import argparse
+import json
+import os
+import sys
+
+def output_prefix(path: str, output_dir: str) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir or os.path.dirname(path) or ".", name)
+
+def print_report(path: str, prefix: str, artifacts: List[Artifact], metrics: Dict[str, Any]):
+    megabytes = metrics["source_bytes"] / (1024 * 1024)
+    total_ms = sum(metrics["phase_timings"].values())
+    mode = "mmap" if metrics["mapped"] else "decodificado"
+    print(f"{path}: {megabytes:.1f} MB ({mode}), {metrics['functions_count']} funciones, "
+          f"{metrics['tokens_count']} tokens, {metrics['quadruples_count']} cuádruplos "
+          f"({metrics['optimized_count']} optimizados)")
+    print(f"{'Fase':<16} {'ms':>12} {'%':>7}")
+    print("-" * 37)
+    for phase, elapsed in metrics["phase_timings"].items():
+        share = elapsed / total_ms * 100 if total_ms else 0
+        print(f"{phase:<16} {elapsed:>12.1f} {share:>6.1f}%")
+    throughput = megabytes / (total_ms / 1000) if total_ms else 0
+    print(f"{'total':<16} {total_ms:>12.1f} {'':>7}  ({throughput:.2f} MB/s)")
+    print(f"{metrics['errors_count']} errores, {metrics['warnings_count']} advertencias")
+    for artifact in artifacts:
+        print(f"  {artifact.value}: {prefix}{ARTIFACT_SUFFIX[artifact]}")
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compila un archivo fuente a disco, función por función")
+    parser.add_argument("source", help="Archivo con el programa")
+    parser.add_argument("-o", "--output-dir", help="Directorio de salida (por defecto el del archivo)")
+    parser.add_argument("--emit", action="append", choices=[a.value for a in ARTIFACT_SUFFIX],
+                        help="Artefacto a escribir (repetible; por defecto todos)")
+    parser.add_argument("--max-diagnostics", type=int, default=100,
+                        help="Máximo de diagnósticos a imprimir (se cuentan todos)")
+    parser.add_argument("--json", action="store_true", help="Imprime las métricas en JSON")
+    args = parser.parse_args(argv)
+
+    artifacts = [Artifact(a) for a in args.emit] if args.emit else list(ARTIFACT_SUFFIX)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    prefix = output_prefix(args.source, args.output_dir)
+
+    metrics = compile_file(args.source, prefix, artifacts, sys.stderr, args.max_diagnostics)
+
+    if args.json:
+        print(json.dumps(metrics, indent=2))
+    else:
+        print_report(args.source, prefix, artifacts, metrics)
+    return 1 if metrics["errors_count"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
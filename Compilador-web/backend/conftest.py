@@ -0,0 +1 @@
+# Hace importable el paquete app al correr pytest desde backend/
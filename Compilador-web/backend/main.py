@@ -1,8 +1,12 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 # Aquí importamos el router desde compile.py
 # Asumiendo que está en app/api/compile.py
 from app.api.compile import router as compile_router 
+from app.api.executor import compilation_executor
+from app.api.cache import compilation_cache
+from app.api.metrics import render_prometheus
 
 print("--- Iniciando main.py ---")
 
@@ -37,6 +41,15 @@ except Exception as e:
     print(f"!!! ERROR AL CARGAR EL ROUTER: {e} !!!")
 # ------------------------------------
 
+@app.on_event("startup")
+async def start_executor():
+    # Arranca los workers antes de aceptar peticiones para que lleguen calientes
+    await compilation_executor.start()
+
+@app.on_event("shutdown")
+async def stop_executor():
+    compilation_executor.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "Compilador Web Interactivo API", "status": "active"}
@@ -45,6 +58,14 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Formato de exposición de texto de Prometheus
+    return PlainTextResponse(
+        render_prometheus(compilation_cache.stats()),
+        media_type="text/plain; version=0.0.4"
+    )
+
 @app.get("/api/ast")
 async def get_ast():
     return {"message": "AST endpoint - usar /api/compile para obtener AST"}
@@ -0,0 +1,80 @@
+from app.models.schemas import Artifact, CompileRequest, CompileResponse, CompilerPhase
+from app.api.cache import CompilationCache, request_key
+
+REQUEST = CompileRequest(code="")
+
+def response(size: int) -> CompileResponse:
+    """Respuesta que estimate_size cuenta como size bytes (con REQUEST)"""
+    return CompileResponse(success=True, object_code="x" * size)
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = CompilationCache(max_bytes=300)
+    for key in ("a", "b", "c"):
+        cache.put(key, REQUEST, response(100))
+    assert cache.get("a") is not None  # "a" pasa a ser la más reciente
+
+    cache.put("d", REQUEST, response(100))
+
+    assert list(cache.entries) == ["c", "a", "d"]
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+def test_re_put_replaces_the_size_of_the_entry():
+    cache = CompilationCache(max_bytes=1000)
+    cache.put("a", REQUEST, response(100))
+    cache.put("b", REQUEST, response(200))
+    cache.put("a", REQUEST, response(300))
+
+    assert cache.current_bytes == 500
+    assert list(cache.entries) == ["b", "a"]  # El re-put también la hace la más reciente
+    assert cache.entries["a"][1] == 300
+
+def test_re_put_that_grows_evicts_others_not_itself():
+    cache = CompilationCache(max_bytes=300)
+    cache.put("a", REQUEST, response(100))
+    cache.put("b", REQUEST, response(100))
+    cache.put("a", REQUEST, response(250))
+
+    assert list(cache.entries) == ["a"]
+    assert cache.current_bytes == 250
+    assert cache.evictions == 1
+
+def test_response_larger_than_the_cache_is_not_stored():
+    cache = CompilationCache(max_bytes=300)
+    cache.put("a", REQUEST, response(100))
+    cache.put("big", REQUEST, response(301))
+
+    assert cache.get("big") is None
+    assert list(cache.entries) == ["a"]
+    assert cache.current_bytes == 100
+    assert cache.evictions == 0
+
+def test_stats_count_hits_misses_and_evictions():
+    cache = CompilationCache(max_bytes=200)
+    cache.put("a", REQUEST, response(100))
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+    cache.put("b", REQUEST, response(100))
+    cache.put("c", REQUEST, response(100))
+
+    assert cache.stats() == {
+        "cache_hits": 2, "cache_misses": 1, "cache_evictions": 1,
+        "cache_entries": 2, "cache_bytes": 200,
+    }
+
+def test_request_key_depends_on_code_and_options():
+    code = "function main() { return 0; }"
+    base = request_key(CompileRequest(code=code))
+
+    assert request_key(CompileRequest(code=code)) == base
+    variants = [
+        CompileRequest(code=code + " "),
+        CompileRequest(code=code, artifacts=[Artifact.TOKENS]),
+        CompileRequest(code=code, artifacts=[Artifact.AST]),
+        CompileRequest(code=code, stop_after=CompilerPhase.PARSER),
+        CompileRequest(code=code, debug=True),
+    ]
+    keys = [request_key(request) for request in variants]
+    assert base not in keys
+    assert len(set(keys)) == len(keys)
@@ -0,0 +1,30 @@
+from app.models.schemas import Artifact, CompileRequest
+from app.compiler.pipeline import compile_program
+from app.api import encoding
+from benchmarks.generator import generate_program
+import pytest
+
+PROGRAMS = [
+    generate_program("functions", 0.1, 1),
+    'function main() { string s = "ñandú 😀"; float f = 2.5 / 2.0; print(s); return 0; }',
+    "function main() { int y = 1 + ; return q; }",  # Con errores: AST parcial y diagnósticos
+]
+
+def compile_all(code):
+    return compile_program(CompileRequest(code=code, artifacts=list(Artifact)))
+
+@pytest.mark.parametrize("code", PROGRAMS)
+def test_compact_round_trip(code):
+    response = compile_all(code)
+    assert encoding.decode_compact(encoding.encode_compact(response)) == response.model_dump()
+
+@pytest.mark.parametrize("code", PROGRAMS)
+def test_pack_round_trip_rebuilds_the_trees(code):
+    response = compile_all(code)
+    packed = encoding.pack_response(response)
+    assert packed.response.ast is None and packed.response.symbol_table is None
+
+    unpacked = encoding.unpack_response(packed)
+    assert unpacked.ast.model_dump() == response.ast.model_dump()
+    assert unpacked.symbol_table.model_dump() == response.symbol_table.model_dump()
+    assert encoding.render_json(unpacked) == encoding.render_json(response)
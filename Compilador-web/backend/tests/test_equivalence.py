@@ -0,0 +1,111 @@
+from app.models.schemas import CompileRequest
+from app.compiler.pipeline import compile_program
+from app.compiler.parallel import ParallelRun
+from app.compiler.incremental import CompileSession, IncrementalRun
+from benchmarks.generator import generate_program, SHAPES
+import json
+import pytest
+
+PROGRAMS = [generate_program(shape, 0.3, 1) for shape in SHAPES] + [
+    # Errores sintácticos, semánticos y léxicos repartidos entre funciones
+    "function a() { int x = 1; return x; } function main() { int y; y = a(; return 0; }",
+    "function a() { int x = 1 return x; } function main() { int y = 2; return y; }",
+    "function a() { int x = 1; return x; } function main() { int y = q; return y; }",
+    "function a() { /* sin cerrar return 1; } function main() { return 0; }",
+    # Sentencias y funciones rotas: sus nodos no cuentan en ast_nodes_count
+    "function main() { return 0; } function a() { int x = 1; if (x > 0) { x = x + 1; return x; }",
+    "function main() { int y = 1 + ; y = y * (2 + ; return y; }",
+    "function a() { int x = 1; x = (x + 2 * ; } function b() { while (x) { int z = 3; } ",
+    # Función sin cerrar seguida de otra: el error se reporta en el 'function' siguiente
+    "function a() { int x = 1; if (x > 0) { x = x + 1; return x; } function main() { return 0; }",
+    # Tokens sueltos después de una función: el programa termina ahí
+    "function a() { return 1; } x = 2; function main() { int y = q; return y; }",
+    # Preámbulo antes de la primera función: el programa queda vacío
+    "int z; function main() { return 0; }",
+]
+
+def finish(run):
+    for _ in run.phases():
+        pass
+    return run.response()
+
+def comparable(response) -> dict:
+    """Respuesta sin los tiempos ni las métricas propias de cada variante"""
+    result = json.loads(response.json())
+    for key in ("compilation_time", "phase_timings", "parallel_chunks"):
+        result["metrics"].pop(key, None)
+    return result
+
+@pytest.mark.parametrize("code", PROGRAMS)
+def test_parallel_matches_serial(code):
+    request = CompileRequest(code=code)
+    assert comparable(finish(ParallelRun(request, workers=2))) == comparable(compile_program(request))
+
+@pytest.mark.parametrize("code", PROGRAMS)
+def test_incremental_matches_serial(code):
+    request = CompileRequest(code=code)
+    response = finish(IncrementalRun(request, CompileSession(code), []))
+    assert comparable(response) == comparable(compile_program(request))
+
+def test_incremental_edits_match_serial():
+    code = generate_program("functions", 0.1, 2)
+    session = CompileSession(code)
+    finish(IncrementalRun(CompileRequest(code=""), session, []))
+
+    # Una línea nueva al inicio de la segunda función y un error en la última
+    second = code.index("function", 1)
+    last = code.rindex("return")
+    edits = [(last, last, "x = ; "), (second, second, "\n")]
+    response = finish(IncrementalRun(CompileRequest(code=""), session, edits))
+
+    edited = code[:second] + "\n" + code[second:last] + "x = ; " + code[last:]
+    assert session.text == edited
+    assert comparable(response) == comparable(compile_program(CompileRequest(code=edited)))
+
+def test_incremental_edit_sequence_matches_serial():
+    code = generate_program("functions", 0.1, 4)
+    session = CompileSession(code)
+    finish(IncrementalRun(CompileRequest(code=""), session, []))
+
+    def cut(text: str) -> int:
+        return text.index("function", 1)  # Inicio de la segunda función
+
+    # Cada paso arma sus ediciones sobre el texto actual
+    steps = [
+        lambda text: [(20, 20, "\n\n")],                                   # Mueve todo lo que sigue
+        lambda text: [(cut(text) - 2, cut(text) - 1, "")],                  # Borra el '}' de main
+        lambda text: [(cut(text) - 1, cut(text) - 1, "}")],                 # Y lo repone
+        lambda text: [(cut(text), cut(text), "x = 1; ")],                   # Tokens sueltos (P001)
+        lambda text: [(text.index("x = 1; "), text.index("x = 1; ") + 7, "")],
+        lambda text: [(len(text), len(text), "function g() { int q = 1; return q; }")],
+        lambda text: [(25, 25, "/*"), (cut(text) + 2, cut(text) + 2, "*/")],  # Comentario que abarca funciones
+        lambda text: [(25, 27, ""), (text.index("*/") - 2, text.index("*/"), "")],
+    ]
+    for step in steps:
+        response = finish(IncrementalRun(CompileRequest(code=""), session, step(session.text)))
+        assert comparable(response) == comparable(compile_program(CompileRequest(code=session.text)))
+
+def test_unchanged_functions_keep_their_ast():
+    code = generate_program("functions", 0.1, 2)
+    session = CompileSession(code)
+    finish(IncrementalRun(CompileRequest(code=""), session, []))
+    kept = [seg.program_node for seg in session.segments[1:]]
+
+    # Una línea nueva en la primera función mueve a las demás sin volver a copiarlas
+    first = code.index("=")
+    response = finish(IncrementalRun(CompileRequest(code=""), session, [(first, first, "\n")]))
+
+    assert [seg.program_node for seg in session.segments[1:]] == kept
+    assert comparable(response) == comparable(compile_program(CompileRequest(code=session.text)))
+
+def test_session_offsets_count_code_points():
+    # El emoji es un solo carácter para la sesión (dos unidades UTF-16 en el navegador)
+    code = 'function main() { /* 😀 */ int y = 1; return y; }'
+    session = CompileSession(code)
+    finish(IncrementalRun(CompileRequest(code=""), session, []))
+
+    at = code.index("1;")
+    response = finish(IncrementalRun(CompileRequest(code=""), session, [(at + 1, at + 1, "2")]))
+
+    assert session.text == code.replace("1;", "12;")
+    assert comparable(response) == comparable(compile_program(CompileRequest(code=session.text)))
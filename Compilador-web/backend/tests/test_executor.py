@@ -0,0 +1,41 @@
+import asyncio
+import logging
+import os
+import time
+
+import pytest
+
+from app.api import executor
+from app.api.executor import CompilationExecutor, CompilationTimeout
+
+def test_failed_respawn_is_logged_and_retried(monkeypatch, caplog):
+    real_worker = executor.Worker
+    attempts = []
+
+    def flaky_worker():
+        attempts.append(1)
+        if len(attempts) == 2:  # Falla el primer reemplazo, no el arranque
+            raise OSError("sin recursos")
+        return real_worker()
+
+    monkeypatch.setattr(executor, "Worker", flaky_worker)
+    monkeypatch.setattr(executor, "RESPAWN_DELAY", 0.01)
+
+    async def scenario():
+        pool = CompilationExecutor("process", workers=1, timeout=0.5)
+        await pool.start()
+        try:
+            with pytest.raises(CompilationTimeout):
+                await pool.run(time.sleep, 5)
+            # El worker vencido se mata; el reemplazo falla una vez y se reintenta
+            pid = await asyncio.wait_for(pool.run(os.getpid, timeout=10), timeout=10)
+            return pid, [worker.process.pid for worker in pool.processes]
+        finally:
+            pool.shutdown()
+
+    with caplog.at_level(logging.ERROR, logger=executor.__name__):
+        pid, pids = asyncio.run(scenario())
+
+    assert len(attempts) == 3
+    assert pids == [pid]
+    assert "No se pudo reemplazar un worker" in caplog.text
@@ -0,0 +1,22 @@
+from app.models.schemas import SymbolTable
+from app.compiler.lexer import Lexer
+from app.compiler.parser import Parser
+from app.compiler.semantic import SemanticAnalyzer
+from app.compiler.intermediate import IntermediateCodeGenerator
+from app.compiler.generator import CodeGenerator
+
+def object_lines(code):
+    """Código objeto del intermedio sin optimizar (las divisiones no se pliegan)"""
+    tokens, _ = Lexer().tokenize(code)
+    arena, _ = Parser().parse(tokens)
+    analyzer = SemanticAnalyzer()
+    analyzer.check(arena)
+    ir = IntermediateCodeGenerator(SymbolTable()).generate(arena)
+    return CodeGenerator(analyzer.scopes.root).generate(ir).splitlines()
+
+def test_division_operator_follows_the_expression_type():
+    lines = object_lines(
+        "function main() { int a = 7; int b = 2; float x = 7.0; float y = 2.0; "
+        "int c = a / b; float z = x / y; print(c); print(z); return 0; }")
+    assert "    t0 = a // b" in lines
+    assert "    t1 = x / y" in lines
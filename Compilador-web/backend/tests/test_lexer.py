@@ -0,0 +1,40 @@
+from app.compiler.lexer import Lexer
+import pytest
+
+def tokenize_list(code):
+    return Lexer().tokenize(code)
+
+def tokenize_stream(code):
+    errors = []
+    tokens = list(Lexer().tokenize_iter(code, errors))
+    return tokens, errors
+
+LEXERS = [tokenize_list, tokenize_stream]
+
+def lexemes(tokens):
+    return [(t.type, t.value, t.start, t.end) for t in tokens]
+
+@pytest.mark.parametrize("tokenize", LEXERS)
+def test_assignment_then_unary_minus(tokenize):
+    tokens, errors = tokenize("x=-1;")
+    assert not errors
+    assert lexemes(tokens) == [
+        ("IDENTIFIER", "x", 0, 1), ("OPERATOR", "=", 1, 2), ("OPERATOR", "-", 2, 3),
+        ("INTEGER", "1", 3, 4), ("DELIMITER", ";", 4, 5),
+    ]
+
+@pytest.mark.parametrize("tokenize", LEXERS)
+def test_longest_operator_then_negation(tokenize):
+    tokens, errors = tokenize("a<=!b")
+    assert not errors
+    assert lexemes(tokens) == [
+        ("IDENTIFIER", "a", 0, 1), ("OPERATOR", "<=", 1, 3), ("OPERATOR", "!", 3, 4),
+        ("IDENTIFIER", "b", 4, 5),
+    ]
+
+@pytest.mark.parametrize("tokenize", LEXERS)
+@pytest.mark.parametrize("bad", ["@", "&"])  # '&' es prefijo de '&&' pero solo no es operador
+def test_invalid_operator_character_is_one_diagnostic(tokenize, bad):
+    tokens, errors = tokenize(f"x = 1 {bad} 2;")
+    assert [(e.code, e.start, e.end) for e in errors] == [("L001", 6, 7)]
+    assert [t.value for t in tokens] == ["x", "=", "1", "2", ";"]
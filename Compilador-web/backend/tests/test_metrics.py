@@ -0,0 +1,29 @@
+from app.models.schemas import CompileRequest
+from app.compiler.pipeline import compile_program
+from app.compiler.intermediate import IntermediateCodeGenerator
+from app.api.metrics import phase_duration, record_compilation, server_timing_header
+import time
+
+CODE = "function main() { int x = 1; while (x < 10) { x = x * 2; } return x; }"
+
+def test_intermediate_time_is_charged_to_its_own_phase(monkeypatch):
+    result = IntermediateCodeGenerator.result
+
+    def slow_result(self):
+        time.sleep(0.05)
+        return result(self)
+
+    monkeypatch.setattr(IntermediateCodeGenerator, "result", slow_result)
+    metrics = compile_program(CompileRequest(code=CODE)).metrics
+    timings = metrics["phase_timings"]
+
+    # Los 50 ms del generador quedan en intermediate, no en semantic
+    assert timings["intermediate"] >= 50
+    assert timings["semantic"] < 50
+
+    header = dict(entry.split(";dur=") for entry in server_timing_header(metrics).split(", "))
+    assert float(header["intermediate"]) >= 50
+
+    before = phase_duration.series.get("intermediate", [None, 0.0, 0])[1]
+    record_compilation(metrics, cached=False, elapsed=0.1)
+    assert phase_duration.series["intermediate"][1] - before >= 0.05
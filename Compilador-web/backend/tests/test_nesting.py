@@ -0,0 +1,28 @@
+from app.models.schemas import CompileRequest
+from app.compiler.pipeline import compile_program
+from app.api import encoding
+import json
+import pickle
+
+def nested_ifs(depth: int) -> str:
+    return "function main() { int x; " + "if (x > 0) { int y; " * depth + "x = 1; " + "} " * depth + "return 0; }"
+
+def test_shallow_response_renders_like_pydantic():
+    response = compile_program(CompileRequest(code=nested_ifs(3)))
+    assert json.loads(encoding.render_json(response)) == json.loads(response.json())
+
+def test_hundreds_of_nested_blocks_compile_and_render():
+    response = compile_program(CompileRequest(code=nested_ifs(300)))
+    assert response.success, response.errors
+    payload = pickle.loads(pickle.dumps(encoding.pack_response(response)))
+    rebuilt = encoding.unpack_response(payload)
+    assert encoding.render_json(rebuilt) == encoding.render_json(response)
+
+def test_parentheses_do_not_count_as_nesting():
+    code = "function main() { int x; x = " + "(x + " * 400 + "1" + ")" * 400 + "; return 0; }"
+    assert compile_program(CompileRequest(code=code)).success
+
+def test_nesting_limit_is_reported():
+    response = compile_program(CompileRequest(code=nested_ifs(600)))
+    assert not response.success
+    assert any("Anidamiento demasiado profundo" in e for e in response.errors)
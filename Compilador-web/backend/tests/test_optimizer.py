@@ -0,0 +1,66 @@
+from app.models.schemas import CompileRequest, DataType, QuadrupleType, SymbolTable
+from app.compiler.lexer import Lexer
+from app.compiler.parser import Parser
+from app.compiler.semantic import SemanticAnalyzer
+from app.compiler.intermediate import IntermediateCodeGenerator
+from app.compiler.optimizer import CodeOptimizer
+from app.compiler.generator import CodeGenerator
+from app.compiler.pipeline import compile_program
+
+def intermediate(code):
+    tokens, _ = Lexer().tokenize(code)
+    arena, _ = Parser().parse(tokens)
+    return arena, IntermediateCodeGenerator(SymbolTable()).generate(arena)
+
+def assigned(code):
+    """Variables que reciben una asignación en el store"""
+    return {code.text(code.result[i]) for i in range(len(code))
+            if code.quadruple_type[i] is QuadrupleType.ASSIGNMENT}
+
+# Variables del usuario con nombres de temporal (t1) o que antes se tomaban por uno (total, tmp)
+USER_TEMPORARY_NAMES = (
+    "function main() { int total = 0; int tmp = 1; int t1 = 0; "
+    "while (t1 < 5) { tmp = tmp * 2; total = total + tmp; t1 = t1 + 1; } "
+    "print(total); return t1; }"
+)
+
+def test_dead_code_elimination_keeps_user_variables_named_like_temporaries():
+    _, code = intermediate(USER_TEMPORARY_NAMES)
+    optimized = CodeOptimizer().dead_code_elimination(code)
+    assert {"total", "tmp", "t1"} <= assigned(optimized)
+
+def test_object_code_keeps_user_variables_named_like_temporaries():
+    lines = compile_program(CompileRequest(code=USER_TEMPORARY_NAMES)).object_code.splitlines()
+    assert {"    total = 0", "    tmp = 1", "    t1 = 0"} <= set(lines)
+
+def test_temporary_is_renamed_when_a_user_variable_has_its_name():
+    arena, code = intermediate(USER_TEMPORARY_NAMES)
+    analyzer = SemanticAnalyzer()
+    analyzer.check(arena)
+    lines = CodeGenerator(analyzer.scopes.root).generate(code).splitlines()
+
+    # El temporal t1 (tmp * 2) no pisa a la variable t1 del usuario
+    assert "    _t1 = tmp * 2" in lines
+    assert "    tmp = _t1" in lines
+    assert "    t3 = t1 + 1" in lines
+
+TYPED = (
+    'function main() { int a = 7 / 2; float b = 7.0 / 2.0; string s = "a" + "b"; '
+    'int x = a; float y = b; int c = x / a; float d = y / b; print(s); print(c); print(d); return 0; }'
+)
+
+def test_evaluate_typed_divides_by_type():
+    optimizer = CodeOptimizer()
+    assert optimizer.evaluate_typed("7", "2", "/", DataType.INT) == 3
+    assert optimizer.evaluate_typed("7", "2", "/", DataType.FLOAT) == 3.5
+    assert optimizer.evaluate_typed('"a"', '"b"', "+", DataType.STRING) == '"ab"'
+
+def test_constant_folding_uses_expression_types():
+    _, code = intermediate(TYPED)
+    folded = CodeOptimizer().constant_folding(code)
+    values = {code.text(code.result[i]): folded.text(folded.arg1[i]) for i in range(len(folded))
+              if folded.quadruple_type[i] is QuadrupleType.ASSIGNMENT}
+    # t0 = 7 / 2 (int), t1 = 7.0 / 2.0 (float), t2 = "a" + "b" (string)
+    assert values["t0"] == "3"
+    assert values["t1"] == "3.5"
+    assert values["t2"] == '"ab"'
@@ -0,0 +1,50 @@
+from app.models.schemas import QuadrupleType
+from app.compiler.quadruples import QuadrupleStore, NONE, OPERATOR, CONSTANT, TEMPORARY, VARIABLE, LABEL
+
+def sample() -> QuadrupleStore:
+    """t0 = t0 + 1 (variable t0 del usuario), if_false t0 -> L_0, L_0:"""
+    code = QuadrupleStore()
+    code.add(QuadrupleType.ARITHMETIC, code.intern("+", OPERATOR), code.intern("t0", VARIABLE),
+             code.intern("1", CONSTANT), code.intern("t0", TEMPORARY))
+    code.add(QuadrupleType.JUMP, code.intern("if_false", OPERATOR), code.intern("t0", TEMPORARY),
+             result=code.intern("L_0", LABEL))
+    code.add(QuadrupleType.LABEL, code.intern("", OPERATOR), result=code.intern("L_0", LABEL))
+    return code
+
+def rows(code: QuadrupleStore):
+    return [(code.text(code.operator[i]), code.text(code.arg1[i]), code.text(code.arg2[i]),
+             code.text(code.result[i])) for i in range(len(code))]
+
+def test_extend_renames_only_temporaries_and_labels():
+    target = sample()
+    target.extend(sample(), {"t0": "t7", "L_0": "L_3"})
+
+    assert rows(target)[3:] == [("+", "t0", "1", "t7"), ("if_false", "t7", None, "L_3"), ("", None, None, "L_3")]
+    # La variable t0 del usuario es el mismo operando en las dos mitades; el temporal no
+    assert target.arg1[3] == target.arg1[0]
+    assert target.kind[target.result[3]] == TEMPORARY and target.result[3] != target.result[0]
+    assert target.arg2[4] == NONE and target.arg1[5] == NONE
+
+def test_extend_without_renames_reuses_the_same_operands():
+    target = sample()
+    target.extend(sample())
+    assert target.columns() == tuple(column[:3] * 2 for column in sample().columns())
+
+def test_copy_and_select_share_the_string_table():
+    code = sample()
+    copied, selected = code.copy(), code.select([2, 0])
+
+    assert rows(selected) == [rows(code)[2], rows(code)[0]]
+    # Un string internado en cualquiera de ellos tiene el mismo índice en todos
+    new = selected.intern("t9", TEMPORARY)
+    assert code.intern("t9", TEMPORARY) == copied.intern("t9", TEMPORARY) == new
+    assert code.strings is copied.strings is selected.strings
+
+    # Los arreglos de cuádruplos sí son propios
+    copied.result[0] = new
+    assert code.text(code.result[0]) == "t0"
+
+def test_to_quadruples_numbers_from_base():
+    quads = sample().to_quadruples(base=10)
+    assert [q.index for q in quads] == [10, 11, 12]
+    assert (quads[1].operator, quads[1].arg1, quads[1].arg2, quads[1].result) == ("if_false", "t0", None, "L_0")
@@ -0,0 +1,47 @@
+from app.compiler.lexer import Lexer
+from app.compiler.parser import Parser
+from app.compiler.arena import IF_STATEMENT, ROOT
+from app.compiler.walker import AstVisitor
+import pytest
+
+class Counter(AstVisitor):
+    """Cuenta los nodos que visita; con fail_on lanza al llegar a ese tipo"""
+    missing = 0
+
+    def __init__(self, arena, fail_on=None):
+        self.arena = arena
+        self.fail_on = fail_on
+        self.visited = 0
+
+    def visit_default(self, node):
+        self.visited += 1
+        if self.arena.kind[node] == self.fail_on:
+            raise RuntimeError("falla")
+        total = 1
+        for child in self.arena.children(node):
+            total += yield child
+        return total
+
+class Recovering(Counter):
+    def visit_error(self, node, e):
+        return 0  # El subárbol que falló no cuenta
+
+def parse(code):
+    tokens, _ = Lexer().tokenize(code)
+    arena, _ = Parser().parse(tokens)
+    return arena
+
+def test_error_without_visit_error_stops_the_walk():
+    arena = parse("function main() { int x = 1; return x; } function f() { return 2; }")
+    counter = Counter(arena, fail_on=arena.kind[arena.first_child[ROOT]])
+
+    with pytest.raises(RuntimeError):
+        counter.visit_node(ROOT)
+    assert counter.visited == 2  # Program y la primera función
+
+def test_visit_error_replaces_the_failed_subtree():
+    arena = parse("function main() { int x = 1; if (x > 0) { x = x + 1; } return x; }")
+    branch = arena.kind.index(IF_STATEMENT)
+
+    # El if vale 0 y el recorrido sigue con el return
+    assert Recovering(arena, fail_on=IF_STATEMENT).visit_node(ROOT) == len(arena) - Counter(arena).visit_node(branch)
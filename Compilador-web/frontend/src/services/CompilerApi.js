@@ -1,6 +1,7 @@
 const API_BASE_URL = 'http://localhost:5000';
 
-export const compileCode = async (code) => {
+// options admite { artifacts: ['tokens', ...], stop_after: 'lexer' | 'parser' | ... }
+export const compileCode = async (code, options = {}) => {
   try {
     console.log('📤 Enviando solicitud de compilación...');
     
@@ -9,7 +10,7 @@ export const compileCode = async (code) => {
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify({ code }),
+      body: JSON.stringify({ code, ...options }),
     });
 
     console.log('📥 Respuesta recibida, status:', response.status);
@@ -43,6 +44,98 @@ export const compileCode = async (code) => {
   }
 };
 
+// Compilación por fases: onChunk recibe cada fragmento NDJSON en cuanto el backend
+// termina la fase (lexer, parser, semantic, intermediate, optimizer, codegen, done)
+export const compileCodeStream = async (code, onChunk, options = {}) => {
+  const response = await fetch(`${API_BASE_URL}/api/compile/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ code, ...options }),
+  });
+
+  if (!response.ok) {
+    const errorText = await response.text();
+    throw new Error(`Error del servidor: ${response.status} - ${errorText}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onChunk(JSON.parse(line));
+    }
+  }
+  if (buffer.trim()) onChunk(JSON.parse(buffer));
+};
+
+const isHighSurrogate = (code) => code >= 0xd800 && code <= 0xdbff;
+const isLowSurrogate = (code) => code >= 0xdc00 && code <= 0xdfff;
+
+// Cantidad de code points en text.slice(from, to); el backend (Python) cuenta así los offsets
+const codePoints = (text, from, to) => {
+  let count = 0;
+  for (let i = from; i < to; i++) {
+    if (!(isLowSurrogate(text.charCodeAt(i)) && i > from && isHighSurrogate(text.charCodeAt(i - 1)))) count++;
+  }
+  return count;
+};
+
+// Edición mínima (prefijo y sufijo comunes) que transforma prev en next.
+// Los offsets van en code points, no en unidades UTF-16: un carácter fuera del BMP
+// (emoji, etc.) ocupa dos unidades en JS pero uno solo en el texto de la sesión.
+export const computeEdit = (prev, next) => {
+  let start = 0;
+  while (start < prev.length && start < next.length && prev[start] === next[start]) start++;
+  // No cortar un par sustituto: si difiere solo la segunda mitad, el par entero cambia
+  if (start > 0 && isHighSurrogate(prev.charCodeAt(start - 1))) start--;
+  let prevEnd = prev.length;
+  let nextEnd = next.length;
+  while (prevEnd > start && nextEnd > start && prev[prevEnd - 1] === next[nextEnd - 1]) {
+    prevEnd--;
+    nextEnd--;
+  }
+  if (prevEnd < prev.length && isLowSurrogate(prev.charCodeAt(prevEnd))) {
+    prevEnd++;
+    nextEnd++;
+  }
+  const startPoint = codePoints(prev, 0, start);
+  return { start: startPoint, end: startPoint + codePoints(prev, start, prevEnd), text: next.slice(start, nextEnd) };
+};
+
+// Compilación incremental: sin sessionId manda el código completo y abre una sesión;
+// con sessionId manda solo las ediciones. Si el servidor perdió la sesión (404),
+// se reabre con el código completo.
+export const compileSession = async (sessionId, code, edits = [], options = {}) => {
+  const post = (body) => fetch(`${API_BASE_URL}/api/compile/session`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ ...body, ...options }),
+  });
+
+  let response = sessionId ? await post({ session_id: sessionId, edits }) : await post({ code });
+  if (response.status === 404) {
+    response = await post({ code });
+  }
+  if (!response.ok) {
+    const errorText = await response.text();
+    throw new Error(`Error del servidor: ${response.status} - ${errorText}`);
+  }
+  return response.json();
+};
+
 // Función auxiliar para verificar conexión
 export const checkServerConnection = async () => {
   try {
@@ -0,0 +1,32 @@
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import { computeEdit } from './CompilerApi.js';
+
+// Aplica la edición contando en code points, como hace la sesión en el backend
+const apply = (text, { start, end, text: inserted }) => {
+  const points = Array.from(text);
+  return points.slice(0, start).join('') + inserted + points.slice(end).join('');
+};
+
+test('offsets en code points después de un carácter fuera del BMP', () => {
+  const prev = 'x = "😀"; y = 1;';
+  const next = 'x = "😀"; y = 12;';
+  const edit = computeEdit(prev, next);
+  assert.deepEqual(edit, { start: 14, end: 14, text: '2' });
+  assert.equal(apply(prev, edit), next);
+});
+
+test('no corta un par sustituto al cambiar un emoji por otro', () => {
+  const prev = '// 😀 fin';
+  const next = '// 😁 fin';
+  const edit = computeEdit(prev, next);
+  assert.deepEqual(edit, { start: 3, end: 4, text: '😁' });
+  assert.equal(apply(prev, edit), next);
+});
+
+test('insertar y borrar emojis mantiene el texto sincronizado', () => {
+  const steps = ['a', 'a😀', 'a😀😀b', '😀😀b', '😀b😁', 'b'];
+  for (let i = 1; i < steps.length; i++) {
+    assert.equal(apply(steps[i - 1], computeEdit(steps[i - 1], steps[i])), steps[i]);
+  }
+});